@@ -1,28 +1,80 @@
-from django.contrib.admin import ModelAdmin, register
+from django.contrib.admin import ModelAdmin, display, register
+from django.db.models import OuterRef, Subquery, Sum
+from .changelist import LargeTableAdminMixin
 from .models import *
+from .search import filter_products
+from .stock import set_stock_quantity, stock_quantities
 
 
 @register(Product)
-class ProductAdmin(ModelAdmin):
+class ProductAdmin(LargeTableAdminMixin, ModelAdmin):
     """
-    Панель администрирования товаров.
+    Панель администрирования товаров (режим больших таблиц, см. LargeTableAdminMixin).
 
     Поля
     ----
     list_display:
         Список отображаемых полей.
+    list_select_related:
+        Категории загружаются запросом страницы.
     search_fields:
         Список полей по которым выполняется поиск.
+        Поиск выполняется по полнотекстовому индексу (см. get_search_results).
+    autocomplete_fields:
+        Категория выбирается автодополнением, без загрузки всех категорий в список выбора.
+    readonly_fields:
+        Раздельный остаток включается командой shard_stock.
     """
     
     list_display = (
         "name",
-        "quantity",
+        "stock",
+        "reserved",
+        "stock_slots",
         "barcode",
         "updated_at",
         "category",
     )
+    list_select_related = ("category",)
     search_fields = ['name', 'category__name']
+    autocomplete_fields = ("category",)
+    readonly_fields = ("stock_slots",)
+
+    def get_queryset(self, request):
+        # Остаток товаров с раздельным остатком - сумма слотов, выбирается запросом страницы.
+        slots = StockSlot.objects.filter(product_id=OuterRef("pk")).order_by().values("product_id")
+        return super().get_queryset(request).annotate(
+            slot_quantity=Subquery(slots.annotate(total=Sum("quantity")).values("total"))
+        )
+
+    @display(description="Количество")
+    def stock(self, obj):
+        return (obj.slot_quantity or 0) if obj.stock_slots else obj.quantity
+
+    def get_object(self, request, object_id, from_field=None):
+        """
+        Возвращает товар; в форме товара с раздельным остатком показывается сумма слотов.
+        """
+        obj = super().get_object(request, object_id, from_field)
+        if obj is not None and obj.stock_slots:
+            obj.quantity = stock_quantities([obj.pk]).get(obj.pk, 0)
+        return obj
+
+    def save_model(self, request, obj, form, change):
+        """
+        Сохраняет товар; новое количество товара с раздельным остатком распределяется между слотами.
+        """
+        super().save_model(request, obj, form, change)
+        if obj.stock_slots and "quantity" in form.changed_data:
+            set_stock_quantity(obj, obj.quantity)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Ищет товары по полнотекстовому индексу вместо LIKE '%...%' по полям search_fields.
+        """
+        if not search_term:
+            return queryset, False
+        return filter_products(queryset, search_term), False
 
 
 @register(Category)
@@ -34,27 +86,93 @@ class CategoryAdmin(ModelAdmin):
     ----
     list_display:
         Список отображаемых полей.
+    search_fields:
+        Поиск по названию (используется автодополнением категории товара).
     """
     
     list_display = (
         "name",
         "description",
     )
+    search_fields = ("name",)
 
 
 @register(Price)
-class PriceAdmin(ModelAdmin):
+class PriceAdmin(LargeTableAdminMixin, ModelAdmin):
     """
-    Панель администрирования цены товаров.
+    Панель администрирования цены товаров (режим больших таблиц, см. LargeTableAdminMixin).
 
     Поля
     ----
     list_display:
         Список отображаемых полей.
+    list_select_related:
+        Товары загружаются запросом страницы.
+    search_fields:
+        Поиск цен товара выполняется по полнотекстовому индексу товаров (см. get_search_results).
+    autocomplete_fields:
+        Товар выбирается автодополнением, без загрузки всех товаров в список выбора.
     """
     
     list_display = (
         "currency",
         "amount",
         "product"
-    )
\ No newline at end of file
+    )
+    list_select_related = ("product",)
+    search_fields = ("product__name",)
+    autocomplete_fields = ("product",)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Ищет цены товаров, найденных полнотекстовым поиском.
+        """
+        if not search_term:
+            return queryset, False
+        return filter_products(queryset, search_term, field="product"), False
+
+
+@register(ExchangeRate)
+class ExchangeRateAdmin(ModelAdmin):
+    """
+    Панель администрирования курсов валют.
+
+    Поля
+    ----
+    list_display:
+        Список отображаемых полей.
+    """
+
+    list_display = (
+        "currency",
+        "rate",
+        "updated_at",
+    )
+
+
+@register(Reservation)
+class ReservationAdmin(ModelAdmin):
+    """
+    Панель администрирования резервов товаров.
+
+    Поля
+    ----
+    list_display:
+        Список отображаемых полей.
+    list_filter:
+        Фильтры списка.
+    list_select_related:
+        Товары загружаются запросом страницы.
+    raw_id_fields:
+        Товар выбирается по идентификатору, без загрузки всех товаров в список выбора.
+    """
+
+    list_display = (
+        "product",
+        "amount",
+        "status",
+        "expires_at",
+    )
+    list_filter = ("status",)
+    list_select_related = ("product",)
+    raw_id_fields = ("product",)
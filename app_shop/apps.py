@@ -5,3 +5,6 @@ class AppShopConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app_shop'
     verbose_name = "Магазин"
+
+    def ready(self):
+        from . import receivers  # noqa: F401
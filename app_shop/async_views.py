@@ -0,0 +1,187 @@
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import aget_object_or_404
+from django.views import View
+from rest_framework.exceptions import APIException, NotFound
+from rest_framework.request import Request
+
+from .events import get_broadcaster, get_event_settings
+from .models import *
+from .pagination import *
+from .renderers import FastJSONRenderer
+from .serializers import *
+from .viewsets import _filter_by_params
+
+
+__all__ = ["AsyncProductView", "AsyncPriceView", "AsyncCategoryView", "ProductStreamView"]
+
+
+class AsyncCatalogView(View):
+    """
+    Асинхронное представление чтения каталога: список и отдельный объект.
+
+    Записи выбираются асинхронным ORM, поэтому под ASGI ожидание БД не
+    занимает поток на каждый запрос; список строится быстрым чтением
+    сериализатора (FastReadMixin). Ответы совпадают с ответами
+    синхронных представлений (ModelViewSet) тех же коллекций.
+
+    Поля
+    ----
+    queryset: QuerySet
+        Набор объектов коллекции.
+    serializer_class:
+        Сериализатор объектов (с FastReadMixin).
+    pagination_class:
+        Постраничная выдача списка.
+    filter_fields:
+        Поля, по которым фильтруется список (параметры запроса).
+    """
+
+    queryset = None
+    serializer_class = None
+    pagination_class = KeysetPagination
+    filter_fields = ()
+    http_method_names = ["get", "head", "options"]
+
+    async def get(self, request, pk=None):
+        request = Request(request)
+        try:
+            if pk is None:
+                data = await self.list(request)
+            else:
+                data = await self.retrieve(request, pk)
+        except APIException as e:
+            detail = e.detail if isinstance(e.detail, (list, dict)) else {"detail": e.detail}
+            return self.render(detail, status=e.status_code)
+        return self.render(data)
+
+    async def list(self, request):
+        queryset = _filter_by_params(self.queryset.all(), request.query_params, self.filter_fields)
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(self.serializer_class.fast_values(queryset), request, view=self)
+        return paginator.get_paginated_response(await self.serialize_page(page)).data
+
+    async def retrieve(self, request, pk):
+        # Ошибки те же, что у GenericAPIView.get_object.
+        try:
+            obj = await aget_object_or_404(self.queryset, pk=pk)
+        except (TypeError, ValueError, DjangoValidationError):
+            raise NotFound()
+        except Http404 as e:
+            raise NotFound(*e.args)
+        return await self.serialize(obj)
+
+    async def serialize_page(self, rows):
+        """
+        Строит представления объектов страницы по строкам ``values()``.
+        """
+        return self.serializer_class.fast_data(rows)
+
+    async def serialize(self, obj):
+        """
+        Строит представление объекта.
+        """
+        return self.serializer_class(obj).data
+
+    def render(self, data, status=200):
+        return HttpResponse(FastJSONRenderer().render(data), status=status, content_type="application/json")
+
+
+class AsyncProductView(AsyncCatalogView):
+    """
+    Асинхронное чтение товаров: список по ключу ``(updated_at, id)`` с фильтром по категории.
+    """
+
+    queryset = Product.objects
+    serializer_class = ProductSerializer
+    pagination_class = ProductPagination
+    filter_fields = ("category",)
+
+    # Остаток товаров с раздельным остатком (сумма слотов) читается синхронным
+    # ORM в потоке; страницы без таких товаров строятся без смены потока.
+
+    async def serialize_page(self, rows):
+        if any(row["stock_slots"] for row in rows):
+            return await sync_to_async(self.serializer_class.fast_data)(rows)
+        return await super().serialize_page(rows)
+
+    async def serialize(self, obj):
+        if obj.stock_slots:
+            return await sync_to_async(lambda: self.serializer_class(obj).data)()
+        return await super().serialize(obj)
+
+
+class AsyncPriceView(AsyncCatalogView):
+    """
+    Асинхронное чтение цен с фильтрами по товару и валюте.
+    """
+
+    queryset = Price.objects
+    serializer_class = PriceSerializer
+    filter_fields = ("product", "currency")
+
+
+class AsyncCategoryView(AsyncCatalogView):
+    """
+    Асинхронное чтение категорий.
+    """
+
+    queryset = Category.objects
+    serializer_class = CategorySerializer
+
+
+class ProductStreamView(View):
+    """
+    Поток изменений товаров (Server-Sent Events) для витрин вместо
+    периодического опроса товаров.
+
+    Параметры products и categories (идентификаторы через запятую) задают
+    подписку: изменения товаров и товаров категорий. Событие ``product``
+    содержит текущее представление товара (поле product), виды изменения
+    (changes: ``product`` - товар или остаток, ``price`` - цены) и при
+    изменении цен - цены товара (prices); для удаленного товара deleted
+    равно true. Изменения объединяются рассылкой (Broadcaster), медленный
+    клиент получает только последнее состояние каждого товара. Каждые
+    HEARTBEAT секунд без изменений отправляется комментарий, по которому
+    сервер обнаруживает отключение клиента.
+
+    Поток удерживает соединение и требует ASGI-сервера (shop_project.asgi).
+    """
+
+    http_method_names = ["get"]
+
+    async def get(self, request):
+        options = get_event_settings()
+        try:
+            products, categories = (
+                [int(value) for value in request.GET.get(name, "").split(",") if value]
+                for name in ("products", "categories")
+            )
+        except ValueError:
+            return self.error("Идентификаторы должны быть целыми числами.")
+        if not products and not categories:
+            return self.error("Укажите products или categories.")
+        if len(products) + len(categories) > options["MAX_SUBSCRIPTIONS"]:
+            return self.error(f"Подписка не может содержать больше {options['MAX_SUBSCRIPTIONS']} объектов.")
+        response = StreamingHttpResponse(
+            self.stream(products, categories, options["HEARTBEAT"]), content_type="text/event-stream"
+        )
+        response["Cache-Control"] = "no-cache"
+        # Прокси не должен буферизовать поток.
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+    async def stream(self, products, categories, heartbeat):
+        broadcaster = get_broadcaster()
+        subscription = broadcaster.subscribe(products, categories)
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                messages = await subscription.get(timeout=heartbeat)
+                yield b"".join(messages) if messages else b": ping\n\n"
+        finally:
+            broadcaster.unsubscribe(subscription)
+
+    def error(self, detail):
+        return HttpResponse(FastJSONRenderer().render({"detail": detail}), status=400, content_type="application/json")
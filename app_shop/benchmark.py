@@ -0,0 +1,317 @@
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import OperationalError, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import *
+
+
+__all__ = [
+    "percentile",
+    "DEFAULT_MIX",
+    "parse_mix",
+    "build_plan",
+    "InProcessTarget",
+    "HttpTarget",
+    "run_plan",
+    "summarize",
+    "compare",
+]
+
+
+# Доли операций нагрузки по умолчанию (в процентах).
+DEFAULT_MIX = {"list": 40, "retrieve": 30, "barcode": 15, "reduce": 10, "write": 5}
+
+# Количество товаров, из которых выбираются объекты запросов.
+SAMPLE_SIZE = 1000
+
+
+def percentile(values, fraction):
+    """
+    Возвращает перцентиль отсортированного списка (0.0, если список пуст).
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def parse_mix(value):
+    """
+    Разбирает состав нагрузки вида ``list=40,retrieve=30``.
+
+    Параметры
+    ----------
+    value : str
+        Пары ``операция=вес`` через запятую.
+
+    Возвращает
+    ----------
+    dict[str, float]
+        Вес каждой операции.
+
+    Исключения
+    ----------
+    ValueError
+        Вызывается при неизвестной операции, некорректном или нулевом весе.
+    """
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Неизвестная операция {name!r}; допустимы: {', '.join(DEFAULT_MIX)}.")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise ValueError(f"Некорректный вес операции {name!r}: {weight!r}.")
+        if mix[name] < 0:
+            raise ValueError(f"Вес операции {name!r} не может быть отрицательным.")
+    if not any(mix.values()):
+        raise ValueError("Состав нагрузки пуст.")
+    return mix
+
+
+def build_plan(mix, requests, seed=0, page_size=20):
+    """
+    Строит воспроизводимый список запросов нагрузки по текущему каталогу.
+
+    Объекты запросов выбираются из первых SAMPLE_SIZE товаров (и их цен)
+    генератором с заданным seed, поэтому на одном каталоге план
+    одинаков при каждом запуске.
+
+    Параметры
+    ----------
+    mix : dict[str, float]
+        Веса операций: list - страница списка товаров, retrieve - товар,
+        barcode - товар по штрихкоду, reduce - списание одной единицы товара,
+        write - изменение цены.
+    requests : int
+        Количество запросов.
+    seed : int
+        Начальное значение генератора.
+    page_size : int
+        Размер страницы списка.
+
+    Возвращает
+    ----------
+    list[tuple[str, str, str, dict | None]]
+        Операция, HTTP-метод, путь и тело запроса.
+
+    Исключения
+    ----------
+    ValueError
+        Вызывается, если в каталоге нет объектов для операций нагрузки.
+    """
+    products = list(Product.objects.order_by("pk").values_list("pk", "barcode")[:SAMPLE_SIZE])
+    price_ids = list(
+        Price.objects.filter(product_id__in=[pk for pk, _ in products]).order_by("pk").values_list("pk", flat=True)
+    )
+    if not products:
+        raise ValueError("В каталоге нет товаров.")
+    if mix.get("write") and not price_ids:
+        raise ValueError("В каталоге нет цен для операции write.")
+
+    rng = random.Random(seed)
+    names = [name for name, weight in mix.items() if weight]
+    weights = [mix[name] for name in names]
+    plan = []
+    for name in rng.choices(names, weights, k=requests):
+        pk, barcode = rng.choice(products)
+        if name == "list":
+            plan.append((name, "GET", f"{reverse('product-list')}?page_size={page_size}", None))
+        elif name == "retrieve":
+            plan.append((name, "GET", reverse("product-detail", args=[pk]), None))
+        elif name == "barcode":
+            plan.append((name, "GET", reverse("product-by-barcode", args=[barcode]), None))
+        elif name == "reduce":
+            plan.append((name, "POST", reverse("product-reduce-quantity", args=[pk]), {"amount": 1}))
+        else:
+            amount = f"{rng.randint(100, 1000000) / 100:.2f}"
+            plan.append((name, "PATCH", reverse("price-detail", args=[rng.choice(price_ids)]), {"amount": amount}))
+    return plan
+
+
+class InProcessTarget:
+    """
+    Выполняет запросы тестовым клиентом Django в текущем процессе.
+
+    Каждый поток использует собственный клиент и соединение с БД;
+    количество SQL-запросов считается для каждого запроса. Вызывающий
+    код должен разрешить хост ``testserver`` (ALLOWED_HOSTS).
+
+    SQLite допускает одну пишущую транзакцию, а общий кэш БД в памяти
+    (тестовая БД) не ждет блокировку и сразу завершает запрос ошибкой
+    ``database table is locked``. Такой запрос повторяется после паузы, как
+    ожидание блокировки (busy_timeout) файловой БД: время ожидания входит в
+    задержку запроса, а ошибкой нагрузки блокировка не считается.
+
+    Параметры
+    ----------
+    lock_timeout : float
+        Наибольшее время повторов запроса при блокировке БД в секундах;
+        после него исключение OperationalError передается вызывающему коду.
+    """
+
+    name = "in-process"
+
+    def __init__(self, lock_timeout=5.0):
+        self.local = threading.local()
+        self.lock_timeout = lock_timeout
+
+    def request(self, method, path, body=None):
+        """
+        Возвращает код ответа и количество SQL-запросов.
+        """
+        if not hasattr(self.local, "client"):
+            self.local.client = Client()
+        deadline = time.perf_counter() + self.lock_timeout
+        delay = 0.001
+        while True:
+            try:
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.local.client.generic(
+                        method, path, json.dumps(body) if body is not None else "", content_type="application/json"
+                    )
+                return response.status_code, len(queries)
+            except OperationalError as e:
+                # Запрос с ошибкой блокировки откатывается целиком, повтор безопасен.
+                if "locked" not in str(e) or time.perf_counter() + delay > deadline:
+                    raise
+            time.sleep(delay)
+            delay = min(delay * 2, 0.05)
+
+    def close(self):
+        connection.close()
+
+
+class HttpTarget:
+    """
+    Выполняет запросы по HTTP к запущенному серверу; SQL-запросы не считаются.
+    """
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip("/")
+        self.name = self.base_url
+        self.timeout = timeout
+
+    def request(self, method, path, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=data, method=method, headers={"Content-Type": "application/json"}
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+                return response.status, None
+        except urllib.error.HTTPError as e:
+            return e.code, None
+
+    def close(self):
+        pass
+
+
+def run_plan(target, plan, threads=8):
+    """
+    Выполняет план нагрузки из нескольких потоков.
+
+    Параметры
+    ----------
+    target : InProcessTarget | HttpTarget
+        Получатель запросов.
+    plan : list
+        План из build_plan.
+    threads : int
+        Количество одновременных запросов.
+
+    Возвращает
+    ----------
+    tuple[dict[str, list], float]
+        Замеры по операциям (задержка в секундах, код ответа,
+        количество SQL-запросов или None) и длительность нагрузки в секундах.
+    """
+    queue = iter(plan)
+    lock = threading.Lock()
+    samples = {name: [] for name in dict.fromkeys(name for name, *_ in plan)}
+
+    def worker():
+        try:
+            while True:
+                with lock:
+                    item = next(queue, None)
+                if item is None:
+                    return
+                name, method, path, body = item
+                started = time.perf_counter()
+                try:
+                    status, queries = target.request(method, path, body)
+                except OSError:
+                    status, queries = None, None
+                samples[name].append((time.perf_counter() - started, status, queries))
+        finally:
+            target.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        for future in [pool.submit(worker) for _ in range(threads)]:
+            future.result()
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    """
+    Сводит замеры в отчет: запросы, ошибки, пропускная способность,
+    перцентили задержки (мс) и среднее число SQL-запросов по операциям.
+
+    Ошибкой считается ответ с кодом не из 2xx или сбой соединения.
+    """
+
+    def stats(items):
+        latencies = sorted(latency for latency, _, _ in items)
+        queries = [count for _, _, count in items if count is not None]
+        return {
+            "requests": len(items),
+            "errors": sum(1 for _, status, _ in items if status is None or not 200 <= status < 300),
+            "rps": round(len(items) / elapsed, 1) if elapsed else 0.0,
+            "p50": round(percentile(latencies, 0.5) * 1000, 3),
+            "p95": round(percentile(latencies, 0.95) * 1000, 3),
+            "p99": round(percentile(latencies, 0.99) * 1000, 3),
+            "queries": round(sum(queries) / len(queries), 2) if queries else None,
+        }
+
+    endpoints = {name: stats(items) for name, items in sorted(samples.items())}
+    return {
+        "elapsed": round(elapsed, 3),
+        "total": stats([item for items in samples.values() for item in items]),
+        "endpoints": endpoints,
+    }
+
+
+def compare(report, baseline, metrics=("rps", "p50", "p95", "p99", "queries")):
+    """
+    Сравнивает отчет с базовым отчетом по общим операциям.
+
+    Возвращает
+    ----------
+    list[tuple[str, str, float, float, float | None]]
+        Операция, показатель, базовое и текущее значение и относительное
+        изменение (None, если базовое значение нулевое).
+    """
+    rows = []
+    current = {**report["endpoints"], "total": report["total"]}
+    previous = {**baseline["endpoints"], "total": baseline["total"]}
+    for name in current:
+        if name not in previous:
+            continue
+        for metric in metrics:
+            before, after = previous[name].get(metric), current[name].get(metric)
+            if before is None or after is None:
+                continue
+            rows.append((name, metric, before, after, (after - before) / before if before else None))
+    return rows
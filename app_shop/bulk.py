@@ -0,0 +1,287 @@
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+
+from .models import *
+from .signals import products_changed
+
+
+__all__ = [
+    "UpsertResult",
+    "upsert_catalog",
+    "add_row",
+    "clean_row",
+    "clean_price",
+    "write_batch",
+    "in_chunks",
+]
+
+
+MAX_REPORTED_ERRORS = 100
+# Наибольшее число строк в одном запросе к API; большие загрузки - командой upsert_catalog.
+MAX_REQUEST_ROWS = 5000
+CENT = Decimal("0.01")
+
+
+@dataclass
+class UpsertResult:
+    """
+    Итог массовой загрузки товаров и цен.
+
+    Поля
+    ----
+    inserted:
+        Количество созданных товаров.
+    updated:
+        Количество обновленных товаров.
+    rejected:
+        Количество отклоненных строк.
+    errors:
+        Ошибки отклоненных строк (не более MAX_REPORTED_ERRORS):
+        номер строки и описание ошибки.
+    """
+
+    inserted: int = 0
+    updated: int = 0
+    rejected: int = 0
+    errors: list = field(default_factory=list)
+
+    def reject(self, row, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "detail": message})
+
+    def as_dict(self):
+        return {
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "rejected": self.rejected,
+            "errors": self.errors,
+        }
+
+
+def upsert_catalog(rows, batch_size=500, commit_size=10000, result=None):
+    """
+    Создает или обновляет товары по штрихкоду вместе с их ценами.
+
+    Товары записываются пачками запросом
+    ``INSERT ... ON CONFLICT (barcode) DO UPDATE``, цены - запросом
+    ``INSERT ... ON CONFLICT (product_id, currency) DO UPDATE``.
+    Строки читаются из итератора по мере обработки, поэтому источник
+    может быть сколь угодно большим. Строка, штрихкод которой уже есть в
+    текущей пачке, отклоняется (add_row).
+
+    Параметры
+    ----------
+    rows : Iterable[dict]
+        Строки вида ``{"barcode": str, "name": str, "quantity": int,
+        "category": int | None, "prices": [{"currency": str, "amount": str}]}``.
+    batch_size : int
+        Количество товаров в одном запросе INSERT.
+    commit_size : int
+        Количество входных строк в одной транзакции.
+    result : UpsertResult | None
+        Накопитель результата; если не передан, создается новый.
+
+    Возвращает
+    ----------
+    UpsertResult
+        Количество созданных, обновленных и отклоненных строк.
+    """
+    if batch_size <= 0 or commit_size <= 0:
+        raise ValueError("Размер пачки и транзакции должен быть положительным.")
+    result = result or UpsertResult()
+    numbered = enumerate(rows, start=1)
+    while True:
+        chunk = list(islice(numbered, commit_size))
+        if not chunk:
+            break
+        with transaction.atomic():
+            batch = {}
+            for number, row in chunk:
+                try:
+                    product, prices = clean_row(row)
+                except ValueError as e:
+                    result.reject(number, str(e))
+                    continue
+                if not add_row(batch, number, product, prices, result):
+                    continue
+                if len(batch) >= batch_size:
+                    write_batch(batch, result)
+                    batch = {}
+            if batch:
+                write_batch(batch, result)
+    return result
+
+
+def add_row(batch, number, product, prices, result):
+    """
+    Добавляет строку в пачку записи.
+
+    Пачка записывается одним запросом ``INSERT ... ON CONFLICT``, в котором
+    штрихкод может встречаться только один раз, поэтому повтор штрихкода
+    отклоняется с указанием первой строки, а не перезаписывает ее.
+
+    Возвращает
+    ----------
+    bool
+        True, если строка добавлена; False, если она отклонена.
+    """
+    if product.barcode in batch:
+        result.reject(number, f"Штрихкод повторяет строку {batch[product.barcode][0]}.")
+        return False
+    batch[product.barcode] = (number, product, prices)
+    return True
+
+
+def clean_row(row):
+    """
+    Проверяет строку загрузки и строит по ней несохраненные объекты.
+
+    Параметры
+    ----------
+    row : dict
+        Строка загрузки.
+
+    Возвращает
+    ----------
+    tuple[Product, list[Price]]
+        Товар и его цены (без ссылки на товар).
+
+    Исключения
+    ----------
+    ValueError
+        Вызывается, если строка не проходит проверку.
+    """
+    if not isinstance(row, dict):
+        raise ValueError("Строка должна быть объектом.")
+    barcode = row.get("barcode")
+    if not isinstance(barcode, str) or not barcode or len(barcode) > 50:
+        raise ValueError("Некорректный штрихкод.")
+    name = row.get("name")
+    if not isinstance(name, str) or not name or len(name) > 100:
+        raise ValueError("Некорректное название.")
+    quantity = row.get("quantity")
+    if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 0:
+        raise ValueError("Количество должно быть неотрицательным целым числом.")
+    category = row.get("category")
+    if category is not None and (isinstance(category, bool) or not isinstance(category, int)):
+        raise ValueError("Некорректный идентификатор категории.")
+
+    prices = {}
+    for price in row.get("prices") or []:
+        price = clean_price(price)
+        prices[price.currency] = price
+
+    product = Product(name=name, quantity=quantity, barcode=barcode, category_id=category)
+    return product, list(prices.values())
+
+
+def clean_price(price):
+    """
+    Проверяет цену из строки загрузки и строит по ней несохраненный объект.
+
+    Параметры
+    ----------
+    price : dict
+        Цена вида ``{"currency": str, "amount": str | int}``.
+
+    Возвращает
+    ----------
+    Price
+        Цена без ссылки на товар.
+
+    Исключения
+    ----------
+    ValueError
+        Вызывается, если цена не проходит проверку.
+    """
+    if not isinstance(price, dict):
+        raise ValueError("Цена должна быть объектом.")
+    currency = price.get("currency")
+    if not isinstance(currency, str) or not currency or len(currency) > 10:
+        raise ValueError("Некорректная валюта.")
+    try:
+        amount = Decimal(str(price.get("amount")))
+    except InvalidOperation:
+        raise ValueError("Некорректная стоимость.")
+    if not amount.is_finite() or amount < 0 or amount >= 10 ** 8 or amount != amount.quantize(CENT):
+        raise ValueError("Некорректная стоимость.")
+    return Price(currency=currency, amount=amount)
+
+
+def write_batch(batch, result):
+    """
+    Записывает пачку товаров и их цен, обновляя счетчики результата.
+
+    Параметры
+    ----------
+    batch : dict[str, tuple[int, Product, list[Price]]]
+        Строки пачки по штрихкоду: номер строки, товар и его цены.
+    result : UpsertResult
+        Накопитель результата.
+    """
+    category_ids = {product.category_id for _, product, _ in batch.values()} - {None}
+    known_categories = set(in_chunks(Category.objects.values_list("pk", flat=True), "pk", category_ids))
+    for barcode, (number, product, _) in list(batch.items()):
+        if product.category_id is not None and product.category_id not in known_categories:
+            result.reject(number, "Категория не найдена.")
+            del batch[barcode]
+    if not batch:
+        return
+
+    # Количество товара не может быть меньше зарезервированного (как в ProductSerializer).
+    existing = dict(in_chunks(Product.objects.values_list("barcode", "reserved"), "barcode", batch))
+    for barcode, (number, product, _) in list(batch.items()):
+        if product.quantity < existing.get(barcode, 0):
+            result.reject(number, f"Количество меньше зарезервированного ({existing[barcode]}).")
+            del batch[barcode]
+    if not batch:
+        return
+
+    Product.objects.bulk_create(
+        [product for _, product, _ in batch.values()],
+        update_conflicts=True,
+        unique_fields=["barcode"],
+        update_fields=["name", "quantity", "category", "updated_at"],
+    )
+    ids = dict(in_chunks(Product.objects.values_list("barcode", "pk"), "barcode", batch))
+    # Новое количество товаров с раздельным остатком распределяется между слотами.
+    sharded = Product.objects.filter(stock_slots__gt=0).values_list("pk", "quantity", "stock_slots")
+    for pk, quantity, slots in in_chunks(sharded, "barcode", batch):
+        StockSlot.spread(pk, quantity, slots)
+
+    prices = []
+    for barcode, (_, _, product_prices) in batch.items():
+        for price in product_prices:
+            price.product_id = ids[barcode]
+            prices.append(price)
+    if prices:
+        Price.objects.bulk_create(
+            prices,
+            update_conflicts=True,
+            unique_fields=["product", "currency"],
+            update_fields=["amount", "updated_at"],
+        )
+
+    updated = sum(barcode in existing for barcode in batch)
+    result.updated += updated
+    result.inserted += len(batch) - updated
+    products_changed.send(sender=Product, product_ids=list(ids.values()), barcodes=list(ids))
+    if prices:
+        product_ids = list({price.product_id for price in prices})
+        products_changed.send(sender=Product, product_ids=product_ids, barcodes=None, kind="price")
+
+
+def in_chunks(queryset, field_name, values):
+    """
+    Выполняет запрос с условием ``field IN (...)``, разбивая значения на пачки
+    по лимиту параметров запроса (query_batch_size: параметры условий
+    queryset учитываются запасом).
+    """
+    values = list(values)
+    size = query_batch_size()
+    for start in range(0, len(values), size):
+        yield from queryset.filter(**{f"{field_name}__in": values[start:start + size]})
@@ -0,0 +1,235 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+__all__ = ["LRUCache", "BarcodeCache", "get_barcode_cache"]
+
+
+MISSING = object()
+
+
+class LRUCache:
+    """
+    Ограниченный потокобезопасный LRU-кэш в памяти процесса со временем жизни записей.
+
+    Поля
+    ----
+    maxsize:
+        Максимальное количество записей; при переполнении вытесняется
+        давно не использованная запись.
+    ttl:
+        Время жизни записи в секундах или None.
+    hits, misses:
+        Счетчики попаданий и промахов.
+    """
+
+    def __init__(self, maxsize=10000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key, default=MISSING):
+        with self._lock:
+            item = self._data.get(key, MISSING)
+            if item is not MISSING:
+                value, expires = item
+                if expires is None or expires > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        expires = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class BarcodeCache:
+    """
+    Кэш представлений товаров по штрихкоду со сквозным чтением.
+
+    Первый уровень - LRUCache в памяти процесса, второй (необязательный) -
+    общий кэш Django (``settings.CACHES``). При промахе на обоих уровнях
+    представление строится загрузчиком и сохраняется на оба уровня.
+
+    Инвалидация в одном процессе не очищает кэш в памяти других процессов,
+    поэтому с общим кэшем каждая запись первого уровня помнит поколение
+    общего кэша, при котором сохранена. Инвалидация увеличивает поколение в
+    общем кэше, и перед каждым попаданием в кэш процесса поколение
+    сверяется (один запрос к общему кэшу за числом вместо представления).
+    Без общего кэша инвалидация видна только своему процессу: такой режим
+    допустим лишь для одного процесса.
+
+    Поля
+    ----
+    local:
+        Кэш в памяти процесса.
+    shared:
+        Общий кэш Django или None.
+    timeout:
+        Время жизни записей общего кэша в секундах.
+    """
+
+    key_prefix = "barcode"
+
+    def __init__(self, maxsize=10000, ttl=60, alias=None, timeout=300):
+        self.local = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.shared = caches[alias] if alias else None
+        self.timeout = timeout
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self._ids = LRUCache(maxsize=maxsize)
+        # Увеличивается при каждой инвалидации; запись, загруженная во время
+        # инвалидации, не сохраняется, чтобы не закэшировать устаревшие данные.
+        # С общим кэшем поколение хранится в нем и общее для всех процессов.
+        self._generation = 0
+
+    @classmethod
+    def from_settings(cls):
+        options = getattr(settings, "SHOP_BARCODE_CACHE", {})
+        return cls(
+            maxsize=options.get("MAXSIZE", 10000),
+            ttl=options.get("TTL", 60),
+            alias=options.get("ALIAS"),
+            timeout=options.get("TIMEOUT", 300),
+        )
+
+    def get(self, barcode, loader):
+        """
+        Возвращает представление товара по штрихкоду.
+
+        Параметры
+        ----------
+        barcode : str
+            Штрихкод товара.
+        loader : Callable[[str], dict | None]
+            Функция загрузки представления из БД; возвращает None,
+            если товара нет. Отсутствие товара не кэшируется.
+
+        Возвращает
+        ----------
+        dict | None
+            Представление товара или None.
+        """
+        generation = self._get_generation()
+        item = self.local.get(barcode)
+        if item is not MISSING:
+            value, stored = item
+            if stored == generation:
+                return value
+            # Запись сохранена до инвалидации в другом процессе.
+            self.local.delete(barcode)
+        if self.shared is not None:
+            value = self.shared.get(self._key(barcode), MISSING)
+            if value is not MISSING:
+                self.shared_hits += 1
+                self._store_local(barcode, value, generation)
+                return value
+            self.shared_misses += 1
+
+        value = loader(barcode)
+        if value is not None and generation == self._get_generation():
+            self._store_local(barcode, value, generation)
+            if self.shared is not None:
+                self.shared.set_many(
+                    {self._key(barcode): value, self._id_key(value["id"]): barcode},
+                    timeout=self.timeout,
+                )
+        return value
+
+    def invalidate(self, product_ids=(), barcodes=()):
+        """
+        Удаляет записи товаров по идентификаторам и штрихкодам на обоих уровнях.
+        """
+        self._generation += 1
+        if self.shared is not None:
+            try:
+                self.shared.incr(self._generation_key())
+            except ValueError:
+                self.shared.add(self._generation_key(), 1, timeout=None)
+        barcodes = set(barcodes or ())
+        product_ids = set(product_ids or ())
+        for pk in product_ids:
+            barcode = self._ids.get(pk, None)
+            if barcode is not None:
+                barcodes.add(barcode)
+                self._ids.delete(pk)
+        if self.shared is not None and product_ids:
+            barcodes.update(self.shared.get_many([self._id_key(pk) for pk in product_ids]).values())
+        for barcode in barcodes:
+            self.local.delete(barcode)
+        if self.shared is not None and barcodes:
+            self.shared.delete_many([self._key(barcode) for barcode in barcodes])
+
+    def clear(self):
+        self.local.clear()
+        self._ids.clear()
+        self.shared_hits = 0
+        self.shared_misses = 0
+
+    def stats(self):
+        return {
+            "size": len(self.local),
+            "maxsize": self.local.maxsize,
+            "hits": self.local.hits,
+            "misses": self.local.misses,
+            "shared_hits": self.shared_hits,
+            "shared_misses": self.shared_misses,
+        }
+
+    def _get_generation(self):
+        if self.shared is None:
+            return self._generation
+        return self.shared.get(self._generation_key(), 0)
+
+    def _store_local(self, barcode, value, generation):
+        self.local.set(barcode, (value, generation))
+        self._ids.set(value["id"], barcode)
+
+    def _generation_key(self):
+        return f"{self.key_prefix}:generation"
+
+    def _key(self, barcode):
+        return f"{self.key_prefix}:{barcode}"
+
+    def _id_key(self, pk):
+        return f"{self.key_prefix}:id:{pk}"
+
+
+_barcode_cache = None
+
+
+def get_barcode_cache():
+    """
+    Возвращает кэш штрихкодов процесса, создавая его по настройкам SHOP_BARCODE_CACHE.
+    """
+    global _barcode_cache
+    if _barcode_cache is None:
+        _barcode_cache = BarcodeCache.from_settings()
+    return _barcode_cache
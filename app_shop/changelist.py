@@ -0,0 +1,143 @@
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ChangeList
+from django.core.paginator import Paginator
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+
+__all__ = [
+    "CURSOR_VAR",
+    "COUNT_LIMIT",
+    "capped_count",
+    "CappedPaginator",
+    "KeysetChangeList",
+    "LargeTableAdminMixin",
+]
+
+
+# Параметр запроса списка: первичный ключ последней записи предыдущей страницы.
+CURSOR_VAR = "cursor"
+
+# Граница точного подсчета записей, найденных фильтрами или поиском.
+COUNT_LIMIT = 10000
+
+
+def capped_count(queryset, limit=COUNT_LIMIT):
+    """
+    Считает записи набора, но не больше limit + 1, запросом
+    ``SELECT COUNT(*) FROM (... LIMIT limit + 1)``: стоимость подсчета
+    ограничена, даже если найдены миллионы записей.
+    """
+    return queryset.order_by()[:limit + 1].count()
+
+
+class CappedPaginator(Paginator):
+    """
+    Постраничная выдача с ограниченным подсчетом записей (capped_count).
+
+    Используется для выпадающих списков автодополнения: дальше
+    COUNT_LIMIT записей страницы не выдаются.
+    """
+
+    @cached_property
+    def count(self):
+        return min(capped_count(self.object_list), COUNT_LIMIT)
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Список объектов панели администрирования для больших таблиц.
+
+    Записи выводятся по убыванию первичного ключа, страница выбирается
+    условием ``id < cursor`` без OFFSET, поэтому стоимость любой страницы
+    одинакова. Полный подсчет записей не выполняется: без фильтров и поиска
+    количество оценивается по наибольшему первичному ключу (один запрос по
+    индексу), с фильтрами - считается не дальше COUNT_LIMIT.
+
+    Поля
+    ----
+    cursor:
+        Курсор текущей страницы или None для первой страницы.
+    next_cursor:
+        Курсор следующей страницы или None, если страница последняя.
+    result_count_exact:
+        False, если result_count - оценка или граница подсчета.
+    """
+
+    def __init__(self, request, *args, **kwargs):
+        try:
+            self.cursor = int(request.GET[CURSOR_VAR]) if CURSOR_VAR in request.GET else None
+        except ValueError:
+            raise IncorrectLookupParameters
+        super().__init__(request, *args, **kwargs)
+
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+
+    def get_query_string(self, new_params=None, remove=None):
+        # Ссылки фильтров, поиска и сортировки ведут на первую страницу.
+        if CURSOR_VAR not in (new_params or {}):
+            remove = [*(remove or []), CURSOR_VAR]
+        return super().get_query_string(new_params, remove)
+
+    def get_ordering(self, request, queryset):
+        return ["-pk"]
+
+    def get_results(self, request):
+        queryset = self.queryset
+        if self.cursor is not None:
+            queryset = queryset.filter(pk__lt=self.cursor)
+        result_list = list(queryset[:self.list_per_page + 1])
+        has_next = len(result_list) > self.list_per_page
+        result_list = result_list[:self.list_per_page]
+
+        if self.has_active_filters or self.query:
+            result_count = capped_count(self.queryset)
+            self.result_count_exact = result_count <= COUNT_LIMIT
+            result_count = min(result_count, COUNT_LIMIT)
+        else:
+            result_count = self.root_queryset.aggregate(last=Max("pk"))["last"] or 0
+            self.result_count_exact = False
+
+        self.next_cursor = result_list[-1].pk if has_next else None
+        self.result_count = result_count
+        self.show_full_result_count = False
+        self.show_admin_actions = True
+        self.full_result_count = None
+        self.result_list = result_list
+        self.can_show_all = False
+        self.multi_page = has_next or self.cursor is not None
+        self.paginator = None
+
+    @property
+    def first_page_url(self):
+        return self.get_query_string(remove=[CURSOR_VAR])
+
+    @property
+    def next_page_url(self):
+        return self.next_cursor and self.get_query_string({CURSOR_VAR: self.next_cursor})
+
+
+class LargeTableAdminMixin:
+    """
+    Примесь к ModelAdmin: режим списка для таблиц с миллионами записей.
+
+    Список выбирается KeysetChangeList (страницы по ключу, оценка количества
+    вместо COUNT(*)), сортировка по столбцам отключена: она требует
+    сортировки всей таблицы. Связанные объекты столбцов list_display
+    должны загружаться тем же запросом (list_select_related), а поля
+    внешних ключей в форме - задаваться autocomplete_fields или
+    raw_id_fields, чтобы число запросов на страницу не зависело от размера
+    таблиц.
+    """
+
+    ordering = ("-pk",)
+    show_full_result_count = False
+    sortable_by = ()
+    paginator = CappedPaginator
+    change_list_template = "admin/app_shop/large_change_list.html"
+
+    def get_changelist(self, request, **kwargs):
+        return KeysetChangeList
@@ -0,0 +1,143 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from .bulk import in_chunks
+from .models import *
+from .serializers import CategorySerializer, PriceSerializer, ProductSerializer
+
+
+__all__ = ["CHANGE_RESOURCES", "get_changes_settings", "change_horizon", "last_change", "prune_changes", "read_changes"]
+
+
+CHANGE_RESOURCES = {
+    "category": (Category, CategorySerializer),
+    "product": (Product, ProductSerializer),
+    "price": (Price, PriceSerializer),
+}
+
+
+def get_changes_settings():
+    """
+    Возвращает настройки журнала изменений SHOP_CHANGES: срок хранения
+    записей в днях (RETENTION_DAYS).
+    """
+    return {"RETENTION_DAYS": 30, **getattr(settings, "SHOP_CHANGES", {})}
+
+
+def change_horizon():
+    """
+    Возвращает номер последнего удаленного из журнала изменения (0, если
+    журнал не сокращался). Чтение после меньшего номера пропустит изменения.
+    """
+    oldest = Change.objects.aggregate(seq=Min("seq"))["seq"]
+    return oldest - 1 if oldest else 0
+
+
+def last_change():
+    """
+    Возвращает номер последнего изменения журнала (0 для пустого журнала).
+    """
+    return Change.objects.order_by("-seq").values_list("seq", flat=True).first() or 0
+
+
+def prune_changes(days=None, batch_size=1000):
+    """
+    Удаляет из начала журнала записи старше days дней пачками.
+
+    Удаляется только непрерывное начало журнала, а последняя запись
+    сохраняется всегда, поэтому номер первой оставшейся записи определяет
+    границу (change_horizon), после которой журнал полон.
+
+    Параметры
+    ----------
+    days : int | None
+        Срок хранения записей в днях; None - из настройки RETENTION_DAYS.
+    batch_size : int
+        Количество записей, удаляемых в одной транзакции.
+
+    Возвращает
+    ----------
+    int
+        Количество удаленных записей.
+    """
+    if days is None:
+        days = get_changes_settings()["RETENTION_DAYS"]
+    before = timezone.now() - timedelta(days=days)
+    boundary = Change.objects.filter(
+        changed_at__lt=before, seq__lt=last_change()
+    ).aggregate(seq=Max("seq"))["seq"]
+    if boundary is None:
+        return 0
+
+    deleted = 0
+    start = change_horizon()
+    while start < boundary:
+        end = min(start + batch_size, boundary)
+        with transaction.atomic():
+            deleted += Change.objects.filter(seq__lte=end).delete()[0]
+        start = end
+    return deleted
+
+
+def read_changes(since=0, limit=1000):
+    """
+    Читает изменения каталога, следующие за номером since, в порядке фиксации.
+
+    Стоимость чтения зависит только от числа изменений после since, а не от
+    размера каталога. Если объект менялся несколько раз, возвращается одна
+    запись с его текущим состоянием и номером последнего изменения. Удаленные
+    объекты возвращаются без данных (``data`` равно None). Объект, созданный
+    и затем измененный в пределах выборки, остается созданным.
+
+    Параметры
+    ----------
+    since : int
+        Номер последнего полученного клиентом изменения; 0 - с начала журнала.
+    limit : int
+        Максимальное число записей журнала за один вызов.
+
+    Возвращает
+    ----------
+    tuple[int, bool, list[dict]]
+        Номер, с которого продолжать чтение, признак наличия следующих
+        изменений и записи вида ``{"seq", "resource", "id", "operation",
+        "changed_at", "data"}``.
+    """
+    changes = list(Change.objects.filter(seq__gt=since).order_by("seq")[:limit + 1])
+    has_more = len(changes) > limit
+    changes = changes[:limit]
+    cursor = changes[-1].seq if changes else since
+
+    latest = {}
+    for change in changes:
+        key = (change.resource, change.object_id)
+        previous = latest.pop(key, None)
+        operation = change.operation
+        if previous is not None and previous[1] == Change.CREATED and operation == Change.UPDATED:
+            operation = Change.CREATED
+        latest[key] = (change, operation)
+
+    objects = {}
+    for resource, (model, _) in CHANGE_RESOURCES.items():
+        ids = [pk for (name, pk), (_, operation) in latest.items() if name == resource and operation != Change.DELETED]
+        objects[resource] = {obj.pk: obj for obj in in_chunks(model.objects.all(), "pk", ids)}
+
+    entries = []
+    for (resource, pk), (change, operation) in latest.items():
+        obj = objects[resource].get(pk)
+        if obj is None:
+            # Объект удален позже последней записи выборки.
+            operation = Change.DELETED
+        entries.append({
+            "seq": change.seq,
+            "resource": resource,
+            "id": pk,
+            "operation": operation,
+            "changed_at": change.changed_at,
+            "data": None if obj is None else CHANGE_RESOURCES[resource][1](obj).data,
+        })
+    return cursor, has_more, entries
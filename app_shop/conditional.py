@@ -0,0 +1,118 @@
+import hashlib
+from calendar import timegm
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .models import *
+
+
+__all__ = ["ConditionalGetMixin"]
+
+
+class ConditionalGetMixin:
+    """
+    Примесь к ModelViewSet: условные GET-запросы (ETag / Last-Modified) для списка и объекта.
+
+    Для списка ETag строится по версиям коллекций (ResourceVersion),
+    для объекта - по его полю updated_at. Если клиент прислал совпадающий
+    If-None-Match, возвращается 304 Not Modified без загрузки объектов и
+    работы сериализаторов.
+
+    If-Modified-Since не проверяется: Last-Modified имеет точность в одну
+    секунду, и после двух изменений в пределах секунды клиент получил бы
+    устаревший ответ 304. Заголовок Last-Modified отдается справочно.
+
+    Поля
+    ----
+    version_resource:
+        Коллекция, к которой относится ресурс.
+    """
+
+    version_resource = None
+
+    def get_related_resources(self):
+        """
+        Возвращает другие коллекции, от которых зависит представление текущего запроса.
+        """
+        return ()
+
+    def get_state_annotations(self):
+        """
+        Возвращает дополнительные выражения состояния объекта для ETag
+        (словарь имя - выражение), вычисляемые в том же запросе, что и updated_at.
+
+        Если значение выражения не None, объект может измениться без
+        изменения updated_at, и заголовок Last-Modified не используется.
+        """
+        return {}
+
+    def get_list_state(self):
+        """
+        Возвращает дополнительное состояние списка для ETag, которое не
+        отражают версии коллекций (список пар).
+
+        Если состояние не пустое, заголовок Last-Modified не используется.
+        """
+        return []
+
+    def list(self, request, *args, **kwargs):
+        versions = ResourceVersion.get_versions([self.version_resource, *self.get_related_resources()])
+        state = self.get_list_state()
+        etag = self.make_etag(request, sorted(versions.items()) + state)
+        last_modified = max((updated_at for _, updated_at in versions.values() if updated_at), default=None)
+        if state:
+            last_modified = None
+        return self.conditional(request, etag, last_modified, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        annotations = self.get_state_annotations()
+        try:
+            state = (
+                self.filter_queryset(self.get_queryset())
+                .prefetch_related(None)
+                .filter(**{self.lookup_field: kwargs[lookup_url_kwarg]})
+                .annotate(**annotations)
+                .values_list("pk", "updated_at", *annotations)
+                .first()
+            )
+        except (TypeError, ValueError, DjangoValidationError):
+            # Некорректный ключ: ответ 404 формирует get_object.
+            state = None
+        if state is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        related = self.get_related_resources()
+        versions = ResourceVersion.get_versions(related) if related else {}
+        etag = self.make_etag(request, [state, *sorted(versions.items())])
+        last_modified = max([state[1], *(updated_at for _, updated_at in versions.values() if updated_at)])
+        if any(value is not None for value in state[2:]):
+            last_modified = None
+        return self.conditional(request, etag, last_modified, super().retrieve, *args, **kwargs)
+
+    def conditional(self, request, etag, last_modified, handler, *args, **kwargs):
+        """
+        Отвечает 304 Not Modified при совпадении ETag, иначе вызывает handler
+        и добавляет к ответу заголовки ETag и Last-Modified.
+        """
+        timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+        # Только ETag: точность Last-Modified недостаточна для ответа 304.
+        not_modified = get_conditional_response(request._request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            response["ETag"] = etag
+            if timestamp is not None:
+                response["Last-Modified"] = http_date(timestamp)
+        return response
+
+    def make_etag(self, request, state):
+        """
+        Строит сильный ETag по состоянию данных, пути с параметрами запроса и формату ответа.
+        """
+        key = repr((state, request.get_full_path(), request.META.get("HTTP_ACCEPT", "")))
+        return quote_etag(hashlib.sha1(key.encode()).hexdigest())
@@ -0,0 +1,137 @@
+from decimal import ROUND_HALF_EVEN, Context, Decimal
+
+from django.db import transaction
+
+from .bulk import in_chunks
+from .models import *
+
+
+__all__ = ["RATES_RESOURCE", "get_rates", "set_rates", "convert", "resolve_prices"]
+
+
+# Коллекция ResourceVersion, версия которой меняется при любом изменении курсов.
+RATES_RESOURCE = "exchange_rate"
+
+CENT = Decimal("0.01")
+
+# Точности хватает для точного произведения суммы (10 цифр) на курс (15 цифр).
+CONTEXT = Context(prec=34, rounding=ROUND_HALF_EVEN)
+
+# Кэш курсов процесса: (версия курсов, {валюта: курс}). Заменяется одним
+# присваиванием, поэтому читатели видят либо старые, либо новые курсы целиком.
+_rates = None
+
+
+def _version():
+    return ResourceVersion.objects.filter(name=RATES_RESOURCE).values_list("version", flat=True).first() or 0
+
+
+def get_rates():
+    """
+    Возвращает курсы валют из кэша процесса, перечитывая их при изменении.
+
+    Актуальность кэша проверяется одним запросом версии курсов
+    (ResourceVersion), которую в той же транзакции увеличивают триггеры
+    таблицы курсов, поэтому изменение курсов в любом процессе сбрасывает
+    кэш во всех процессах. Курсы читаются между двумя чтениями версии и
+    принимаются, только если версия не изменилась: в кэш не попадает
+    смесь курсов до и после изменения.
+
+    Возвращает
+    ----------
+    dict[str, Decimal]
+        Курс по коду валюты.
+    """
+    global _rates
+    version = _version()
+    cached = _rates
+    if cached is not None and cached[0] == version:
+        return cached[1]
+    while True:
+        rates = dict(ExchangeRate.objects.values_list("currency", "rate"))
+        current = _version()
+        if current == version:
+            break
+        version = current
+    _rates = (version, rates)
+    return rates
+
+
+def set_rates(rates):
+    """
+    Создает или обновляет курсы валют в одной транзакции.
+
+    Параметры
+    ----------
+    rates : dict[str, Decimal]
+        Курс по коду валюты.
+    """
+    with transaction.atomic():
+        for currency, rate in rates.items():
+            ExchangeRate.objects.update_or_create(currency=currency, defaults={"rate": rate})
+
+
+def convert(amount, source, target, rates):
+    """
+    Переводит сумму из валюты source в валюту target.
+
+    Результат округляется до копеек по правилу банковского округления
+    (ROUND_HALF_EVEN).
+
+    Параметры
+    ----------
+    amount : Decimal
+        Сумма в валюте source.
+    source, target : str
+        Коды валют.
+    rates : dict[str, Decimal]
+        Курсы валют (get_rates).
+
+    Возвращает
+    ----------
+    Decimal | None
+        Сумма в валюте target или None, если для одной из валют нет курса.
+    """
+    if source == target:
+        return amount.quantize(CENT, rounding=ROUND_HALF_EVEN)
+    if source not in rates or target not in rates:
+        return None
+    value = CONTEXT.divide(CONTEXT.multiply(amount, rates[source]), rates[target])
+    return value.quantize(CENT, context=CONTEXT)
+
+
+def resolve_prices(product_ids, currency, rates):
+    """
+    Подбирает цену товаров в валюте currency одним запросом на пачку товаров.
+
+    Цена в валюте currency используется как есть; если ее нет, берется
+    наименьшая из цен в других валютах после перевода (при равенстве -
+    цена с меньшим кодом валюты). Цены в валютах без курса не учитываются.
+
+    Параметры
+    ----------
+    product_ids : Iterable[int]
+        Идентификаторы товаров.
+    currency : str
+        Код валюты.
+    rates : dict[str, Decimal]
+        Курсы валют (get_rates).
+
+    Возвращает
+    ----------
+    dict[int, dict | None]
+        Цена по идентификатору товара вида
+        ``{"currency": str, "amount": Decimal, "source_currency": str}``
+        или None, если цену подобрать нельзя.
+    """
+    best = dict.fromkeys(product_ids)
+    prices = Price.objects.order_by().values_list("product_id", "currency", "amount")
+    for product_id, source, amount in in_chunks(prices, "product_id", list(best)):
+        converted = convert(amount, source, currency, rates)
+        if converted is None:
+            continue
+        key = (source != currency, converted, source)
+        current = best[product_id]
+        if current is None or key < current[0]:
+            best[product_id] = (key, {"currency": currency, "amount": converted, "source_currency": source})
+    return {product_id: item and item[1] for product_id, item in best.items()}
@@ -0,0 +1,338 @@
+import asyncio
+import contextvars
+import json
+from collections import defaultdict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.module_loading import import_string
+
+from .bulk import in_chunks
+from .models import *
+from .serializers import ProductPriceSerializer, ProductSerializer
+
+
+__all__ = [
+    "get_event_settings",
+    "LocalBackend",
+    "ChangeLogBackend",
+    "Subscription",
+    "Broadcaster",
+    "get_broadcaster",
+    "publish_changes",
+]
+
+
+def get_event_settings():
+    """
+    Возвращает настройки потока изменений SHOP_EVENTS: путь к классу
+    доставки изменений (BACKEND) и его параметры (OPTIONS), окно
+    объединения изменений в миллисекундах (COALESCE_MS), интервал
+    служебных сообщений потока в секундах (HEARTBEAT) и наибольшее число
+    товаров и категорий в одной подписке (MAX_SUBSCRIPTIONS).
+    """
+    return {
+        "BACKEND": "app_shop.events.LocalBackend",
+        "OPTIONS": {},
+        "COALESCE_MS": 250,
+        "HEARTBEAT": 15,
+        "MAX_SUBSCRIPTIONS": 500,
+        **getattr(settings, "SHOP_EVENTS", {}),
+    }
+
+
+class LocalBackend:
+    """
+    Доставка изменений внутри процесса: изменения, зафиксированные в
+    процессе, получают подписчики того же процесса.
+
+    Подходит для одного процесса ASGI-сервера, который и изменяет данные,
+    и обслуживает потоки. Доставка между процессами реализуется другим
+    классом с теми же методами: publish передает изменения остальным
+    процессам, а полученные изменения передаются в Broadcaster.receive.
+    """
+
+    def __init__(self, broadcaster, **options):
+        self.broadcaster = broadcaster
+
+    def publish(self, product_ids, kind):
+        """
+        Передает изменения товаров; вызывается после фиксации транзакции в любом потоке.
+        """
+        self.broadcaster.receive(product_ids, kind)
+
+    def start(self):
+        """
+        Вызывается в цикле событий при появлении первого подписчика.
+        """
+
+    def stop(self):
+        """
+        Вызывается в цикле событий после ухода последнего подписчика.
+        """
+
+
+class ChangeLogBackend(LocalBackend):
+    """
+    Доставка изменений между процессами через журнал изменений (Change).
+
+    Пока есть подписчики, журнал опрашивается каждые interval секунд
+    (параметр OPTIONS) одним запросом по номеру последней прочитанной
+    записи. Журнал ведут триггеры БД, поэтому изменения других процессов
+    (WSGI-сервер, команды управления) попадают в поток без внешних
+    сервисов; задержка доставки не превышает интервала опроса. Цены
+    сопоставляются товарам по текущим строкам, поэтому удаление цены в
+    поток не попадает.
+    """
+
+    def __init__(self, broadcaster, interval=1.0, **options):
+        super().__init__(broadcaster, **options)
+        self.interval = interval
+        self.task = None
+
+    def publish(self, product_ids, kind):
+        # Изменения текущего процесса тоже читаются из журнала.
+        pass
+
+    def start(self):
+        # Опрос не относится к запросу, открывшему первый поток.
+        self.task = asyncio.get_running_loop().create_task(self.poll(), context=contextvars.Context())
+
+    def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def poll(self):
+        cursor = await sync_to_async(self.last_seq)()
+        while True:
+            await asyncio.sleep(self.interval)
+            cursor, changes = await sync_to_async(self.read)(cursor)
+            for kind, product_ids in changes.items():
+                self.broadcaster.receive(product_ids, kind)
+
+    def last_seq(self):
+        return Change.objects.order_by("-seq").values_list("seq", flat=True).first() or 0
+
+    def read(self, cursor, limit=1000):
+        """
+        Возвращает номер последней прочитанной записи журнала и
+        идентификаторы измененных товаров по видам изменений.
+        """
+        rows = list(
+            Change.objects.filter(seq__gt=cursor, resource__in=("product", "price"))
+            .order_by("seq")
+            .values_list("seq", "resource", "object_id")[:limit]
+        )
+        if not rows:
+            return cursor, {}
+        products = {object_id for _, resource, object_id in rows if resource == "product"}
+        price_ids = {object_id for _, resource, object_id in rows if resource == "price"}
+        prices = {product_id for _, product_id in in_chunks(Price.objects.values_list("pk", "product_id"), "pk", price_ids)}
+        return rows[-1][0], {kind: ids for kind, ids in (("product", products), ("price", prices)) if ids}
+
+
+class Subscription:
+    """
+    Подписка потока на изменения товаров и товаров категорий.
+
+    Изменения, которые клиент еще не получил, объединяются: для каждого
+    товара хранится только последнее событие, поэтому медленный клиент
+    занимает память не больше числа товаров подписки.
+
+    Поля
+    ----
+    products:
+        Идентификаторы товаров.
+    categories:
+        Идентификаторы категорий.
+    """
+
+    def __init__(self, products=(), categories=()):
+        self.products = frozenset(products)
+        self.categories = frozenset(categories)
+        self.pending = {}
+        self.ready = asyncio.Event()
+
+    def put(self, product_id, message):
+        self.pending[product_id] = message
+        self.ready.set()
+
+    async def get(self, timeout=None):
+        """
+        Ожидает изменения и возвращает их сообщения; по истечении timeout
+        секунд возвращает пустой список.
+        """
+        try:
+            await asyncio.wait_for(self.ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self.ready.clear()
+        messages, self.pending = list(self.pending.values()), {}
+        return messages
+
+
+class Broadcaster:
+    """
+    Рассылка изменений товаров подписчикам потоков событий.
+
+    Изменения, полученные от backend в течение окна COALESCE_MS, собираются
+    вместе: состояние всех измененных товаров читается одним запросом на
+    пачку (цены - еще одним), каждое событие кодируется один раз и
+    раздается подписчикам по индексам «товар - подписки» и «категория -
+    подписки». Стоимость изменения не зависит от числа подключений, кроме
+    раздачи готовых сообщений.
+
+    Все подписки обслуживаются одним циклом событий (ASGI-сервера);
+    изменения принимаются из любого потока.
+
+    Параметры
+    ----------
+    backend : type | None
+        Класс доставки изменений; None - класс из SHOP_EVENTS["BACKEND"].
+    coalesce_ms : int | None
+        Окно объединения изменений; None - SHOP_EVENTS["COALESCE_MS"].
+    """
+
+    def __init__(self, backend=None, coalesce_ms=None):
+        options = get_event_settings()
+        self.coalesce = (options["COALESCE_MS"] if coalesce_ms is None else coalesce_ms) / 1000
+        backend = backend or import_string(options["BACKEND"])
+        self.backend = backend(self, **options["OPTIONS"])
+        self.loop = None
+        self.by_product = defaultdict(set)
+        self.by_category = defaultdict(set)
+        self.subscriptions = 0
+        self.pending = {}
+        self.flush_task = None
+        self.lock = None
+        self.seq = 0
+
+    def subscribe(self, products=(), categories=()):
+        """
+        Создает подписку; вызывается в цикле событий.
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            if self.subscriptions:
+                raise RuntimeError("Подписки уже обслуживает другой цикл событий.")
+            self.loop, self.lock, self.pending, self.flush_task = loop, asyncio.Lock(), {}, None
+        subscription = Subscription(products, categories)
+        for product_id in subscription.products:
+            self.by_product[product_id].add(subscription)
+        for category_id in subscription.categories:
+            self.by_category[category_id].add(subscription)
+        self.subscriptions += 1
+        if self.subscriptions == 1:
+            self.backend.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for index, keys in ((self.by_product, subscription.products), (self.by_category, subscription.categories)):
+            for key in keys:
+                index[key].discard(subscription)
+                if not index[key]:
+                    del index[key]
+        self.subscriptions -= 1
+        if not self.subscriptions:
+            self.backend.stop()
+
+    def publish(self, product_ids, kind):
+        """
+        Публикует изменения товаров через backend.
+
+        Параметры
+        ----------
+        product_ids : Iterable[int]
+            Идентификаторы измененных товаров.
+        kind : str
+            Вид изменения: ``product`` (товар или его остаток) или ``price``.
+        """
+        if self.subscriptions:
+            self.backend.publish(list(product_ids), kind)
+
+    def receive(self, product_ids, kind):
+        """
+        Принимает изменения от backend в любом потоке.
+        """
+        loop = self.loop
+        if loop is None or not self.subscriptions or not product_ids:
+            return
+        try:
+            # Рассылка выполняется вне контекста изменившего данные запроса
+            # (переменные контекста, поток sync_to_async).
+            loop.call_soon_threadsafe(self.collect, product_ids, kind, context=contextvars.Context())
+        except RuntimeError:
+            # Цикл событий завершен.
+            pass
+
+    def collect(self, product_ids, kind):
+        for product_id in product_ids:
+            self.pending.setdefault(product_id, set()).add(kind)
+        if self.flush_task is None:
+            self.flush_task = self.loop.create_task(self.flush())
+
+    async def flush(self):
+        await asyncio.sleep(self.coalesce)
+        pending, self.pending, self.flush_task = self.pending, {}, None
+        if not self.by_category:
+            pending = {product_id: kinds for product_id, kinds in pending.items() if product_id in self.by_product}
+        if not pending:
+            return
+        # Рассылки идут по порядку: более позднее состояние не перезаписывается ранним.
+        async with self.lock:
+            states, prices = await sync_to_async(self.load)(pending)
+            self.seq += 1
+            for product_id, kinds in pending.items():
+                state = states.get(product_id)
+                data = {
+                    "id": product_id,
+                    "changes": sorted(kinds),
+                    "deleted": state is None,
+                    "product": state,
+                }
+                if "price" in kinds and state is not None:
+                    data["prices"] = prices.get(product_id, [])
+                message = f"id: {self.seq}\nevent: product\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n".encode()
+                targets = self.by_product.get(product_id, set())
+                if state is not None and state["category"] in self.by_category:
+                    targets = targets | self.by_category[state["category"]]
+                for subscription in targets:
+                    subscription.put(product_id, message)
+
+    def load(self, pending):
+        """
+        Читает текущее состояние и цены измененных товаров.
+        """
+        rows = in_chunks(ProductSerializer.fast_values(Product.objects.all()), "id", pending)
+        states = {item["id"]: item for item in ProductSerializer.fast_data(list(rows))}
+        priced = [product_id for product_id, kinds in pending.items() if "price" in kinds and product_id in states]
+        prices = defaultdict(list)
+        for price in in_chunks(Price.objects.order_by("id"), "product_id", priced):
+            prices[price.product_id].append(ProductPriceSerializer(price).data)
+        return states, prices
+
+
+_broadcaster = None
+
+
+def get_broadcaster():
+    """
+    Возвращает рассылку изменений процесса, создавая ее по настройкам SHOP_EVENTS.
+    """
+    global _broadcaster
+    if _broadcaster is None:
+        _broadcaster = Broadcaster()
+    return _broadcaster
+
+
+def publish_changes(product_ids, kind):
+    """
+    Публикует изменения товаров после фиксации текущей транзакции.
+    """
+    broadcaster = get_broadcaster()
+    if broadcaster.subscriptions:
+        product_ids = list(product_ids)
+        transaction.on_commit(lambda: broadcaster.publish(product_ids, kind))
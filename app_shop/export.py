@@ -0,0 +1,137 @@
+import csv
+import json
+
+from django.db.models import Prefetch
+
+from .models import *
+from .stock import stock_quantities
+
+
+__all__ = ["EXPORT_FORMATS", "iter_catalog", "render_catalog"]
+
+
+CSV_HEADER = ("id", "name", "quantity", "barcode", "updated_at", "category_id", "category_name", "prices")
+
+
+def iter_catalog(chunk_size=2000):
+    """
+    Построчно выбирает каталог: товары с категорией и ценами.
+
+    Товары читаются серверным итератором пачками по chunk_size строк,
+    цены для каждой пачки подгружаются одним запросом. В памяти
+    одновременно находится не более одной пачки. Остаток товаров с
+    раздельным остатком (сумма слотов) читается заранее одним запросом:
+    таких товаров немного.
+
+    Параметры
+    ----------
+    chunk_size : int
+        Количество товаров, выбираемых из БД за один раз.
+
+    Возвращает
+    ----------
+    Iterator[dict]
+        Записи вида ``{"id", "name", "quantity", "barcode", "updated_at",
+        "category": {"id", "name"} | None, "prices": [{"currency", "amount"}]}``.
+    """
+    sharded = stock_quantities()
+    products = (
+        Product.objects
+        .select_related("category")
+        .prefetch_related(Prefetch("price_set", queryset=Price.objects.order_by("currency")))
+        .order_by("pk")
+        .iterator(chunk_size=chunk_size)
+    )
+    for product in products:
+        category = product.category
+        yield {
+            "id": product.pk,
+            "name": product.name,
+            "quantity": sharded.get(product.pk, 0) if product.stock_slots else product.quantity,
+            "barcode": product.barcode,
+            "updated_at": product.updated_at.isoformat(),
+            "category": None if category is None else {"id": category.pk, "name": category.name},
+            "prices": [
+                {"currency": price.currency, "amount": str(price.amount)}
+                for price in product.price_set.all()
+            ],
+        }
+
+
+def render_jsonl(records, lines_per_chunk=500):
+    """
+    Сериализует записи в JSON Lines, отдавая текст частями по lines_per_chunk строк.
+    """
+    chunk = []
+    for record in records:
+        chunk.append(json.dumps(record, ensure_ascii=False))
+        if len(chunk) >= lines_per_chunk:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+
+class _Buffer:
+    """
+    Псевдобуфер для csv.writer: возвращает записанную строку вместо ее хранения.
+    """
+
+    def write(self, value):
+        return value
+
+
+def render_csv(records, lines_per_chunk=500):
+    """
+    Сериализует записи в CSV, отдавая текст частями по lines_per_chunk строк.
+
+    Цены записываются в одну колонку в виде ``USD:1.00;EUR:2.00``.
+    """
+    writer = csv.writer(_Buffer())
+    chunk = [writer.writerow(CSV_HEADER)]
+    for record in records:
+        category = record["category"] or {"id": "", "name": ""}
+        prices = ";".join(f"{price['currency']}:{price['amount']}" for price in record["prices"])
+        chunk.append(writer.writerow((
+            record["id"],
+            record["name"],
+            record["quantity"],
+            record["barcode"],
+            record["updated_at"],
+            category["id"],
+            category["name"],
+            prices,
+        )))
+        if len(chunk) >= lines_per_chunk:
+            yield "".join(chunk)
+            chunk = []
+    if chunk:
+        yield "".join(chunk)
+
+
+EXPORT_FORMATS = {
+    "csv": (render_csv, "text/csv; charset=utf-8"),
+    "jsonl": (render_jsonl, "application/x-ndjson; charset=utf-8"),
+}
+
+
+def render_catalog(output, chunk_size=2000):
+    """
+    Возвращает генератор текста каталога в заданном формате.
+
+    Параметры
+    ----------
+    output : str
+        Формат выгрузки: ``csv`` или ``jsonl``.
+    chunk_size : int
+        Количество товаров, выбираемых из БД за один раз.
+
+    Исключения
+    ----------
+    ValueError
+        Вызывается, если формат не поддерживается.
+    """
+    if output not in EXPORT_FORMATS:
+        raise ValueError(f"Неизвестный формат выгрузки: {output}.")
+    render, _ = EXPORT_FORMATS[output]
+    return render(iter_catalog(chunk_size=chunk_size))
@@ -0,0 +1,330 @@
+import csv
+import json
+import multiprocessing
+import os
+import time
+from dataclasses import dataclass
+from collections import deque
+from itertools import islice
+
+import django
+from django.db import transaction
+
+from .bulk import UpsertResult, add_row, clean_price, clean_row, in_chunks, write_batch
+from .models import *
+from .signals import products_changed
+
+
+__all__ = ["ImportResult", "CatalogImporter", "CSV_COLUMNS"]
+
+
+CSV_COLUMNS = ("type", "name", "description", "barcode", "quantity", "category", "currency", "amount")
+
+
+@dataclass
+class ImportResult(UpsertResult):
+    """
+    Итог загрузки каталога.
+
+    Поля
+    ----
+    categories:
+        Количество созданных категорий.
+    prices:
+        Количество записанных цен.
+    records:
+        Количество обработанных записей файла.
+    elapsed:
+        Время загрузки в секундах.
+    """
+
+    categories: int = 0
+    prices: int = 0
+    records: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def throughput(self):
+        return self.records / self.elapsed if self.elapsed else 0.0
+
+
+def read_lines(source, offset=0):
+    """
+    Читает двоичный файл построчно, начиная со смещения offset.
+
+    Возвращает
+    ----------
+    Iterator[tuple[int, bytes]]
+        Смещение конца строки и сама строка.
+    """
+    source.seek(offset)
+    while True:
+        line = source.readline()
+        if not line:
+            return
+        yield source.tell(), line
+
+
+def parse_line(line, fmt, header=None):
+    """
+    Разбирает и проверяет одну запись файла каталога.
+
+    Стадия не обращается к БД, поэтому может выполняться в отдельных процессах.
+
+    Параметры
+    ----------
+    line : bytes
+        Строка файла.
+    fmt : str
+        Формат файла: ``jsonl`` или ``csv``.
+    header : list[str] | None
+        Заголовок CSV.
+
+    Возвращает
+    ----------
+    tuple[str, object]
+        Вид записи (``category``, ``product``, ``price``, ``skip``)
+        и ее данные либо ``("error", сообщение)``.
+    """
+    text = line.decode("utf-8").strip()
+    if not text:
+        return "skip", None
+    try:
+        if fmt == "jsonl":
+            record = json.loads(text)
+            if not isinstance(record, dict):
+                raise ValueError("Запись должна быть объектом.")
+        else:
+            values = next(csv.reader([text]))
+            record = {key: value for key, value in zip(header, values) if value != ""}
+            if "quantity" in record:
+                record["quantity"] = int(record["quantity"])
+
+        kind = record.get("type")
+        if kind == "category":
+            name = record.get("name")
+            if not isinstance(name, str) or not name or len(name) > 100:
+                raise ValueError("Некорректное название категории.")
+            return kind, (name, record.get("description") or "")
+        if kind == "product":
+            category = record.get("category")
+            if category is not None and not isinstance(category, str):
+                raise ValueError("Категория задается названием.")
+            product, _ = clean_row({
+                "barcode": record.get("barcode"),
+                "name": record.get("name"),
+                "quantity": record.get("quantity"),
+            })
+            return kind, (product, category)
+        if kind == "price":
+            barcode = record.get("barcode")
+            if not isinstance(barcode, str) or not barcode:
+                raise ValueError("Некорректный штрихкод.")
+            return kind, (barcode, clean_price(record))
+        raise ValueError("Неизвестный тип записи.")
+    except (ValueError, UnicodeDecodeError) as e:
+        return "error", str(e)
+
+
+def parse_chunk(chunk, fmt, header=None):
+    """
+    Разбирает пачку строк ``(номер, смещение, строка)`` функцией parse_line.
+    """
+    return [(number, offset, parse_line(line, fmt, header)) for number, offset, line in chunk]
+
+
+class CatalogImporter:
+    """
+    Потоковая загрузка каталога (категории, товары, цены) из CSV или JSON Lines.
+
+    Файл обрабатывается конвейером генераторов: чтение строк, разбор и
+    проверка (по желанию в пуле процессов), сопоставление категорий по
+    названию через словарь в памяти и запись пачками в единственном
+    процессе. После фиксации каждой пачки смещение в файле сохраняется
+    в контрольную точку, с которой загрузка продолжается после сбоя.
+
+    Поля
+    ----
+    path:
+        Путь к файлу каталога.
+    fmt:
+        Формат файла: ``jsonl`` или ``csv``.
+    batch_size:
+        Количество записей в одной транзакции.
+    checkpoint:
+        Путь к файлу контрольной точки или None.
+    workers:
+        Количество процессов разбора; 0 - разбор в текущем процессе.
+    """
+
+    def __init__(self, path, fmt="jsonl", batch_size=5000, checkpoint=None, workers=0, progress=None):
+        if fmt not in ("jsonl", "csv"):
+            raise ValueError(f"Неизвестный формат файла: {fmt}.")
+        if batch_size <= 0:
+            raise ValueError("Размер пачки должен быть положительным.")
+        self.path = path
+        self.fmt = fmt
+        self.batch_size = batch_size
+        self.checkpoint = checkpoint
+        self.workers = workers
+        self.progress = progress
+        self.result = ImportResult()
+        self.categories = {}
+        self.pending_categories = {}
+        self.pending_products = {}
+        self.product_categories = {}
+        self.pending_prices = []
+        self.pending = 0
+
+    def run(self):
+        """
+        Выполняет загрузку и возвращает ImportResult.
+        """
+        started = time.monotonic()
+        state = self.load_checkpoint()
+        self.categories = dict(Category.objects.order_by("-pk").values_list("name", "pk"))
+
+        with open(self.path, "rb") as source:
+            header = None
+            offset = state["offset"]
+            first_line = state["line"] + 1
+            if self.fmt == "csv":
+                header = next(csv.reader([source.readline().decode("utf-8")]))
+                unknown = set(header) - set(CSV_COLUMNS)
+                if unknown:
+                    raise ValueError(f"Неизвестные колонки CSV: {', '.join(sorted(unknown))}.")
+                offset = max(offset, source.tell())
+                first_line = max(first_line, 2)
+            lines = (
+                (number, end, line)
+                for number, (end, line) in enumerate(read_lines(source, offset), start=first_line)
+            )
+            for number, end, (kind, payload) in self.parse(lines, header):
+                self.add(number, kind, payload)
+                self.result.records += 1
+                state = {"offset": end, "line": number}
+                if self.pending >= self.batch_size:
+                    self.flush(state)
+                    self.report(started)
+            self.flush(state)
+
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            os.remove(self.checkpoint)
+        self.result.elapsed = time.monotonic() - started
+        return self.result
+
+    def parse(self, lines, header):
+        """
+        Стадия разбора: в текущем процессе или в пуле процессов с сохранением порядка.
+        """
+        if not self.workers:
+            for number, end, line in lines:
+                yield number, end, parse_line(line, self.fmt, header)
+            return
+
+        # Пул получает не больше двух пачек на процесс вперед, чтобы чтение
+        # файла не опережало запись и память оставалась ограниченной.
+        chunks = iter(lambda: list(islice(lines, 1000)), [])
+        window = deque()
+        # Дочерние процессы не наследуют состояние Django, поэтому настраивают его сами.
+        with multiprocessing.get_context("spawn").Pool(self.workers, initializer=django.setup) as pool:
+            for chunk in chunks:
+                window.append(pool.apply_async(parse_chunk, (chunk, self.fmt, header)))
+                if len(window) >= self.workers * 2:
+                    yield from window.popleft().get()
+            while window:
+                yield from window.popleft().get()
+
+    def add(self, number, kind, payload):
+        """
+        Стадия сопоставления: переносит разобранную запись в буфер записи.
+        """
+        if kind == "skip":
+            return
+        if kind == "error":
+            self.result.reject(number, payload)
+            return
+        if kind == "category":
+            name, description = payload
+            if name not in self.categories and name not in self.pending_categories:
+                self.pending_categories[name] = Category(name=name, description=description)
+                self.pending += 1
+            return
+        if kind == "product":
+            product, category = payload
+            if category is not None and category not in self.categories and category not in self.pending_categories:
+                self.result.reject(number, "Категория не найдена.")
+                return
+            if not add_row(self.pending_products, number, product, [], self.result):
+                return
+            if category is not None:
+                # Новая категория получит идентификатор при записи пачки.
+                self.product_categories[product.barcode] = category
+        else:
+            self.pending_prices.append((number, *payload))
+        self.pending += 1
+
+    def flush_categories(self):
+        created = Category.objects.bulk_create(self.pending_categories.values())
+        self.categories.update((category.name, category.pk) for category in created)
+        self.result.categories += len(created)
+        self.pending_categories = {}
+
+    def flush(self, state):
+        """
+        Стадия записи: сохраняет буферы (категории, товары, цены) в одной
+        транзакции и обновляет контрольную точку. Запись, повторенная после
+        сбоя с контрольной точки, не находит уже созданных ею категорий.
+        """
+        with transaction.atomic():
+            if self.pending_categories:
+                self.flush_categories()
+            if self.pending_products:
+                for barcode, category in self.product_categories.items():
+                    self.pending_products[barcode][1].category_id = self.categories[category]
+                write_batch(self.pending_products, self.result)
+            if self.pending_prices:
+                self.flush_prices()
+        self.pending_products = {}
+        self.product_categories = {}
+        self.pending_prices = []
+        self.pending = 0
+        self.save_checkpoint(state)
+
+    def flush_prices(self):
+        barcodes = {barcode for _, barcode, _ in self.pending_prices}
+        ids = dict(in_chunks(Product.objects.values_list("barcode", "pk"), "barcode", barcodes))
+        prices = {}
+        for number, barcode, price in self.pending_prices:
+            if barcode not in ids:
+                self.result.reject(number, "Товар не найден.")
+                continue
+            price.product_id = ids[barcode]
+            prices[(price.product_id, price.currency)] = price
+        Price.objects.bulk_create(
+            prices.values(),
+            update_conflicts=True,
+            unique_fields=["product", "currency"],
+            update_fields=["amount", "updated_at"],
+        )
+        self.result.prices += len(prices)
+        products_changed.send(sender=Product, product_ids=[pk for pk, _ in prices], barcodes=None, kind="price")
+
+    def load_checkpoint(self):
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            with open(self.checkpoint, encoding="utf-8") as source:
+                return json.load(source)
+        return {"offset": 0, "line": 0}
+
+    def save_checkpoint(self, state):
+        if not self.checkpoint:
+            return
+        temporary = f"{self.checkpoint}.tmp"
+        with open(temporary, "w", encoding="utf-8") as target:
+            json.dump(state, target)
+        os.replace(temporary, self.checkpoint)
+
+    def report(self, started):
+        if self.progress is not None:
+            elapsed = time.monotonic() - started
+            self.progress(self.result.records, self.result.records / elapsed if elapsed else 0.0)
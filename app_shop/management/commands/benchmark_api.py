@@ -0,0 +1,91 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+
+from app_shop.benchmark import DEFAULT_MIX, HttpTarget, InProcessTarget, build_plan, compare, parse_mix, run_plan, summarize
+
+
+class Command(BaseCommand):
+    """
+    Команда нагрузочного теста API на смешанной нагрузке.
+
+    Воспроизводит заданную смесь операций (list, retrieve, barcode, reduce,
+    write) против тестового клиента в процессе или запущенного сервера
+    (--url) и выводит по каждой операции пропускную способность,
+    перцентили задержки и среднее число SQL-запросов (только в процессе).
+    Отчет можно сохранить как базовый (--save) и сравнить с ним следующий
+    запуск (--compare). Операции reduce и write изменяют каталог, поэтому
+    запускать нагрузку следует на отдельной БД, заполненной seed_catalog.
+    """
+
+    help = "Измеряет пропускную способность, задержки и число SQL-запросов API на смешанной нагрузке."
+
+    def add_arguments(self, parser):
+        default_mix = ",".join(f"{name}={weight}" for name, weight in DEFAULT_MIX.items())
+        parser.add_argument("--mix", default=default_mix, help=f"Веса операций (по умолчанию {default_mix}).")
+        parser.add_argument("--requests", type=int, default=2000, help="Количество запросов.")
+        parser.add_argument("--threads", type=int, default=8, help="Количество одновременных запросов.")
+        parser.add_argument("--page-size", type=int, default=20, help="Размер страницы списка.")
+        parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора плана.")
+        parser.add_argument("--url", help="Адрес запущенного сервера; без него запросы выполняются в процессе.")
+        parser.add_argument("--save", help="Сохранить отчет в файл JSON.")
+        parser.add_argument("--compare", help="Сравнить отчет с базовым отчетом из файла JSON.")
+
+    def handle(self, *args, **options):
+        if options["requests"] <= 0 or options["threads"] <= 0 or options["page_size"] <= 0:
+            raise CommandError("Параметры нагрузки должны быть положительными.")
+        baseline = self.read_baseline(options["compare"]) if options["compare"] else None
+        try:
+            mix = parse_mix(options["mix"])
+            plan = build_plan(mix, options["requests"], seed=options["seed"], page_size=options["page_size"])
+        except ValueError as e:
+            raise CommandError(e)
+
+        target = HttpTarget(options["url"]) if options["url"] else InProcessTarget()
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            samples, elapsed = run_plan(target, plan, threads=options["threads"])
+        report = {
+            "target": target.name,
+            "mix": mix,
+            "requests": options["requests"],
+            "threads": options["threads"],
+            "seed": options["seed"],
+            **summarize(samples, elapsed),
+        }
+
+        self.write_report(report)
+        if options["save"]:
+            try:
+                with open(options["save"], "w", encoding="utf-8") as output:
+                    json.dump(report, output, ensure_ascii=False, indent=2)
+            except OSError as e:
+                raise CommandError(e)
+        if baseline is not None:
+            self.write_comparison(compare(report, baseline))
+
+    def read_baseline(self, path):
+        try:
+            with open(path, encoding="utf-8") as source:
+                return json.load(source)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Не удалось прочитать базовый отчет: {e}")
+
+    def write_report(self, report):
+        self.stdout.write(
+            f"{'Операция':<10}{'Запросов':>10}{'Ошибок':>8}{'Запросов/с':>12}"
+            f"{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'SQL':>8}"
+        )
+        for name, stats in {**report["endpoints"], "total": report["total"]}.items():
+            queries = "-" if stats["queries"] is None else f"{stats['queries']:.1f}"
+            self.stdout.write(
+                f"{name:<10}{stats['requests']:>10}{stats['errors']:>8}{stats['rps']:>12.1f}"
+                f"{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['p99']:>10.2f}{queries:>8}"
+            )
+
+    def write_comparison(self, rows):
+        self.stdout.write("")
+        self.stdout.write(f"{'Операция':<10}{'Показатель':>12}{'База':>12}{'Сейчас':>12}{'Изменение':>12}")
+        for name, metric, before, after, change in rows:
+            change = "-" if change is None else f"{change:+.1%}"
+            self.stdout.write(f"{name:<10}{metric:>12}{before:>12.2f}{after:>12.2f}{change:>12}")
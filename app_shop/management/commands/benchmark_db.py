@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from app_shop.benchmark import percentile
+from app_shop.models import Product
+
+
+PROFILES = ("basic", "production")
+
+
+class Command(BaseCommand):
+    """
+    Команда сравнения профилей БД на смешанной нагрузке чтения и записи.
+
+    Для каждого профиля создается временная БД, к которой применяются
+    миграции, и в отдельном процессе (настройки профиля читаются при запуске)
+    несколько потоков выполняют запросы к API: чтение товара и списание
+    товара. Каждый поток работает через собственное соединение, как
+    обработчик запроса сервера приложений.
+    """
+
+    help = "Сравнивает пропускную способность и задержки смешанной нагрузки для профилей БД."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES), help="Профили БД.")
+        parser.add_argument("--threads", type=int, default=8, help="Количество потоков нагрузки.")
+        parser.add_argument("--duration", type=float, default=5.0, help="Длительность нагрузки в секундах.")
+        parser.add_argument("--writes", type=float, default=0.2, help="Доля запросов на списание.")
+        parser.add_argument("--products", type=int, default=1000, help="Количество товаров в тестовой БД.")
+        parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["threads"] <= 0 or options["duration"] <= 0 or options["products"] <= 0:
+            raise CommandError("Количество потоков, длительность и количество товаров должны быть положительными.")
+        if not 0 <= options["writes"] <= 1:
+            raise CommandError("Доля запросов на списание должна быть от 0 до 1.")
+        if options["worker"]:
+            self.stdout.write(json.dumps(self.work(options)))
+            return
+
+        self.stdout.write(
+            f"{'Профиль':<12}{'Запросов/с':>12}{'Чтений':>10}{'Списаний':>10}{'Ошибок':>9}{'p50, мс':>10}{'p99, мс':>10}"
+        )
+        for profile in options["profiles"]:
+            result = self.run_profile(profile, options)
+            self.stdout.write(
+                f"{profile:<12}{result['throughput']:>12.1f}{result['reads']:>10}{result['writes']:>10}"
+                f"{result['errors']:>9}{result['p50'] * 1000:>10.2f}{result['p99'] * 1000:>10.2f}"
+            )
+
+    def run_profile(self, profile, options):
+        """
+        Создает временную БД профиля и запускает нагрузку в отдельном процессе.
+        """
+        manage = [sys.executable, str(settings.BASE_DIR / "manage.py")]
+        arguments = [
+            "--threads", str(options["threads"]),
+            "--duration", str(options["duration"]),
+            "--writes", str(options["writes"]),
+            "--products", str(options["products"]),
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            env = {
+                **os.environ,
+                "SHOP_DB_PROFILE": profile,
+                "SHOP_DB_NAME": os.path.join(directory, "benchmark.sqlite3"),
+            }
+            try:
+                subprocess.run([*manage, "migrate", "-v", "0"], env=env, check=True)
+                completed = subprocess.run(
+                    [*manage, "benchmark_db", "--worker", *arguments],
+                    env=env, check=True, capture_output=True, text=True,
+                )
+            except subprocess.CalledProcessError as e:
+                raise CommandError(f"Нагрузка профиля {profile} завершилась с ошибкой: {e.stderr or e}")
+        return json.loads(completed.stdout.splitlines()[-1])
+
+    def work(self, options):
+        """
+        Выполняет нагрузку на БД текущего профиля и возвращает итоги.
+        """
+        products = Product.objects.bulk_create(
+            Product(name=f"Товар {i}", quantity=10 ** 9, barcode=f"benchmark-{i}")
+            for i in range(options["products"])
+        )
+        ids = [product.pk for product in products]
+        deadline = time.monotonic() + options["duration"]
+
+        def run(seed):
+            rng = random.Random(seed)
+            client = Client()
+            stats = {"reads": 0, "writes": 0, "errors": 0, "latencies": []}
+            try:
+                while time.monotonic() < deadline:
+                    pk = rng.choice(ids)
+                    write = rng.random() < options["writes"]
+                    started = time.perf_counter()
+                    try:
+                        if write:
+                            response = client.post(
+                                reverse("product-reduce-quantity", args=[pk]),
+                                {"amount": 1},
+                                content_type="application/json",
+                            )
+                        else:
+                            response = client.get(reverse("product-detail", args=[pk]))
+                        failed = response.status_code != 200
+                    except OperationalError:
+                        failed = True
+                    stats["latencies"].append(time.perf_counter() - started)
+                    if failed:
+                        stats["errors"] += 1
+                    else:
+                        stats["writes" if write else "reads"] += 1
+            finally:
+                connection.close()
+            return stats
+
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            with ThreadPoolExecutor(options["threads"]) as pool:
+                results = list(pool.map(run, range(options["threads"])))
+
+        latencies = sorted(latency for stats in results for latency in stats["latencies"])
+        reads = sum(stats["reads"] for stats in results)
+        writes = sum(stats["writes"] for stats in results)
+        return {
+            "reads": reads,
+            "writes": writes,
+            "errors": sum(stats["errors"] for stats in results),
+            "throughput": (reads + writes) / options["duration"],
+            "p50": percentile(latencies, 0.5),
+            "p99": percentile(latencies, 0.99),
+        }
+
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from app_shop.models import Category, Price, Product
+from app_shop.renderers import FastJSONRenderer
+from app_shop.serializers import CategorySerializer, PriceSerializer, ProductSerializer
+
+
+SERIALIZERS = {
+    "product": (Product, ProductSerializer),
+    "price": (Price, PriceSerializer),
+    "category": (Category, CategorySerializer),
+}
+
+
+class Command(BaseCommand):
+    """
+    Команда сравнения обычного и быстрого чтения списков.
+
+    Обычный путь: объекты модели, ModelSerializer и JSONRenderer. Быстрый:
+    строки ``values()``, FastReadMixin и FastJSONRenderer. Для каждой
+    коллекции выбирается до --rows записей текущей БД; выводится лучшее
+    время из --repeat повторов и проверяется, что ответы совпадают байт в байт.
+    """
+
+    help = "Сравнивает время обычного и быстрого построения JSON списков каталога."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000, help="Количество записей каждой коллекции.")
+        parser.add_argument("--repeat", type=int, default=5, help="Количество повторов.")
+
+    def handle(self, *args, **options):
+        if options["rows"] <= 0 or options["repeat"] <= 0:
+            raise CommandError("Количество записей и повторов должно быть положительным.")
+
+        self.stdout.write(f"{'Коллекция':<10}{'Записей':>9}{'Обычный, мс':>14}{'Быстрый, мс':>14}{'Ускорение':>11}")
+        for name, (model, serializer_class) in SERIALIZERS.items():
+            queryset = model.objects.order_by("pk")[:options["rows"]]
+
+            def regular():
+                return JSONRenderer().render(serializer_class(queryset, many=True).data)
+
+            def fast():
+                return FastJSONRenderer().render(serializer_class.fast_data(serializer_class.fast_values(queryset)))
+
+            regular_time, regular_output = self.measure(regular, options["repeat"])
+            fast_time, fast_output = self.measure(fast, options["repeat"])
+            if fast_output != regular_output:
+                raise CommandError(f"Ответы обычного и быстрого чтения {name} различаются.")
+            rows = queryset.count()
+            speedup = regular_time / fast_time if fast_time else 0.0
+            self.stdout.write(
+                f"{name:<10}{rows:>9}{regular_time * 1000:>14.2f}{fast_time * 1000:>14.2f}{speedup:>10.1f}x"
+            )
+
+    def measure(self, function, repeat):
+        """
+        Возвращает лучшее время выполнения функции и ее результат.
+        """
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            output = function()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best, output
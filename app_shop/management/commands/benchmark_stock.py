@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection
+
+from app_shop.benchmark import percentile
+from app_shop.models import Product
+from app_shop.stock import MAX_STOCK_SLOTS, set_stock_slots, stock_quantities
+
+
+INITIAL_QUANTITY = 10 ** 9
+
+
+class Command(BaseCommand):
+    """
+    Команда сравнения пропускной способности списаний одного товара:
+    остаток в строке товара и раздельный остаток в слотах.
+
+    Для каждого режима создается временная БД, к которой применяются
+    миграции, и в отдельном процессе несколько потоков списывают один и
+    тот же товар (Product.reduce_quantity) через собственные соединения.
+    После нагрузки проверяется, что остаток уменьшился ровно на число
+    успешных списаний.
+    """
+
+    help = "Сравнивает пропускную способность списаний одного товара без слотов и со слотами."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--slots", type=int, default=16, help="Количество слотов раздельного остатка.")
+        parser.add_argument("--threads", type=int, default=8, help="Количество потоков нагрузки.")
+        parser.add_argument("--duration", type=float, default=5.0, help="Длительность нагрузки в секундах.")
+        parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+
+    def handle(self, *args, **options):
+        if options["threads"] <= 0 or options["duration"] <= 0:
+            raise CommandError("Количество потоков и длительность должны быть положительными.")
+        if options["worker"]:
+            self.stdout.write(json.dumps(self.work(options)))
+            return
+        if not 1 <= options["slots"] <= MAX_STOCK_SLOTS:
+            raise CommandError(f"Количество слотов должно быть от 1 до {MAX_STOCK_SLOTS}.")
+
+        self.stdout.write(
+            f"{'Режим':<14}{'Списаний/с':>12}{'Списаний':>10}{'Ошибок':>9}{'p50, мс':>10}{'p99, мс':>10}{'Остаток':>10}"
+        )
+        for slots in (0, options["slots"]):
+            result = self.run_mode(slots, options)
+            mode = f"слотов {slots}" if slots else "строка"
+            self.stdout.write(
+                f"{mode:<14}{result['throughput']:>12.1f}{result['writes']:>10}{result['errors']:>9}"
+                f"{result['p50'] * 1000:>10.2f}{result['p99'] * 1000:>10.2f}"
+                f"{'верен' if result['consistent'] else 'НЕВЕРЕН':>10}"
+            )
+
+    def run_mode(self, slots, options):
+        """
+        Создает временную БД и запускает нагрузку режима в отдельном процессе.
+        """
+        manage = [sys.executable, str(settings.BASE_DIR / "manage.py")]
+        arguments = ["--threads", str(options["threads"]), "--duration", str(options["duration"])]
+        with tempfile.TemporaryDirectory() as directory:
+            env = {**os.environ, "SHOP_DB_NAME": os.path.join(directory, "benchmark.sqlite3")}
+            try:
+                subprocess.run([*manage, "migrate", "-v", "0"], env=env, check=True)
+                completed = subprocess.run(
+                    [*manage, "benchmark_stock", "--worker", "--slots", str(slots), *arguments],
+                    env=env, check=True, capture_output=True, text=True,
+                )
+            except subprocess.CalledProcessError as e:
+                raise CommandError(f"Нагрузка завершилась с ошибкой: {e.stderr or e}")
+        return json.loads(completed.stdout.splitlines()[-1])
+
+    def work(self, options):
+        """
+        Выполняет нагрузку списаний одного товара и возвращает итоги.
+        """
+        product = Product.objects.create(name="Товар", quantity=INITIAL_QUANTITY, barcode="benchmark-stock")
+        if options["slots"]:
+            set_stock_slots(product, options["slots"])
+        deadline = time.monotonic() + options["duration"]
+
+        def run(_):
+            stats = {"writes": 0, "errors": 0, "latencies": []}
+            try:
+                item = Product.objects.get(pk=product.pk)
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        item.reduce_quantity(1)
+                        stats["writes"] += 1
+                    except (OperationalError, ValueError):
+                        stats["errors"] += 1
+                    stats["latencies"].append(time.perf_counter() - started)
+            finally:
+                connection.close()
+            return stats
+
+        with ThreadPoolExecutor(options["threads"]) as pool:
+            results = list(pool.map(run, range(options["threads"])))
+
+        product.refresh_from_db()
+        remaining = stock_quantities([product.pk]).get(product.pk, product.quantity)
+        latencies = sorted(latency for stats in results for latency in stats["latencies"])
+        writes = sum(stats["writes"] for stats in results)
+        return {
+            "writes": writes,
+            "errors": sum(stats["errors"] for stats in results),
+            "throughput": writes / options["duration"],
+            "p50": percentile(latencies, 0.5),
+            "p99": percentile(latencies, 0.99),
+            "consistent": remaining == INITIAL_QUANTITY - writes,
+        }
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app_shop.stats import find_drift, rebuild_stats
+
+
+class Command(BaseCommand):
+    """
+    Команда проверки и пересчета сводки остатков и их стоимости по категориям.
+
+    Без параметров пересчитывает сводку с нуля и выводит найденные расхождения.
+    С параметром --check только проверяет сводку и завершается с ошибкой,
+    если она расходится с товарами и ценами.
+    """
+
+    help = "Пересчитывает сводку остатков по категориям или проверяет ее расхождение с каталогом."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Только проверить сводку, не пересчитывая ее.")
+
+    def handle(self, *args, **options):
+        drift = find_drift() if options["check"] else rebuild_stats()
+        for line in drift:
+            self.stderr.write(line)
+        if options["check"]:
+            if drift:
+                raise CommandError(f"Найдено расхождений: {len(drift)}.")
+            self.stdout.write("Сводка совпадает с каталогом.")
+        else:
+            self.stdout.write(f"Сводка пересчитана, исправлено расхождений: {len(drift)}.")
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app_shop.export import EXPORT_FORMATS, render_catalog
+
+
+class Command(BaseCommand):
+    """
+    Команда выгрузки каталога (товары с категориями и ценами) в CSV или JSON Lines.
+    """
+
+    help = "Выгружает каталог товаров с категориями и ценами в CSV или JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", choices=sorted(EXPORT_FORMATS), default="jsonl", help="Формат выгрузки.")
+        parser.add_argument("--file", default="-", help="Путь к файлу выгрузки или '-' для вывода в stdout.")
+        parser.add_argument("--chunk-size", type=int, default=2000, help="Количество товаров в одной выборке из БД.")
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] <= 0:
+            raise CommandError("Размер выборки должен быть положительным.")
+        chunks = render_catalog(options["output"], chunk_size=options["chunk_size"])
+        if options["file"] == "-":
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
+            return
+        try:
+            with open(options["file"], "w", encoding="utf-8", newline="") as target:
+                for chunk in chunks:
+                    target.write(chunk)
+        except OSError as e:
+            raise CommandError(e)
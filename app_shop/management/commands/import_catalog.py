@@ -0,0 +1,63 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app_shop.importer import CatalogImporter
+
+
+class Command(BaseCommand):
+    """
+    Команда потоковой загрузки каталога из CSV или JSON Lines.
+
+    Каждая строка файла - одна запись:
+    ``{"type": "category", "name": str, "description": str}``,
+    ``{"type": "product", "barcode": str, "name": str, "quantity": int, "category": str}``
+    (категория задается названием) или
+    ``{"type": "price", "barcode": str, "currency": str, "amount": str}``.
+    CSV содержит заголовок с колонками type, name, description, barcode,
+    quantity, category, currency, amount.
+    """
+
+    help = "Загружает категории, товары и цены из большого файла CSV или JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу каталога.")
+        parser.add_argument("--format", choices=("jsonl", "csv"), help="Формат файла; по умолчанию по расширению.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Количество записей в одной транзакции.")
+        parser.add_argument("--checkpoint", help="Путь к контрольной точке; по умолчанию <path>.checkpoint.")
+        parser.add_argument("--restart", action="store_true", help="Начать загрузку заново, игнорируя контрольную точку.")
+        parser.add_argument("--workers", type=int, default=0, help="Количество процессов разбора (0 - без пула).")
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        fmt = options["format"] or ("csv" if path.lower().endswith(".csv") else "jsonl")
+        checkpoint = options["checkpoint"] or f"{path}.checkpoint"
+        if options["restart"] and os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elif os.path.exists(checkpoint):
+            self.stdout.write(f"Продолжение загрузки с контрольной точки {checkpoint}")
+
+        try:
+            importer = CatalogImporter(
+                path,
+                fmt=fmt,
+                batch_size=options["batch_size"],
+                checkpoint=checkpoint,
+                workers=options["workers"],
+                progress=self.progress,
+            )
+            result = importer.run()
+        except (OSError, ValueError) as e:
+            raise CommandError(e)
+
+        for error in result.errors:
+            self.stderr.write(f"Строка {error['row']}: {error['detail']}")
+        self.stdout.write(
+            f"Записей: {result.records}, категорий создано: {result.categories}, "
+            f"товаров создано: {result.inserted}, обновлено: {result.updated}, "
+            f"цен: {result.prices}, отклонено: {result.rejected}, "
+            f"{result.throughput:.0f} записей/с"
+        )
+
+    def progress(self, records, throughput):
+        self.stderr.write(f"Обработано записей: {records} ({throughput:.0f} записей/с)")
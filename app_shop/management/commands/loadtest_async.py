@@ -0,0 +1,110 @@
+import asyncio
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+from app_shop.benchmark import percentile
+from app_shop.models import Product
+
+
+class Command(BaseCommand):
+    """
+    Команда сравнения синхронного (WSGI) и асинхронного (ASGI) чтения каталога.
+
+    Обе ветки получают одинаковый набор запросов (товар, список товаров,
+    список цен товара) с одинаковым числом одновременных запросов.
+    Синхронная ветка обслуживает каждый запрос в отдельном потоке, как
+    WSGI-сервер или синхронное представление под ASGI; асинхронная - в одном
+    цикле событий через асинхронные представления ``/api/async/``.
+    Запросы выполняются в процессе, без сети, к текущей БД и только читают ее.
+    """
+
+    help = "Сравнивает задержки и число потоков синхронного и асинхронного чтения каталога."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--concurrency", type=int, default=32, help="Количество одновременных запросов.")
+        parser.add_argument("--requests", type=int, default=2000, help="Количество запросов в каждой ветке.")
+        parser.add_argument("--page-size", type=int, default=20, help="Размер страницы списков.")
+
+    def handle(self, *args, **options):
+        if options["concurrency"] <= 0 or options["requests"] <= 0 or options["page_size"] <= 0:
+            raise CommandError("Параметры нагрузки должны быть положительными.")
+        ids = list(Product.objects.order_by("pk").values_list("pk", flat=True)[:1000])
+        if not ids:
+            raise CommandError("В каталоге нет товаров.")
+
+        rng = random.Random(0)
+        paths = [self.make_path(rng, ids, options["page_size"]) for _ in range(options["requests"])]
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            results = {
+                "wsgi": self.run_sync([f"/api/{path}" for path in paths], options["concurrency"]),
+                "asgi": asyncio.run(self.run_async([f"/api/async/{path}" for path in paths], options["concurrency"])),
+            }
+
+        self.stdout.write(f"{'Ветка':<8}{'Запросов/с':>12}{'p50, мс':>10}{'p99, мс':>10}{'Потоков':>10}{'Ошибок':>9}")
+        for name, result in results.items():
+            latencies = sorted(result["latencies"])
+            self.stdout.write(
+                f"{name:<8}{len(latencies) / result['elapsed']:>12.1f}"
+                f"{percentile(latencies, 0.5) * 1000:>10.2f}{percentile(latencies, 0.99) * 1000:>10.2f}"
+                f"{result['threads']:>10}{result['errors']:>9}"
+            )
+
+    def make_path(self, rng, ids, page_size):
+        kind = rng.random()
+        pk = rng.choice(ids)
+        if kind < 0.6:
+            return f"products/{pk}/"
+        if kind < 0.8:
+            return f"products/?page_size={page_size}"
+        return f"prices/?product={pk}"
+
+    def run_sync(self, paths, concurrency):
+        """
+        Выполняет запросы к синхронным представлениям из пула потоков.
+        """
+        local = threading.local()
+        result = {"latencies": [], "errors": 0}
+
+        def fetch(path):
+            if not hasattr(local, "client"):
+                local.client = Client()
+            started = time.perf_counter()
+            response = local.client.get(path)
+            return time.perf_counter() - started, response.status_code
+
+        threads = threading.active_count()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            for latency, status in pool.map(fetch, paths):
+                result["latencies"].append(latency)
+                result["errors"] += status != 200
+            result["elapsed"] = time.perf_counter() - started
+            result["threads"] = threading.active_count() - threads
+        return result
+
+    async def run_async(self, paths, concurrency):
+        """
+        Выполняет запросы к асинхронным представлениям из concurrency задач одного цикла событий.
+        """
+        client = AsyncClient()
+        queue = iter(paths)
+        result = {"latencies": [], "errors": 0}
+
+        async def worker():
+            for path in queue:
+                started = time.perf_counter()
+                response = await client.get(path)
+                result["latencies"].append(time.perf_counter() - started)
+                result["errors"] += response.status_code != 200
+
+        threads = threading.active_count()
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        result["elapsed"] = time.perf_counter() - started
+        result["threads"] = threading.active_count() - threads
+        return result
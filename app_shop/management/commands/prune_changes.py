@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from app_shop.changes import prune_changes
+
+
+class Command(BaseCommand):
+    """
+    Команда удаления старых записей журнала изменений.
+
+    Срок хранения берется из параметра --days или настройки
+    SHOP_CHANGES['RETENTION_DAYS']. Клиенты, отставшие больше срока
+    хранения, получают от /api/changes/ статус 410 и загружают каталог заново.
+    """
+
+    help = "Удаляет записи журнала изменений старше срока хранения."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, help="Срок хранения записей в днях.")
+        parser.add_argument("--batch-size", type=int, default=1000, help="Количество записей в одной транзакции.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0 or (options["days"] is not None and options["days"] < 0):
+            raise CommandError("Размер пачки должен быть положительным, а срок хранения - неотрицательным.")
+        deleted = prune_changes(days=options["days"], batch_size=options["batch_size"])
+        self.stdout.write(f"Удалено записей журнала: {deleted}")
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app_shop.stock import rebalance
+
+
+class Command(BaseCommand):
+    """
+    Команда перебалансировки раздельных остатков товаров.
+
+    Без параметра --interval выполняет один проход и завершается (для cron).
+    С параметром --interval работает как фоновый процесс и повторяет проход
+    каждые interval секунд.
+    """
+
+    help = "Выравнивает слоты раздельных остатков и обновляет снимок остатка в товарах."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, help="Повторять проход каждые interval секунд.")
+
+    def handle(self, *args, **options):
+        if options["interval"] is not None and options["interval"] <= 0:
+            raise CommandError("Интервал должен быть положительным.")
+        while True:
+            changed = rebalance()
+            if changed or options["verbosity"] > 1:
+                self.stdout.write(f"Перебалансировано товаров: {changed}")
+            if options["interval"] is None:
+                return
+            # Соединение не удерживается между проходами.
+            connection.close()
+            time.sleep(options["interval"])
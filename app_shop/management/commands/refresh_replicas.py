@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app_shop.replicas import get_replication_settings, refresh_replica
+
+
+class Command(BaseCommand):
+    """
+    Команда обновления локальных реплик SQLite копией основной БД.
+
+    Без параметра --interval обновляет реплики один раз и завершается (для
+    cron). С параметром --interval работает как фоновый процесс и обновляет
+    реплики каждые interval секунд; отставание реплик не превышает интервала
+    и времени копирования.
+    """
+
+    help = "Обновляет реплики для чтения копией основной БД (backup API SQLite)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--interval", type=float, help="Повторять обновление каждые interval секунд.")
+
+    def handle(self, *args, **options):
+        if options["interval"] is not None and options["interval"] <= 0:
+            raise CommandError("Интервал должен быть положительным.")
+        replicas = get_replication_settings()["REPLICAS"]
+        if not replicas:
+            raise CommandError("Реплики не настроены (SHOP_DB_REPLICAS).")
+        while True:
+            for alias in replicas:
+                started = time.perf_counter()
+                refresh_replica(alias)
+                if options["verbosity"] > 1:
+                    self.stdout.write(f"Реплика {alias} обновлена за {time.perf_counter() - started:.2f} с")
+            if options["interval"] is None:
+                return
+            time.sleep(options["interval"])
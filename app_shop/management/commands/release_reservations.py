@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from app_shop.reservations import release_expired
+
+
+class Command(BaseCommand):
+    """
+    Команда освобождения истекших резервов товаров.
+
+    Без параметра --interval выполняет один проход и завершается (для cron).
+    С параметром --interval работает как фоновый процесс и повторяет проход
+    каждые interval секунд.
+    """
+
+    help = "Освобождает истекшие резервы товаров пачками."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Количество резервов в одной транзакции.")
+        parser.add_argument("--interval", type=float, help="Повторять проход каждые interval секунд.")
+
+    def handle(self, *args, **options):
+        if options["batch_size"] <= 0 or (options["interval"] is not None and options["interval"] <= 0):
+            raise CommandError("Размер пачки и интервал должны быть положительными.")
+        while True:
+            released = release_expired(batch_size=options["batch_size"])
+            if released or options["verbosity"] > 1:
+                self.stdout.write(f"Освобождено резервов: {released}")
+            if options["interval"] is None:
+                return
+            # Соединение не удерживается между проходами.
+            connection.close()
+            time.sleep(options["interval"])
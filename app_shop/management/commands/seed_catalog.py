@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app_shop.models import Category, Price, Product
+from app_shop.seed import seed_catalog
+
+
+class Command(BaseCommand):
+    """
+    Команда заполнения каталога синтетическими данными для нагрузочных тестов.
+
+    Одинаковые параметры и seed дают одинаковый каталог: те же названия,
+    количества, штрихкоды и цены. С параметром --clear каталог перед
+    заполнением очищается.
+    """
+
+    help = "Заполняет каталог синтетическими категориями, товарами и ценами."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, required=True, help="Количество товаров.")
+        parser.add_argument("--prices-per-product", type=int, default=2, help="Количество цен каждого товара.")
+        parser.add_argument("--categories", type=int, default=20, help="Количество категорий.")
+        parser.add_argument("--seed", type=int, default=0, help="Начальное значение генератора.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Количество товаров в одной транзакции.")
+        parser.add_argument("--clear", action="store_true", help="Удалить товары, цены и категории перед заполнением.")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            with transaction.atomic():
+                Price.objects.all().delete()
+                Product.objects.all().delete()
+                Category.objects.all().delete()
+        try:
+            created = seed_catalog(
+                options["products"],
+                prices_per_product=options["prices_per_product"],
+                categories=options["categories"],
+                seed=options["seed"],
+                batch_size=options["batch_size"],
+                progress=lambda count: self.stderr.write(f"Создано товаров: {count}"),
+            )
+        except ValueError as e:
+            raise CommandError(e)
+        self.stdout.write(
+            f"Создано категорий: {created['categories']}, товаров: {created['products']}, цен: {created['prices']}"
+        )
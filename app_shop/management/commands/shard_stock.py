@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+
+from app_shop.models import Product
+from app_shop.stock import MAX_STOCK_SLOTS, set_stock_slots
+
+
+class Command(BaseCommand):
+    """
+    Команда включения и выключения раздельного остатка товаров.
+
+    Товары задаются штрихкодами или идентификаторами. Остаток товара
+    распределяется поровну между --slots слотами; --slots 0 возвращает
+    остаток в строку товара.
+    """
+
+    help = "Делит остаток товаров между слотами (--slots 0 - возвращает остаток в товар)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("products", nargs="+", help="Штрихкоды или идентификаторы товаров.")
+        parser.add_argument(
+            "--slots", type=int, required=True, help=f"Количество слотов, от 0 до {MAX_STOCK_SLOTS}."
+        )
+
+    def handle(self, *args, **options):
+        keys = options["products"]
+        ids = [int(key) for key in keys if key.isdigit()]
+        products = list(Product.objects.filter(Q(barcode__in=keys) | Q(pk__in=ids)).order_by("pk"))
+        found = {product.barcode for product in products} | {str(product.pk) for product in products}
+        missing = [key for key in keys if key not in found]
+        if missing:
+            raise CommandError(f"Товары не найдены: {', '.join(missing)}.")
+        for product in products:
+            try:
+                set_stock_slots(product, options["slots"])
+            except ValueError as e:
+                raise CommandError(f"{product.barcode}: {e}")
+            self.stdout.write(f"{product.barcode}: слотов {product.stock_slots}, остаток {product.quantity}")
@@ -0,0 +1,63 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from app_shop.bulk import upsert_catalog
+
+
+class Command(BaseCommand):
+    """
+    Команда массового создания и обновления товаров и цен по штрихкоду.
+
+    Читает файл JSON Lines, где каждая строка - товар вида
+    ``{"barcode": str, "name": str, "quantity": int, "category": int | None,
+    "prices": [{"currency": str, "amount": str}]}``.
+    """
+
+    help = "Создает или обновляет товары и цены по штрихкоду из файла JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Путь к файлу JSON Lines или '-' для чтения из stdin.")
+        parser.add_argument("--batch-size", type=int, default=500, help="Количество товаров в одном INSERT.")
+        parser.add_argument("--commit-size", type=int, default=10000, help="Количество строк в одной транзакции.")
+
+    def handle(self, *args, **options):
+        if options["path"] == "-":
+            result = self.upsert(sys.stdin, options)
+        else:
+            try:
+                with open(options["path"], encoding="utf-8") as source:
+                    result = self.upsert(source, options)
+            except OSError as e:
+                raise CommandError(e)
+
+        for error in result.errors:
+            self.stderr.write(f"Строка {error['row']}: {error['detail']}")
+        self.stdout.write(
+            f"Создано: {result.inserted}, обновлено: {result.updated}, отклонено: {result.rejected}"
+        )
+
+    def upsert(self, source, options):
+        try:
+            return upsert_catalog(
+                read_json_lines(source),
+                batch_size=options["batch_size"],
+                commit_size=options["commit_size"],
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+
+def read_json_lines(source):
+    """
+    Построчно читает JSON Lines. Пустые строки пропускаются,
+    нечитаемые строки возвращаются как None и отклоняются при проверке.
+    """
+    for line in source:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield None
@@ -0,0 +1,319 @@
+import logging
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from threading import Lock
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse
+
+
+__all__ = [
+    "Histogram",
+    "Counter",
+    "MetricsRegistry",
+    "REGISTRY",
+    "record_query",
+    "MetricsMiddleware",
+    "metrics_view",
+]
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Маршрут запроса, не сопоставленного ни одному URL.
+UNMATCHED = "unmatched"
+
+logger = logging.getLogger("app_shop.slow_requests")
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values, extra=""):
+    labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    if extra:
+        labels = f"{labels},{extra}" if labels else extra
+    return f"{{{labels}}}" if labels else ""
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    Потокобезопасная гистограмма Prometheus с фиксированными границами корзин.
+
+    Поля
+    ----
+    name:
+        Имя метрики.
+    documentation:
+        Описание метрики (строка HELP).
+    buckets:
+        Верхние границы корзин по возрастанию (корзина +Inf добавляется сама).
+    labels:
+        Имена меток.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = Lock()
+
+    def observe(self, labels, value):
+        """
+        Учитывает значение в серии с метками labels (кортеж значений меток).
+        """
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][index] += 1
+            series[1] += value
+
+    def collect(self):
+        """
+        Возвращает строки серий в текстовом формате Prometheus.
+        """
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        lines = []
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound) if bound != "+Inf" else bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, labels)} {cumulative}")
+        return lines
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    """
+    Потокобезопасный счетчик Prometheus с метками.
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._series = {}
+        self._lock = Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            series = sorted(self._series.items())
+        return [f"{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}" for labels, value in series]
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+
+class MetricsRegistry:
+    """
+    Метрики запросов процесса.
+
+    Метрики хранятся в памяти процесса: при нескольких процессах сервера
+    каждый процесс отдает свои значения, а Prometheus собирает их с каждого
+    процесса отдельно.
+
+    Поля
+    ----
+    requests:
+        Количество ответов по маршруту, действию и коду ответа.
+    duration:
+        Время обработки запроса в секундах (для потоковых ответов - до
+        начала передачи тела).
+    queries:
+        Количество SQL-запросов за время обработки запроса.
+    db_duration:
+        Время выполнения SQL-запросов в секундах.
+    response_size:
+        Размер тела ответа в байтах (потоковые ответы не учитываются).
+    """
+
+    def __init__(self):
+        labels = ("view", "action")
+        self.requests = Counter("shop_http_requests_total", "Количество ответов.", (*labels, "status"))
+        self.duration = Histogram(
+            "shop_http_request_duration_seconds", "Время обработки запроса.", LATENCY_BUCKETS, labels
+        )
+        self.queries = Histogram(
+            "shop_http_request_db_queries", "Количество SQL-запросов на запрос.", QUERY_BUCKETS, labels
+        )
+        self.db_duration = Histogram(
+            "shop_http_request_db_duration_seconds", "Время SQL-запросов на запрос.", LATENCY_BUCKETS, labels
+        )
+        self.response_size = Histogram(
+            "shop_http_response_size_bytes", "Размер тела ответа.", SIZE_BUCKETS, labels
+        )
+        self.metrics = (self.requests, self.duration, self.queries, self.db_duration, self.response_size)
+
+    def render(self):
+        """
+        Возвращает все метрики в текстовом формате Prometheus (версия 0.0.4).
+        """
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        for metric in self.metrics:
+            metric.reset()
+
+
+REGISTRY = MetricsRegistry()
+
+
+class RequestStats:
+    """
+    SQL-запросы обрабатываемого запроса: количество, время и (для журнала
+    медленных запросов) тексты запросов.
+    """
+
+    __slots__ = ("queries", "db_duration", "sql", "sql_limit")
+
+    def __init__(self, sql_limit=0):
+        self.queries = 0
+        self.db_duration = 0.0
+        self.sql = [] if sql_limit else None
+        self.sql_limit = sql_limit
+
+
+_current_stats = ContextVar("shop_request_stats", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Обертка выполнения SQL (connection.execute_wrappers), учитывающая
+    запросы в статистике текущего HTTP-запроса.
+
+    Статистика передается через ContextVar, поэтому запросы асинхронных
+    представлений, выполняемые в потоках sync_to_async, учитываются в своем
+    HTTP-запросе. Вне HTTP-запроса обертка только вызывает execute.
+    """
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        stats.queries += 1
+        stats.db_duration += duration
+        if stats.sql is not None and len(stats.sql) < stats.sql_limit:
+            stats.sql.append((duration, sql))
+
+
+class MetricsMiddleware:
+    """
+    Промежуточный слой учета запросов в метриках REGISTRY.
+
+    Запросы группируются по имени маршрута (view_name) и действию
+    представления (list, retrieve, reduce_quantity и т.п.; для других
+    представлений - HTTP-метод). Работает и в синхронном, и в асинхронном
+    режиме. Если задан порог SHOP_METRICS["SLOW_REQUEST_MS"], запросы
+    дольше порога записываются в журнал ``app_shop.slow_requests``
+    вместе с текстами SQL-запросов (без параметров).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        options = getattr(settings, "SHOP_METRICS", {})
+        self.slow_request_ms = options.get("SLOW_REQUEST_MS")
+        self.slow_request_queries = options.get("SLOW_REQUEST_QUERIES", 100) if self.slow_request_ms is not None else 0
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = RequestStats(self.slow_request_queries)
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self.observe(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = RequestStats(self.slow_request_queries)
+        token = _current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        self.observe(request, response, time.perf_counter() - started, stats)
+        return response
+
+    def observe(self, request, response, elapsed, stats):
+        labels = self.get_labels(request)
+        REGISTRY.requests.inc((*labels, str(response.status_code)))
+        REGISTRY.duration.observe(labels, elapsed)
+        REGISTRY.queries.observe(labels, stats.queries)
+        REGISTRY.db_duration.observe(labels, stats.db_duration)
+        if not response.streaming:
+            REGISTRY.response_size.observe(labels, len(response.content))
+        if self.slow_request_ms is not None and elapsed * 1000 >= self.slow_request_ms:
+            logger.warning(
+                "Медленный запрос %s %s (%s, %s): %.1f мс, SQL-запросов %d за %.1f мс%s",
+                request.method,
+                request.get_full_path(),
+                *labels,
+                elapsed * 1000,
+                stats.queries,
+                stats.db_duration * 1000,
+                "".join(f"\n  {duration * 1000:.2f} мс: {sql}" for duration, sql in stats.sql),
+            )
+
+    def get_labels(self, request):
+        """
+        Возвращает метки запроса: имя маршрута и действие.
+        """
+        method = request.method.lower()
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return UNMATCHED, method
+        actions = getattr(match.func, "actions", None) or {}
+        return match.view_name or match.route, actions.get(method, method)
+
+
+def metrics_view(request):
+    """
+    Отдает метрики процесса в текстовом формате Prometheus.
+    """
+    return HttpResponse(REGISTRY.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_shop', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='category',
+            options={'verbose_name': 'Тип', 'verbose_name_plural': 'Типы'},
+        ),
+        migrations.AlterModelOptions(
+            name='price',
+            options={'verbose_name': 'Цена', 'verbose_name_plural': 'Цены'},
+        ),
+        migrations.AlterModelOptions(
+            name='product',
+            options={'verbose_name': 'Товар', 'verbose_name_plural': 'Товары'},
+        ),
+        migrations.AddConstraint(
+            model_name='price',
+            constraint=models.UniqueConstraint(fields=('product', 'currency'), name='unique_price_product_currency'),
+        ),
+    ]
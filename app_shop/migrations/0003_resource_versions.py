@@ -0,0 +1,63 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:44
+
+from django.db import migrations, models
+
+
+# Триггеры увеличивают версию коллекции при любом изменении таблицы,
+# в том числе при массовых операциях и запросах UPDATE в обход ORM.
+VERSION_TRIGGER = """
+CREATE TRIGGER {table}_version_{operation} AFTER {operation} ON {table}
+BEGIN
+    INSERT INTO app_shop_resourceversion (name, version, updated_at)
+    VALUES ('{name}', 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    ON CONFLICT (name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at;
+END;
+"""
+
+VERSIONED_TABLES = {
+    'product': 'app_shop_product',
+    'price': 'app_shop_price',
+    'category': 'app_shop_category',
+}
+
+
+def version_triggers():
+    for name, table in VERSIONED_TABLES.items():
+        for operation in ('INSERT', 'UPDATE', 'DELETE'):
+            yield migrations.RunSQL(
+                VERSION_TRIGGER.format(table=table, operation=operation, name=name),
+                f'DROP TRIGGER {table}_version_{operation};',
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_shop', '0002_price_product_currency_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceVersion',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='Коллекция')),
+                ('version', models.PositiveBigIntegerField(default=0, verbose_name='Версия')),
+                ('updated_at', models.DateTimeField(verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Версия коллекции',
+                'verbose_name_plural': 'Версии коллекций',
+            },
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата обновления'),
+        ),
+        migrations.AddField(
+            model_name='price',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Дата обновления'),
+        ),
+        *version_triggers(),
+    ]
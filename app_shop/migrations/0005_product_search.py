@@ -0,0 +1,78 @@
+from django.db import migrations
+
+
+# Полнотекстовый индекс товаров (SQLite FTS5). rowid строки индекса совпадает
+# с идентификатором товара. Индекс префиксов ускоряет поиск по началу слова,
+# вес названия товара в ранжировании выше веса названия и описания категории.
+CREATE_INDEX = """
+CREATE VIRTUAL TABLE app_shop_product_fts USING fts5(
+    name, category_name, category_description, prefix='2 3'
+);
+INSERT INTO app_shop_product_fts (app_shop_product_fts, rank) VALUES ('rank', 'bm25(10.0, 2.0, 1.0)');
+INSERT INTO app_shop_product_fts (rowid, name, category_name, category_description)
+SELECT product.id, product.name, category.name, category.description
+FROM app_shop_product AS product
+LEFT JOIN app_shop_category AS category ON category.id = product.category_id;
+"""
+
+INSERT_ROW = """
+INSERT INTO app_shop_product_fts (rowid, name, category_name, category_description)
+VALUES (
+    new.id,
+    new.name,
+    (SELECT name FROM app_shop_category WHERE id = new.category_id),
+    (SELECT description FROM app_shop_category WHERE id = new.category_id)
+);
+"""
+
+# Триггеры поддерживают индекс при любом изменении товаров и категорий,
+# в том числе при массовых операциях и запросах в обход ORM. Списание
+# остатков не меняет индексируемых полей и триггеры не запускает.
+# Пересоздание таблицы товаров или категорий миграцией удаляет триггеры,
+# такие миграции должны создавать их заново.
+TRIGGERS = {
+    'app_shop_product_fts_insert': f"""
+CREATE TRIGGER app_shop_product_fts_insert AFTER INSERT ON app_shop_product
+BEGIN
+    {INSERT_ROW}
+END;
+""",
+    'app_shop_product_fts_update': f"""
+CREATE TRIGGER app_shop_product_fts_update AFTER UPDATE OF id, name, category_id ON app_shop_product
+WHEN old.id IS NOT new.id OR old.name IS NOT new.name OR old.category_id IS NOT new.category_id
+BEGIN
+    DELETE FROM app_shop_product_fts WHERE rowid = old.id;
+    {INSERT_ROW}
+END;
+""",
+    'app_shop_product_fts_delete': """
+CREATE TRIGGER app_shop_product_fts_delete AFTER DELETE ON app_shop_product
+BEGIN
+    DELETE FROM app_shop_product_fts WHERE rowid = old.id;
+END;
+""",
+    'app_shop_category_fts_update': """
+CREATE TRIGGER app_shop_category_fts_update AFTER UPDATE OF name, description ON app_shop_category
+WHEN old.name IS NOT new.name OR old.description IS NOT new.description
+BEGIN
+    UPDATE app_shop_product_fts
+    SET category_name = new.name, category_description = new.description
+    WHERE rowid IN (SELECT id FROM app_shop_product WHERE category_id = new.id);
+END;
+""",
+}
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_shop', '0004_catalog_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_INDEX, 'DROP TABLE app_shop_product_fts;'),
+        *(
+            migrations.RunSQL(sql, f'DROP TRIGGER {name};')
+            for name, sql in TRIGGERS.items()
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:51
+
+from django.db import migrations, models
+
+
+# Триггеры записывают в журнал каждое изменение строки, в том числе при
+# массовых операциях и запросах в обход ORM. Пересоздание таблиц каталога
+# миграцией удаляет триггеры, такие миграции должны создавать их заново.
+CHANGE_TRIGGER = """
+CREATE TRIGGER {table}_change_{operation} AFTER {operation} ON {table}
+BEGIN
+    INSERT INTO app_shop_change (resource, object_id, operation, changed_at)
+    VALUES ('{name}', {row}.id, '{kind}', strftime('%Y-%m-%d %H:%M:%f', 'now'));
+END;
+"""
+
+# Существующие объекты попадают в журнал как созданные, чтобы клиент мог
+# выполнить первую синхронизацию с начала журнала.
+BACKFILL = """
+INSERT INTO app_shop_change (resource, object_id, operation, changed_at)
+SELECT '{name}', id, 'created', updated_at FROM {table} ORDER BY id;
+"""
+
+# Порядок таблиц: объект журнала не ссылается на еще не созданные объекты.
+LOGGED_TABLES = {
+    'category': 'app_shop_category',
+    'product': 'app_shop_product',
+    'price': 'app_shop_price',
+}
+
+OPERATIONS = {
+    'INSERT': ('new', 'created'),
+    'UPDATE': ('new', 'updated'),
+    'DELETE': ('old', 'deleted'),
+}
+
+
+def change_triggers():
+    for name, table in LOGGED_TABLES.items():
+        yield migrations.RunSQL(BACKFILL.format(table=table, name=name), migrations.RunSQL.noop)
+        for operation, (row, kind) in OPERATIONS.items():
+            yield migrations.RunSQL(
+                CHANGE_TRIGGER.format(table=table, operation=operation, name=name, row=row, kind=kind),
+                f'DROP TRIGGER {table}_change_{operation};',
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_shop', '0005_product_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False, verbose_name='Номер')),
+                ('resource', models.CharField(max_length=50, verbose_name='Коллекция')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Идентификатор объекта')),
+                ('operation', models.CharField(choices=[('created', 'Создание'), ('updated', 'Изменение'), ('deleted', 'Удаление')], max_length=10, verbose_name='Изменение')),
+                ('changed_at', models.DateTimeField(verbose_name='Дата изменения')),
+            ],
+            options={
+                'verbose_name': 'Изменение',
+                'verbose_name_plural': 'Журнал изменений',
+            },
+        ),
+        *change_triggers(),
+    ]
@@ -0,0 +1,149 @@
+# Generated by Django 5.1.1 on 2026-10-18 16:53
+
+from django.db import migrations, models
+
+
+# Триггеры изменяют сводку на разницу между старым и новым состоянием строки.
+# Товары без категории учитываются в строке с category_id = 0. Стоимость
+# считается в сотых долях валюты: quantity * round(amount * 100).
+STOCK_DELTA = """
+INSERT INTO app_shop_categorystock (category_id, product_count, quantity)
+VALUES (COALESCE({row}.category_id, 0), {sign}1, {sign}{row}.quantity)
+ON CONFLICT (category_id) DO UPDATE SET
+    product_count = product_count + excluded.product_count,
+    quantity = quantity + excluded.quantity;
+"""
+
+# Стоимость цен товара при его добавлении в категорию или удалении из нее.
+PRODUCT_VALUE_DELTA = """
+INSERT INTO app_shop_categorystockvalue (category_id, currency, value)
+SELECT COALESCE({row}.category_id, 0), currency, {sign}{row}.quantity * CAST(ROUND(amount * 100) AS INTEGER)
+FROM app_shop_price WHERE product_id = {row}.id
+ON CONFLICT (category_id, currency) DO UPDATE SET value = value + excluded.value;
+"""
+
+# Стоимость одной цены по текущему количеству и категории товара.
+PRICE_VALUE_DELTA = """
+INSERT INTO app_shop_categorystockvalue (category_id, currency, value)
+SELECT COALESCE(category_id, 0), {row}.currency, {sign}quantity * CAST(ROUND({row}.amount * 100) AS INTEGER)
+FROM app_shop_product WHERE id = {row}.product_id
+ON CONFLICT (category_id, currency) DO UPDATE SET value = value + excluded.value;
+"""
+
+
+def added(template, row):
+    return template.format(row=row, sign='')
+
+
+def removed(template, row):
+    return template.format(row=row, sign='-')
+
+
+TRIGGERS = {
+    'app_shop_product_stats_insert': f"""
+CREATE TRIGGER app_shop_product_stats_insert AFTER INSERT ON app_shop_product
+BEGIN
+    {added(STOCK_DELTA, 'new')}
+    {added(PRODUCT_VALUE_DELTA, 'new')}
+END;
+""",
+    'app_shop_product_stats_update': f"""
+CREATE TRIGGER app_shop_product_stats_update AFTER UPDATE OF id, quantity, category_id ON app_shop_product
+WHEN old.id IS NOT new.id OR old.quantity IS NOT new.quantity OR old.category_id IS NOT new.category_id
+BEGIN
+    {removed(STOCK_DELTA, 'old')}
+    {removed(PRODUCT_VALUE_DELTA, 'old')}
+    {added(STOCK_DELTA, 'new')}
+    {added(PRODUCT_VALUE_DELTA, 'new')}
+END;
+""",
+    # Django удаляет цены товара до самого товара, после удаления товара
+    # триггер цены ничего не вычитает - повторного вычитания не бывает.
+    'app_shop_product_stats_delete': f"""
+CREATE TRIGGER app_shop_product_stats_delete AFTER DELETE ON app_shop_product
+BEGIN
+    {removed(STOCK_DELTA, 'old')}
+    {removed(PRODUCT_VALUE_DELTA, 'old')}
+END;
+""",
+    'app_shop_price_stats_insert': f"""
+CREATE TRIGGER app_shop_price_stats_insert AFTER INSERT ON app_shop_price
+BEGIN
+    {added(PRICE_VALUE_DELTA, 'new')}
+END;
+""",
+    'app_shop_price_stats_update': f"""
+CREATE TRIGGER app_shop_price_stats_update AFTER UPDATE OF product_id, currency, amount ON app_shop_price
+WHEN old.product_id IS NOT new.product_id OR old.currency IS NOT new.currency OR old.amount IS NOT new.amount
+BEGIN
+    {removed(PRICE_VALUE_DELTA, 'old')}
+    {added(PRICE_VALUE_DELTA, 'new')}
+END;
+""",
+    'app_shop_price_stats_delete': f"""
+CREATE TRIGGER app_shop_price_stats_delete AFTER DELETE ON app_shop_price
+BEGIN
+    {removed(PRICE_VALUE_DELTA, 'old')}
+END;
+""",
+    # Товары удаляемой категории к этому моменту уже перенесены в строку без категории.
+    'app_shop_category_stats_delete': """
+CREATE TRIGGER app_shop_category_stats_delete AFTER DELETE ON app_shop_category
+BEGIN
+    DELETE FROM app_shop_categorystock WHERE category_id = old.id;
+    DELETE FROM app_shop_categorystockvalue WHERE category_id = old.id;
+END;
+""",
+}
+
+# Начальное заполнение сводки по текущему каталогу.
+FILL = """
+INSERT INTO app_shop_categorystock (category_id, product_count, quantity)
+SELECT COALESCE(category_id, 0), COUNT(*), SUM(quantity) FROM app_shop_product GROUP BY 1;
+INSERT INTO app_shop_categorystockvalue (category_id, currency, value)
+SELECT COALESCE(product.category_id, 0), price.currency,
+       SUM(product.quantity * CAST(ROUND(price.amount * 100) AS INTEGER))
+FROM app_shop_price AS price JOIN app_shop_product AS product ON product.id = price.product_id
+GROUP BY 1, 2;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_shop', '0006_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryStock',
+            fields=[
+                ('category_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Категория')),
+                ('product_count', models.BigIntegerField(default=0, verbose_name='Количество товаров')),
+                ('quantity', models.BigIntegerField(default=0, verbose_name='Количество на складе')),
+            ],
+            options={
+                'verbose_name': 'Остаток категории',
+                'verbose_name_plural': 'Остатки категорий',
+            },
+        ),
+        migrations.CreateModel(
+            name='CategoryStockValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category_id', models.BigIntegerField(verbose_name='Категория')),
+                ('currency', models.CharField(max_length=10, verbose_name='Валюта')),
+                ('value', models.BigIntegerField(default=0, verbose_name='Стоимость в сотых долях')),
+            ],
+            options={
+                'verbose_name': 'Стоимость остатков категории',
+                'verbose_name_plural': 'Стоимость остатков категорий',
+                'constraints': [models.UniqueConstraint(fields=('category_id', 'currency'), name='unique_stock_value_category_currency')],
+            },
+        ),
+        migrations.RunSQL(FILL, migrations.RunSQL.noop),
+        *(
+            migrations.RunSQL(sql, f'DROP TRIGGER {name};')
+            for name, sql in TRIGGERS.items()
+        ),
+    ]
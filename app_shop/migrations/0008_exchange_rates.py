@@ -0,0 +1,47 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:09
+
+import django.core.validators
+from decimal import Decimal
+from django.db import migrations, models
+
+
+# Версия курсов (ResourceVersion) увеличивается в той же транзакции, что и
+# изменение курса: по ней процессы сбрасывают кэш курсов в памяти.
+VERSION_TRIGGER = """
+CREATE TRIGGER app_shop_exchangerate_version_{operation} AFTER {operation} ON app_shop_exchangerate
+BEGIN
+    INSERT INTO app_shop_resourceversion (name, version, updated_at)
+    VALUES ('exchange_rate', 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    ON CONFLICT (name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at;
+END;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_shop', '0007_category_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('currency', models.CharField(max_length=10, unique=True, verbose_name='Валюта')),
+                ('rate', models.DecimalField(decimal_places=6, max_digits=15, validators=[django.core.validators.MinValueValidator(Decimal('0.000001'))], verbose_name='Курс')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата обновления')),
+            ],
+            options={
+                'verbose_name': 'Курс валюты',
+                'verbose_name_plural': 'Курсы валют',
+            },
+        ),
+        *(
+            migrations.RunSQL(
+                VERSION_TRIGGER.format(operation=operation),
+                f'DROP TRIGGER app_shop_exchangerate_version_{operation};',
+            )
+            for operation in ('INSERT', 'UPDATE', 'DELETE')
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:13
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from ._triggers import preserve_triggers
+
+
+# Добавление поля NOT NULL пересоздает таблицу товаров в SQLite.
+save_product_triggers, restore_product_triggers = preserve_triggers('app_shop_product')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_shop', '0008_exchange_rates'),
+    ]
+
+    operations = [
+        save_product_triggers,
+        migrations.AddField(
+            model_name='product',
+            name='reserved',
+            field=models.PositiveIntegerField(default=0, verbose_name='Зарезервировано'),
+        ),
+        restore_product_triggers,
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('status', models.CharField(choices=[('active', 'Активен'), ('confirmed', 'Подтвержден'), ('released', 'Отменен'), ('expired', 'Истек')], default='active', max_length=10, verbose_name='Состояние')),
+                ('expires_at', models.DateTimeField(verbose_name='Действует до')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Дата изменения')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_shop.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Резерв',
+                'verbose_name_plural': 'Резервы',
+                'indexes': [models.Index(condition=models.Q(('status', 'active')), fields=['expires_at'], name='reservation_active_expiry_idx')],
+            },
+        ),
+    ]
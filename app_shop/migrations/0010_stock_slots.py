@@ -0,0 +1,61 @@
+# Generated by Django 5.1.1 on 2026-10-18 17:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from ._triggers import preserve_triggers
+
+
+# Добавление поля NOT NULL пересоздает таблицу товаров в SQLite.
+save_product_triggers, restore_product_triggers = preserve_triggers('app_shop_product')
+
+# Создание и удаление слотов (включение и выключение раздельного остатка)
+# увеличивает версию коллекции stock_slot. Списания из слотов триггеров не
+# имеют: иначе каждое списание снова обновляло бы общие строки версий и
+# сводок, ради разделения которых и заводятся слоты.
+SLOT_TRIGGER = """
+CREATE TRIGGER app_shop_stockslot_{operation} AFTER {operation} ON app_shop_stockslot
+BEGIN
+    INSERT INTO app_shop_resourceversion (name, version, updated_at)
+    VALUES ('stock_slot', 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+    ON CONFLICT (name) DO UPDATE SET version = version + 1, updated_at = excluded.updated_at;
+END;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app_shop', '0009_reservations'),
+    ]
+
+    operations = [
+        save_product_triggers,
+        migrations.AddField(
+            model_name='product',
+            name='stock_slots',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Слотов остатка'),
+        ),
+        restore_product_triggers,
+        migrations.CreateModel(
+            name='StockSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField(verbose_name='Слот')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Количество')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='app_shop.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Слот остатка',
+                'verbose_name_plural': 'Слоты остатка',
+                'constraints': [models.UniqueConstraint(fields=('product', 'slot'), name='unique_stock_slot_product_slot')],
+            },
+        ),
+        *(
+            migrations.RunSQL(
+                SLOT_TRIGGER.format(operation=operation),
+                f'DROP TRIGGER app_shop_stockslot_{operation};',
+            )
+            for operation in ('INSERT', 'DELETE')
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def preserve_triggers(table):
+    """
+    Возвращает операции, сохраняющие триггеры, которые ссылаются на таблицу table,
+    при пересоздании таблицы миграцией (SQLite).
+
+    Переименование новой таблицы не проходит, пока есть триггеры, ссылающиеся
+    на таблицу, а пересоздание удаляет триггеры самой таблицы. Первая операция
+    сохраняет и удаляет такие триггеры, вторая создает их заново; операция,
+    пересоздающая таблицу, ставится между ними. Обратные операции симметричны.
+    """
+    saved = []
+
+    def save(apps, schema_editor):
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND sql LIKE %s ORDER BY name",
+                [f"%{table}%"],
+            )
+            saved[:] = cursor.fetchall()
+            for name, _ in saved:
+                cursor.execute(f'DROP TRIGGER "{name}"')
+
+    def restore(apps, schema_editor):
+        with schema_editor.connection.cursor() as cursor:
+            for _, sql in saved:
+                cursor.execute(sql)
+        saved.clear()
+
+    return migrations.RunPython(save, restore), migrations.RunPython(restore, save)
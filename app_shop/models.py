@@ -1,4 +1,47 @@
-from django.db import models
+import random
+from decimal import Decimal
+
+from django.core.validators import MinValueValidator
+from django.db import connection, models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Collate
+from django.utils import timezone
+
+from .signals import products_changed
+
+
+class InsufficientStockError(ValueError):
+    """
+    Ошибка списания нескольких товаров: остатка хватает не на все позиции.
+
+    Поля
+    ----
+    product_ids:
+        Идентификаторы товаров, которых недостаточно на складе.
+    """
+
+    def __init__(self, product_ids):
+        super().__init__("Недостаточно товара на складе.")
+        self.product_ids = sorted(product_ids)
+
+
+# Параметры запроса помимо списка значений: условия фильтров, значения SET.
+QUERY_PARAMS_MARGIN = 20
+
+
+def query_batch_size(params_per_value=1):
+    """
+    Возвращает наибольшее число значений в одном запросе, при котором
+    запрос не превышает лимит параметров БД (max_query_params) с учетом
+    QUERY_PARAMS_MARGIN параметров его условий.
+
+    Параметры
+    ----------
+    params_per_value : int
+        Количество параметров запроса на одно значение.
+    """
+    limit = connection.features.max_query_params or 1000
+    return max(1, (limit - QUERY_PARAMS_MARGIN) // params_per_value)
 
 
 class Category(models.Model):
@@ -11,10 +54,13 @@ class Category(models.Model):
         Название категории.
     description:
         Описание категории.
+    updated_at:
+        Дата обновления записи о категории.
     """
 
     name = models.CharField(max_length=100, verbose_name='Название')
     description = models.TextField(blank=True, verbose_name='Описание')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
     def __str__(self):
         return self.name
@@ -22,6 +68,10 @@ class Category(models.Model):
     class Meta:
         verbose_name = "Тип"
         verbose_name_plural = "Типы"
+        indexes = [
+            # Поиск по названию без учета регистра (iexact, istartswith).
+            models.Index(Collate("name", "NOCASE"), name="category_name_nocase_idx"),
+        ]
 
 
 
@@ -36,7 +86,14 @@ class Product(models.Model):
     price:
         Цена товара.
     quantity:
-        Количество товара на складе.
+        Количество товара на складе. Для товара с раздельным остатком -
+        снимок суммы слотов (StockSlot) на момент последней перебалансировки.
+    reserved:
+        Количество, удерживаемое активными резервами (Reservation);
+        доступно к продаже ``quantity - reserved``.
+    stock_slots:
+        Количество слотов раздельного остатка (StockSlot); 0 - остаток
+        хранится в поле quantity.
     barcode:
         Штрихкод товара.
     updated_at:
@@ -48,6 +105,8 @@ class Product(models.Model):
     name = models.CharField(max_length=100, verbose_name='Название')
 
     quantity = models.PositiveIntegerField(verbose_name='Количество')
+    reserved = models.PositiveIntegerField(default=0, verbose_name='Зарезервировано')
+    stock_slots = models.PositiveSmallIntegerField(default=0, verbose_name='Слотов остатка')
     barcode = models.CharField(max_length=50, unique=True, verbose_name='Штрихкод')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
     category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, verbose_name='Тип')
@@ -56,6 +115,13 @@ class Product(models.Model):
         """
         Уменьшает количество товара на складе.
 
+        Списание выполняется атомарно на стороне БД: запрос
+        ``UPDATE ... SET quantity = quantity - amount WHERE id = ? AND quantity - reserved >= amount``
+        изменяет только поля quantity и updated_at, а успех определяется
+        количеством обновленных строк. Зарезервированное количество не списывается.
+        Для товара с раздельным остатком (stock_slots больше 0) списание
+        выполняется из слотов (StockSlot.take), строка товара не изменяется.
+
         Параметры
         ----------
         amount : int
@@ -66,14 +132,106 @@ class Product(models.Model):
         ----------
         ValueError
             Вызывается, если amount меньше или равно 0, или если amount
-            превышает текущее количество товара на складе.
+            превышает доступное (незарезервированное) количество товара в момент списания.
         """
         if amount <= 0:
             raise ValueError("Сумма уменьшения должна быть положительной.")
-        if amount > self.quantity:
+        if self.stock_slots:
+            if not StockSlot.take(self.pk, self.stock_slots, amount):
+                raise ValueError("Недостаточно товара на складе.")
+            products_changed.send(sender=Product, product_ids=[self.pk], barcodes=[self.barcode])
+            return
+        updated_at = timezone.now()
+        updated = Product.objects.filter(pk=self.pk, stock_slots=0, quantity__gte=F("reserved") + amount).update(
+            quantity=F("quantity") - amount,
+            updated_at=updated_at,
+        )
+        if not updated:
             raise ValueError("Недостаточно товара на складе.")
-        self.quantity -= amount
-        self.save()
+        products_changed.send(sender=Product, product_ids=[self.pk], barcodes=[self.barcode])
+        self.refresh_from_db(fields=["quantity"])
+        self.updated_at = updated_at
+
+    @classmethod
+    def reduce_quantities(cls, amounts):
+        """
+        Уменьшает количество нескольких товаров в одной транзакции по принципу «все или ничего».
+
+        Списание выполняется условными запросами
+        ``UPDATE ... SET quantity = quantity - CASE id WHEN ... END WHERE ...``,
+        по одному на пачку товаров, ограниченную числом параметров запроса.
+        Товары с раздельным остатком списываются из слотов (StockSlot.take).
+        Если хотя бы один товар списать не удалось, транзакция откатывается.
+
+        Параметры
+        ----------
+        amounts : dict[int, int]
+            Количество к списанию по первичному ключу товара.
+            Все значения должны быть положительными.
+
+        Возвращает
+        ----------
+        datetime
+            Время списания, записанное в updated_at измененных товаров.
+
+        Исключения
+        ----------
+        ValueError
+            Вызывается, если какое-либо количество меньше или равно 0.
+        InsufficientStockError
+            Вызывается, если каких-либо товаров недостаточно на складе
+            (или они не существуют) в момент списания.
+        """
+        if any(amount <= 0 for amount in amounts.values()):
+            raise ValueError("Сумма уменьшения должна быть положительной.")
+        updated_at = timezone.now()
+        items = list(amounts.items())
+        # На каждый товар приходится три параметра: id в IN, id и количество в CASE.
+        batch_size = query_batch_size(3)
+        with transaction.atomic():
+            for start in range(0, len(items), batch_size):
+                batch = dict(items[start:start + batch_size])
+                if cls._reduce_batch(batch, updated_at):
+                    continue
+                # Пачка откачена; товары с раздельным остатком списываются из
+                # слотов, остальные - повторно одним запросом.
+                sharded = dict(cls.objects.filter(pk__in=batch, stock_slots__gt=0).values_list("pk", "stock_slots"))
+                plain = {pk: amount for pk, amount in batch.items() if pk not in sharded}
+                failed = set()
+                if plain and not cls._reduce_batch(plain, updated_at):
+                    # Каких-то товаров не хватает: они определяются по одному
+                    # (транзакция все равно будет откачена).
+                    failed = {pk for pk, amount in plain.items() if not cls._reduce_batch({pk: amount}, updated_at)}
+                failed |= {pk for pk, slots in sharded.items() if not StockSlot.take(pk, slots, batch[pk])}
+                if failed:
+                    raise InsufficientStockError(failed)
+        products_changed.send(sender=cls, product_ids=list(amounts), barcodes=None)
+        return updated_at
+
+    @classmethod
+    def _reduce_batch(cls, batch, updated_at):
+        """
+        Списывает пачку товаров одним условным запросом UPDATE.
+
+        Если списаны не все товары пачки (число измененных строк меньше
+        размера пачки), изменения пачки откатываются до точки сохранения.
+
+        Возвращает
+        ----------
+        bool
+            True, если списаны все товары пачки.
+        """
+        delta = Case(*(When(pk=pk, then=Value(amount)) for pk, amount in batch.items()))
+        with transaction.atomic():
+            updated = cls.objects.filter(
+                pk__in=batch, stock_slots=0, quantity__gte=F("reserved") + delta
+            ).update(
+                quantity=F("quantity") - delta,
+                updated_at=updated_at,
+            )
+            if updated != len(batch):
+                transaction.set_rollback(True)
+        return updated == len(batch)
 
     def __str__(self):
         return self.name
@@ -81,8 +239,112 @@ class Product(models.Model):
     class Meta:
         verbose_name = "Товар"
         verbose_name_plural = "Товары"
+        indexes = [
+            # Постраничная выдача по ключу (updated_at, id).
+            models.Index(fields=["updated_at", "id"], name="product_updated_id_idx"),
+            # Товары категории, упорядоченные по названию.
+            models.Index(fields=["category", "name"], name="product_category_name_idx"),
+            # Поиск по названию без учета регистра (iexact, istartswith).
+            models.Index(Collate("name", "NOCASE"), name="product_name_nocase_idx"),
+        ]
     
 
+class StockSlot(models.Model):
+    """
+    Модель слотов раздельного остатка товара.
+
+    Остаток товара с большим числом одновременных списаний делится между
+    несколькими слотами, которые списываются независимо, поэтому списания
+    не ждут блокировки одной строки товара. Остаток товара равен сумме
+    слотов. Слоты создаются и перераспределяются функциями модуля stock.
+
+    Поля
+    ----
+    product:
+        Товар.
+    slot:
+        Номер слота, от 0 до Product.stock_slots - 1.
+    quantity:
+        Количество товара в слоте.
+    """
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Товар')
+    slot = models.PositiveSmallIntegerField(verbose_name='Слот')
+    quantity = models.PositiveIntegerField(verbose_name='Количество')
+
+    def __str__(self):
+        return f"{self.product_id}[{self.slot}]: {self.quantity}"
+
+    @classmethod
+    def take(cls, product_id, slots, amount):
+        """
+        Списывает amount из слотов товара.
+
+        Сначала слоты перебираются, начиная со случайного, и списание
+        выполняется условным запросом
+        ``UPDATE ... SET quantity = quantity - amount WHERE product_id = ? AND slot = ? AND quantity >= amount``
+        из первого слота, в котором хватает товара. Если ни в одном слоте
+        товара не хватает, но хватает в сумме, amount списывается из
+        нескольких слотов в одной транзакции.
+
+        Параметры
+        ----------
+        product_id : int
+            Первичный ключ товара.
+        slots : int
+            Количество слотов товара.
+        amount : int
+            Количество к списанию, больше 0.
+
+        Возвращает
+        ----------
+        bool
+            True, если товар списан; False, если товара недостаточно.
+        """
+        rows = cls.objects.filter(product_id=product_id)
+        start = random.randrange(slots)
+        for offset in range(slots):
+            slot = (start + offset) % slots
+            if rows.filter(slot=slot, quantity__gte=amount).update(quantity=F("quantity") - amount):
+                return True
+        with transaction.atomic():
+            remaining = amount
+            taken = {}
+            for slot, quantity in rows.select_for_update().filter(quantity__gt=0).order_by("slot").values_list(
+                "slot", "quantity"
+            ):
+                taken[slot] = min(quantity, remaining)
+                remaining -= taken[slot]
+                if not remaining:
+                    break
+            if remaining:
+                return False
+            delta = Case(*(When(slot=slot, then=Value(value)) for slot, value in taken.items()))
+            # Условие повторяется в запросе для БД без блокировки строк (SQLite в режиме DEFERRED).
+            if rows.filter(slot__in=taken, quantity__gte=delta).update(quantity=F("quantity") - delta) != len(taken):
+                transaction.set_rollback(True)
+                return False
+        return True
+
+    @classmethod
+    def spread(cls, product_id, total, slots):
+        """
+        Распределяет total по слотам товара поровну (остаток деления - по
+        одному в первые слоты) одним запросом.
+        """
+        share, rest = divmod(total, slots)
+        cls.objects.filter(product_id=product_id).update(
+            quantity=Case(When(slot__lt=rest, then=Value(share + 1)), default=Value(share))
+        )
+
+    class Meta:
+        verbose_name = "Слот остатка"
+        verbose_name_plural = "Слоты остатка"
+        constraints = [
+            models.UniqueConstraint(fields=["product", "slot"], name="unique_stock_slot_product_slot"),
+        ]
+
+
 class Price(models.Model):
     """
     Модель цен товаров.
@@ -93,15 +355,274 @@ class Price(models.Model):
         Валюта цены.
     amount:
         Стоимость товара.
+    product:
+        Товар. Для каждой валюты у товара не более одной цены.
+    updated_at:
+        Дата обновления записи о цене.
     """
 
     currency = models.CharField(max_length=10, verbose_name='Валюта')
     amount = models.DecimalField(max_digits=10, decimal_places=2, verbose_name='Стоимость')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Товар')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
 
     def __str__(self):
         return f"{self.amount} {self.currency}"
     
     class Meta:
         verbose_name = "Цена"
-        verbose_name_plural = "Цены"
\ No newline at end of file
+        verbose_name_plural = "Цены"
+        constraints = [
+            models.UniqueConstraint(fields=["product", "currency"], name="unique_price_product_currency"),
+        ]
+
+
+class ExchangeRate(models.Model):
+    """
+    Модель курсов валют.
+
+    Курсы заданы относительно общей базовой валюты, которая хранится с
+    курсом 1, поэтому сумма переводится из валюты X в валюту Y как
+    ``amount * rate(X) / rate(Y)``.
+
+    Поля
+    ----
+    currency:
+        Валюта.
+    rate:
+        Стоимость единицы валюты в базовой валюте.
+    updated_at:
+        Дата обновления курса.
+    """
+
+    currency = models.CharField(max_length=10, unique=True, verbose_name='Валюта')
+    rate = models.DecimalField(
+        max_digits=15,
+        decimal_places=6,
+        validators=[MinValueValidator(Decimal("0.000001"))],
+        verbose_name='Курс',
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата обновления')
+
+    def __str__(self):
+        return f"{self.currency}: {self.rate}"
+
+    class Meta:
+        verbose_name = "Курс валюты"
+        verbose_name_plural = "Курсы валют"
+
+
+class Reservation(models.Model):
+    """
+    Модель резервов товаров.
+
+    Активный резерв удерживает количество товара (Product.reserved) до
+    подтверждения, отмены или истечения срока. Подтверждение списывает
+    товар со склада, отмена и истечение возвращают количество в продажу.
+
+    Поля
+    ----
+    product:
+        Товар.
+    amount:
+        Зарезервированное количество.
+    status:
+        Состояние: ``active``, ``confirmed``, ``released`` или ``expired``.
+    expires_at:
+        Срок действия активного резерва.
+    created_at:
+        Дата создания резерва.
+    updated_at:
+        Дата изменения состояния.
+    """
+
+    ACTIVE = "active"
+    CONFIRMED = "confirmed"
+    RELEASED = "released"
+    EXPIRED = "expired"
+
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, verbose_name='Товар')
+    amount = models.PositiveIntegerField(verbose_name='Количество')
+    status = models.CharField(
+        max_length=10,
+        choices=[(ACTIVE, "Активен"), (CONFIRMED, "Подтвержден"), (RELEASED, "Отменен"), (EXPIRED, "Истек")],
+        default=ACTIVE,
+        verbose_name='Состояние',
+    )
+    expires_at = models.DateTimeField(verbose_name='Действует до')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')
+    updated_at = models.DateTimeField(auto_now=True, verbose_name='Дата изменения')
+
+    def __str__(self):
+        return f"{self.product_id} x {self.amount} ({self.status})"
+
+    class Meta:
+        verbose_name = "Резерв"
+        verbose_name_plural = "Резервы"
+        indexes = [
+            # Поиск истекших активных резервов (release_expired).
+            models.Index(
+                fields=["expires_at"], condition=models.Q(status="active"), name="reservation_active_expiry_idx"
+            ),
+        ]
+
+
+class ResourceVersion(models.Model):
+    """
+    Модель счетчиков версий коллекций каталога.
+
+    Счетчик увеличивается триггерами БД при любом изменении таблицы
+    (включая массовые операции и запросы UPDATE), поэтому по нему можно
+    дешево проверить, изменилась ли коллекция.
+
+    Поля
+    ----
+    name:
+        Название коллекции: ``product``, ``price``, ``category``,
+        ``exchange_rate`` или ``stock_slot``.
+    version:
+        Номер версии коллекции.
+    updated_at:
+        Дата последнего изменения коллекции.
+    """
+
+    name = models.CharField(max_length=50, primary_key=True, verbose_name='Коллекция')
+    version = models.PositiveBigIntegerField(default=0, verbose_name='Версия')
+    updated_at = models.DateTimeField(verbose_name='Дата обновления')
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
+
+    @classmethod
+    def get_versions(cls, names):
+        """
+        Возвращает версии и даты изменения коллекций одним запросом.
+
+        Параметры
+        ----------
+        names : Iterable[str]
+            Названия коллекций.
+
+        Возвращает
+        ----------
+        dict[str, tuple[int, datetime | None]]
+            Версия и дата изменения по названию коллекции. Для коллекций,
+            которые еще не изменялись, возвращается ``(0, None)``.
+        """
+        names = list(names)
+        versions = dict.fromkeys(names, (0, None))
+        for name, version, updated_at in cls.objects.filter(name__in=names).values_list("name", "version", "updated_at"):
+            versions[name] = (version, updated_at)
+        return versions
+
+    class Meta:
+        verbose_name = "Версия коллекции"
+        verbose_name_plural = "Версии коллекций"
+
+
+class Change(models.Model):
+    """
+    Модель журнала изменений каталога.
+
+    Записи добавляются триггерами БД при любом изменении товаров, цен и
+    категорий (включая массовые операции и запросы в обход ORM). Номер
+    записи выдается AUTOINCREMENT и никогда не уменьшается; SQLite
+    допускает одну пишущую транзакцию, поэтому порядок номеров совпадает
+    с порядком фиксации транзакций.
+
+    Поля
+    ----
+    seq:
+        Номер изменения.
+    resource:
+        Коллекция: ``product``, ``price`` или ``category``.
+    object_id:
+        Идентификатор измененного объекта.
+    operation:
+        Вид изменения: ``created``, ``updated`` или ``deleted``.
+    changed_at:
+        Дата изменения.
+    """
+
+    CREATED = "created"
+    UPDATED = "updated"
+    DELETED = "deleted"
+
+    seq = models.BigAutoField(primary_key=True, verbose_name='Номер')
+    resource = models.CharField(max_length=50, verbose_name='Коллекция')
+    object_id = models.PositiveBigIntegerField(verbose_name='Идентификатор объекта')
+    operation = models.CharField(
+        max_length=10,
+        choices=[(CREATED, "Создание"), (UPDATED, "Изменение"), (DELETED, "Удаление")],
+        verbose_name='Изменение',
+    )
+    changed_at = models.DateTimeField(verbose_name='Дата изменения')
+
+    def __str__(self):
+        return f"#{self.seq} {self.operation} {self.resource} {self.object_id}"
+
+    class Meta:
+        verbose_name = "Изменение"
+        verbose_name_plural = "Журнал изменений"
+
+
+class CategoryStock(models.Model):
+    """
+    Модель сводки остатков по категориям.
+
+    Сводка обновляется триггерами БД при изменении количества и категории
+    товаров, поэтому ее чтение не требует агрегирования каталога.
+
+    Поля
+    ----
+    category_id:
+        Идентификатор категории; 0 - товары без категории.
+    product_count:
+        Количество товаров в категории.
+    quantity:
+        Суммарное количество товаров на складе.
+    """
+
+    category_id = models.BigIntegerField(primary_key=True, verbose_name='Категория')
+    product_count = models.BigIntegerField(default=0, verbose_name='Количество товаров')
+    quantity = models.BigIntegerField(default=0, verbose_name='Количество на складе')
+
+    def __str__(self):
+        return f"{self.category_id}: {self.quantity}"
+
+    class Meta:
+        verbose_name = "Остаток категории"
+        verbose_name_plural = "Остатки категорий"
+
+
+class CategoryStockValue(models.Model):
+    """
+    Модель сводки стоимости остатков по категориям и валютам.
+
+    Стоимость хранится целым числом копеек (центов), чтобы инкрементальные
+    изменения складывались без ошибок округления. Сводка обновляется
+    триггерами БД при изменении количества и категории товаров и цен.
+
+    Поля
+    ----
+    category_id:
+        Идентификатор категории; 0 - товары без категории.
+    currency:
+        Валюта.
+    value:
+        Стоимость остатков (количество, умноженное на цену) в сотых долях валюты.
+    """
+
+    category_id = models.BigIntegerField(verbose_name='Категория')
+    currency = models.CharField(max_length=10, verbose_name='Валюта')
+    value = models.BigIntegerField(default=0, verbose_name='Стоимость в сотых долях')
+
+    def __str__(self):
+        return f"{self.category_id}: {self.value} {self.currency}"
+
+    class Meta:
+        verbose_name = "Стоимость остатков категории"
+        verbose_name_plural = "Стоимость остатков категорий"
+        constraints = [
+            models.UniqueConstraint(fields=["category_id", "currency"], name="unique_stock_value_category_currency"),
+        ]
@@ -0,0 +1,246 @@
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import Cursor, CursorPagination, LimitOffsetPagination, _reverse_ordering
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+__all__ = [
+    "KeysetPagination",
+    "ProductPagination",
+    "SearchPagination",
+]
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Постраничная выдача по ключу (keyset) с непрозрачным курсором.
+
+    В отличие от стандартной CursorPagination позиция курсора хранит
+    значения всех полей сортировки, поэтому страница выбирается условием
+    вида ``(a, b) > (x, y)`` без OFFSET. Стоимость любой страницы
+    одинакова и определяется индексом по полям сортировки.
+
+    Поля
+    ----
+    ordering:
+        Поля сортировки. Последним должно идти уникальное поле (обычно ``id``).
+    page_size_query_param:
+        Параметр запроса, которым клиент задает размер страницы.
+    max_page_size:
+        Максимальный размер страницы, который может запросить клиент.
+    """
+
+    ordering = ("id",)
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page(list(queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Вариант paginate_queryset для асинхронных представлений: страница
+        выбирается асинхронным ORM.
+        """
+        queryset = self.get_page_queryset(queryset, request, view)
+        if queryset is None:
+            return None
+        return self.set_page([obj async for obj in queryset])
+
+    def get_page_queryset(self, queryset, request, view=None):
+        """
+        Разбирает курсор и возвращает запрос страницы (на одну запись больше
+        ее размера) или None, если постраничная выдача отключена.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            self.reverse, self.current_position = False, None
+        else:
+            _, self.reverse, self.current_position = self.cursor
+
+        if self.reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if self.current_position is not None:
+            queryset = queryset.filter(self._keyset_filter(self.current_position, self.reverse))
+
+        # Одна лишняя запись показывает, есть ли следующая страница.
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        """
+        Запоминает страницу и позиции соседних страниц по выбранным записям.
+        """
+        reverse, current_position = self.reverse, self.current_position
+        self.page = results[:self.page_size]
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(self.page[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = current_position is not None
+            self.has_previous = has_following_position
+            self.next_position = current_position
+            self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = current_position is not None
+            self.next_position = following_position
+            self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        position = self.next_position
+        if self.page:
+            position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        position = self.previous_position
+        if self.page:
+            position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(Cursor(offset=0, reverse=True, position=position))
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is None or cursor.position is None:
+            return cursor
+        try:
+            values = json.loads(cursor.position)
+        except ValueError:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return cursor._replace(position=values)
+
+    def encode_cursor(self, cursor):
+        if cursor.position is not None:
+            cursor = cursor._replace(position=json.dumps(cursor.position, separators=(",", ":")))
+        return super().encode_cursor(cursor)
+
+    def _get_position_from_instance(self, instance, ordering):
+        position = []
+        for field in ordering:
+            field_name = field.lstrip("-")
+            if isinstance(instance, dict):
+                value = instance[field_name]
+            else:
+                value = getattr(instance, field_name)
+            position.append(None if value is None else str(value))
+        return position
+
+    def _keyset_filter(self, position, reverse):
+        """
+        Строит условие ``(f1, f2, ...) > (v1, v2, ...)`` с учетом направления
+        сортировки каждого поля и направления курсора.
+
+        Параметры
+        ----------
+        position : list
+            Значения полей сортировки граничной записи.
+        reverse : bool
+            Признак движения курсора назад.
+
+        Возвращает
+        ----------
+        Q
+            Условие выбора записей, следующих за граничной.
+        """
+        conditions = []
+        equal = Q()
+        bound = None
+        for field, value in zip(self.ordering, position):
+            descending = field.startswith("-")
+            name = field.lstrip("-")
+            lookup = "lt" if descending != reverse else "gt"
+            if bound is None:
+                # Дублирующее условие на первое поле (``f1 >= v1``) позволяет
+                # SQLite начать поиск по индексу с позиции курсора, а не сканировать
+                # индекс с начала: условие с OR диапазоном индекса не считается.
+                bound = Q(**{f"{name}__{lookup}e": value})
+            conditions.append(equal & Q(**{f"{name}__{lookup}": value}))
+            equal &= Q(**{name: value})
+        return bound & reduce(or_, conditions)
+
+
+class ProductPagination(KeysetPagination):
+    """
+    Постраничная выдача товаров в порядке обновления ``(updated_at, id)``.
+    """
+
+    ordering = ("updated_at", "id")
+
+
+class SearchPagination(LimitOffsetPagination):
+    """
+    Постраничная выдача результатов поиска по смещению.
+
+    Порядок по релевантности не хранится в полях модели, поэтому выдача по
+    ключу к нему неприменима. Общее количество найденного не подсчитывается:
+    выбирается на одну запись больше страницы, чтобы узнать, есть ли следующая.
+    Ответ имеет тот же вид, что и у KeysetPagination.
+
+    Поля
+    ----
+    limit_query_param:
+        Параметр размера страницы, общий с KeysetPagination.
+    max_limit:
+        Максимальный размер страницы, который может запросить клиент.
+    """
+
+    limit_query_param = "page_size"
+    max_limit = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        results = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(results) > self.limit
+        return results[:self.limit]
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "results": data,
+        })
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = replace_query_param(self.request.build_absolute_uri(), self.limit_query_param, self.limit)
+        return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
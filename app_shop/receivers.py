@@ -0,0 +1,47 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import get_barcode_cache
+from .events import publish_changes
+from .metrics import record_query
+from .models import *
+from .signals import products_changed
+
+
+def invalidate_products(product_ids=(), barcodes=()):
+    """
+    Сбрасывает кэш штрихкодов сразу и повторно после фиксации транзакции,
+    чтобы параллельное чтение не вернуло в кэш незафиксированное состояние.
+    """
+    cache = get_barcode_cache()
+    cache.invalidate(product_ids, barcodes)
+    transaction.on_commit(lambda: cache.invalidate(product_ids, barcodes))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_written(sender, instance, **kwargs):
+    invalidate_products([instance.pk], [instance.barcode])
+    publish_changes([instance.pk], "product")
+
+
+@receiver(post_save, sender=Price)
+@receiver(post_delete, sender=Price)
+def price_written(sender, instance, **kwargs):
+    invalidate_products([instance.product_id])
+    publish_changes([instance.product_id], "price")
+
+
+@receiver(products_changed)
+def products_bulk_changed(sender, product_ids, barcodes=None, kind="product", **kwargs):
+    invalidate_products(product_ids, barcodes or ())
+    publish_changes(product_ids, kind)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    # В начало списка: execute_wrapper() снимает свою обертку через pop().
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
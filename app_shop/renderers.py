@@ -0,0 +1,48 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+__all__ = ["FastJSONRenderer"]
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer на orjson (необязательная зависимость) с тем же выводом.
+
+    Строки, числа, списки и словари orjson сериализует так же, как
+    ``json.dumps`` в JSONRenderer (компактно, без экранирования не-ASCII);
+    datetime, Decimal и другие типы передаются кодировщику DRF.
+    Отступы (``indent``), несовместимые с orjson данные (например, ключи не
+    строки и целые больше 64 бит) и отсутствие orjson обрабатываются
+    стандартным JSONRenderer. Числа с плавающей точкой в экспоненциальной
+    записи orjson записывает иначе (``1e16`` вместо ``1e+16``); в каталоге
+    таких полей нет.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or data is None
+            or self.ensure_ascii
+            or not self.compact
+            or not self.strict
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Как и JSONRenderer, экранирует U+2028 и U+2029.
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
@@ -0,0 +1,165 @@
+import random
+import sqlite3
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+__all__ = [
+    "STICKY_COOKIE",
+    "get_replication_settings",
+    "ReplicaRouter",
+    "ReplicaRoutingMiddleware",
+    "refresh_replica",
+]
+
+
+# Cookie клиента, который недавно изменял данные: момент (time.time()),
+# до которого его запросы чтения обслуживает основная БД.
+STICKY_COOKIE = "shop_primary_until"
+
+# Реплика, с которой читает текущий запрос, или None - основная БД.
+_read_alias = ContextVar("shop_read_alias", default=None)
+
+
+def get_replication_settings():
+    """
+    Возвращает настройки SHOP_REPLICATION: псевдонимы реплик для чтения
+    (REPLICAS) и время в секундах после изменения данных, в течение которого
+    клиент читает с основной БД (STICKY_SECONDS).
+    """
+    return {"REPLICAS": [], "STICKY_SECONDS": 5, **getattr(settings, "SHOP_REPLICATION", {})}
+
+
+class ReplicaRouter:
+    """
+    Маршрутизатор БД: чтение в запросах, отмеченных ReplicaRoutingMiddleware,
+    выполняется на реплике, все остальные запросы и любая запись - на
+    основной БД. Миграции к репликам не применяются: реплики - копии основной БД.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replication_settings()["REPLICAS"]:
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Промежуточный слой выбора БД для чтения.
+
+    Запросы GET и HEAD к действиям, перечисленным в атрибуте
+    ``read_replica_actions`` представления (list и retrieve каталога),
+    читают со случайной реплики. Клиент, выполнивший успешный изменяющий
+    запрос, получает cookie STICKY_COOKIE и в течение STICKY_SECONDS
+    читает с основной БД, поэтому видит свои изменения, даже если реплика
+    отстает. Работает и в синхронном, и в асинхронном режиме: под ASGI
+    запросы не переходят в поток ради этого слоя.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+            # Асинхронный обработчик вызывает process_view без перехода в поток.
+            self.process_view = self.aprocess_view
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _read_alias.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.mark_sticky(request, response)
+
+    async def __acall__(self, request):
+        token = _read_alias.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_alias.reset(token)
+        return self.mark_sticky(request, response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        self.route(request, view_func)
+        return None
+
+    async def aprocess_view(self, request, view_func, view_args, view_kwargs):
+        self.route(request, view_func)
+        return None
+
+    def route(self, request, view_func):
+        """
+        Выбирает реплику для чтения, если запрос читает действием из read_replica_actions.
+        """
+        replicas = get_replication_settings()["REPLICAS"]
+        if not replicas or request.method not in ("GET", "HEAD") or self.is_sticky(request):
+            return
+        actions = getattr(view_func, "actions", None) or {}
+        allowed = getattr(getattr(view_func, "cls", None), "read_replica_actions", ())
+        if actions.get(request.method.lower()) in allowed:
+            _read_alias.set(random.choice(replicas))
+
+    def mark_sticky(self, request, response):
+        """
+        Закрепляет за основной БД клиента, успешно изменившего данные.
+        """
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            sticky = get_replication_settings()["STICKY_SECONDS"]
+            if sticky:
+                response.set_cookie(STICKY_COOKIE, f"{time.time() + sticky:.3f}", max_age=sticky, httponly=True)
+        return response
+
+    def is_sticky(self, request):
+        """
+        Возвращает True, если клиент недавно изменял данные и должен читать с основной БД.
+        """
+        try:
+            return float(request.COOKIES.get(STICKY_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+
+def refresh_replica(alias, source=DEFAULT_DB_ALIAS):
+    """
+    Обновляет реплику SQLite копией основной БД (backup API SQLite).
+
+    Копия снимается за один шаг, поэтому реплика получает согласованное
+    состояние основной БД на момент копирования; запись в основную БД при
+    этом не блокируется (в режиме WAL). Соединения реплики видят новые
+    данные со следующей транзакции чтения.
+
+    Параметры
+    ----------
+    alias : str
+        Псевдоним реплики в DATABASES.
+    source : str
+        Псевдоним основной БД.
+    """
+    primary = sqlite3.connect(settings.DATABASES[source]["NAME"])
+    try:
+        replica = sqlite3.connect(settings.DATABASES[alias]["NAME"], timeout=30)
+        try:
+            primary.backup(replica)
+        finally:
+            replica.close()
+    finally:
+        primary.close()
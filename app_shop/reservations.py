@@ -0,0 +1,189 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from .models import *
+from .signals import products_changed
+
+
+__all__ = ["get_reservation_settings", "reserve", "confirm", "release", "release_expired"]
+
+
+def get_reservation_settings():
+    """
+    Возвращает настройки резервов SHOP_RESERVATIONS: срок резерва по
+    умолчанию (TTL) и максимальный срок (MAX_TTL) в секундах.
+    """
+    return {"TTL": 900, "MAX_TTL": 86400, **getattr(settings, "SHOP_RESERVATIONS", {})}
+
+
+def reserve(product, amount, ttl=None):
+    """
+    Резервирует количество товара на срок ttl.
+
+    Резерв удерживается запросом
+    ``UPDATE ... SET reserved = reserved + amount WHERE id = ? AND quantity - reserved >= amount``,
+    поэтому одновременные резервы и списания не превышают остаток без
+    блокировок в приложении. Если товара не хватает, сначала освобождаются
+    истекшие резервы этого товара и попытка повторяется.
+
+    Параметры
+    ----------
+    product : Product
+        Товар.
+    amount : int
+        Количество, больше 0.
+    ttl : int | None
+        Срок резерва в секундах; None - срок по умолчанию.
+
+    Возвращает
+    ----------
+    Reservation
+        Созданный активный резерв.
+
+    Исключения
+    ----------
+    ValueError
+        Вызывается, если amount не больше 0, доступного количества недостаточно
+        или у товара раздельный остаток (Product.stock_slots).
+    """
+    if amount <= 0:
+        raise ValueError("Количество резерва должно быть положительным.")
+    if product.stock_slots:
+        raise ValueError("Товар с раздельным остатком нельзя зарезервировать.")
+    ttl = get_reservation_settings()["TTL"] if ttl is None else ttl
+    with transaction.atomic():
+        if not _hold(product.pk, amount):
+            if not release_expired(product_ids=[product.pk]) or not _hold(product.pk, amount):
+                raise ValueError("Недостаточно товара на складе.")
+        reservation = Reservation.objects.create(
+            product=product, amount=amount, expires_at=timezone.now() + timedelta(seconds=ttl)
+        )
+    products_changed.send(sender=Product, product_ids=[product.pk], barcodes=[product.barcode])
+    return reservation
+
+
+def _hold(product_id, amount):
+    return Product.objects.filter(pk=product_id, stock_slots=0, quantity__gte=F("reserved") + amount).update(
+        reserved=F("reserved") + amount,
+        updated_at=timezone.now(),
+    )
+
+
+def confirm(reservation):
+    """
+    Подтверждает активный резерв: количество списывается со склада.
+
+    Исключения
+    ----------
+    ValueError
+        Вызывается, если резерв не активен или его срок истек.
+    """
+    _close(reservation, Reservation.CONFIRMED, {"quantity": F("quantity") - reservation.amount})
+
+
+def release(reservation):
+    """
+    Отменяет активный резерв: количество возвращается в продажу.
+
+    Исключения
+    ----------
+    ValueError
+        Вызывается, если резерв не активен.
+    """
+    _close(reservation, Reservation.RELEASED, {})
+
+
+def _close(reservation, status, changes):
+    """
+    Переводит активный резерв в состояние status и снимает удержание с товара.
+
+    Состояние меняется условным запросом ``UPDATE ... WHERE status = 'active'``,
+    поэтому из одновременных подтверждений и отмен выполняется только одно.
+    Подтвердить можно только резерв, срок которого не истек.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        active = Reservation.objects.filter(pk=reservation.pk, status=Reservation.ACTIVE)
+        if status == Reservation.CONFIRMED:
+            active = active.filter(expires_at__gt=now)
+        if not active.update(status=status, updated_at=now):
+            raise ValueError("Резерв не активен или его срок истек.")
+        Product.objects.filter(pk=reservation.product_id).update(
+            reserved=F("reserved") - reservation.amount,
+            updated_at=now,
+            **changes,
+        )
+    products_changed.send(sender=Product, product_ids=[reservation.product_id], barcodes=None)
+    reservation.status = status
+    reservation.updated_at = now
+
+
+def release_expired(now=None, batch_size=500, product_ids=None):
+    """
+    Освобождает истекшие активные резервы пачками.
+
+    Каждая пачка обрабатывается в своей транзакции тремя запросами: выбор
+    истекших резервов (по частичному индексу), перевод их в состояние
+    ``expired`` условным запросом ``UPDATE ... WHERE status = 'active'`` и
+    уменьшение Product.reserved одним запросом
+    ``UPDATE ... SET reserved = reserved - CASE id WHEN ... END``.
+    select_for_update не блокирует строки в SQLite, поэтому резерв может
+    быть подтвержден или отменен между выбором и переводом; тогда пачка
+    переводится по одному резерву, и удержание снимается только с
+    резервов, которые перевел этот вызов.
+
+    Параметры
+    ----------
+    now : datetime | None
+        Момент, на который определяется истечение; None - текущее время.
+    batch_size : int
+        Количество резервов в пачке.
+    product_ids : Iterable[int] | None
+        Ограничение по товарам; None - все товары.
+
+    Возвращает
+    ----------
+    int
+        Количество освобожденных резервов.
+    """
+    now = timezone.now() if now is None else now
+    # На каждый товар приходится три параметра: id в IN, id и количество в CASE.
+    batch_size = min(batch_size, query_batch_size(3))
+    expired = Reservation.objects.filter(status=Reservation.ACTIVE, expires_at__lte=now)
+    if product_ids is not None:
+        expired = expired.filter(product_id__in=list(product_ids))
+
+    released = 0
+    while True:
+        with transaction.atomic():
+            rows = list(
+                expired.select_for_update().order_by("expires_at").values_list("pk", "product_id", "amount")[:batch_size]
+            )
+            if not rows:
+                break
+            selected = len(rows)
+            active = Reservation.objects.filter(status=Reservation.ACTIVE)
+            with transaction.atomic():
+                changed = active.filter(pk__in=[pk for pk, _, _ in rows]).update(
+                    status=Reservation.EXPIRED, updated_at=now
+                )
+                if changed != selected:
+                    transaction.set_rollback(True)
+            if changed != selected:
+                rows = [row for row in rows if active.filter(pk=row[0]).update(status=Reservation.EXPIRED, updated_at=now)]
+            amounts = {}
+            for _, product_id, amount in rows:
+                amounts[product_id] = amounts.get(product_id, 0) + amount
+            if amounts:
+                delta = Case(*(When(pk=pk, then=Value(amount)) for pk, amount in amounts.items()))
+                Product.objects.filter(pk__in=amounts).update(reserved=F("reserved") - delta, updated_at=now)
+        released += len(rows)
+        if amounts:
+            products_changed.send(sender=Product, product_ids=list(amounts), barcodes=None)
+        if selected < batch_size:
+            break
+    return released
@@ -0,0 +1,66 @@
+import re
+
+from django.db.models.expressions import RawSQL
+
+
+__all__ = ["FTS_TABLE", "build_match_query", "search_products", "filter_products"]
+
+
+FTS_TABLE = "app_shop_product_fts"
+
+WORD = re.compile(r"\w+")
+
+
+def build_match_query(text):
+    """
+    Преобразует строку поиска в запрос FTS5.
+
+    Каждое слово ищется по префиксу, все слова обязательны. Операторы и
+    кавычки FTS5 из строки не передаются, поэтому запрос всегда корректен.
+
+    Параметры
+    ----------
+    text : str
+        Строка поиска, введенная пользователем.
+
+    Возвращает
+    ----------
+    str | None
+        Запрос для оператора MATCH или None, если в строке нет слов.
+    """
+    words = WORD.findall(text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_products(queryset, text):
+    """
+    Ищет товары по названию, названию и описанию категории.
+
+    Возвращает набор товаров, упорядоченный по релевантности (bm25);
+    каждому товару добавляется поле ``search_rank`` (меньше - релевантнее).
+    Если в строке поиска нет слов, возвращается пустой набор.
+    """
+    query = build_match_query(text)
+    if query is None:
+        return queryset.none()
+    table = queryset.model._meta.db_table
+    return queryset.extra(
+        tables=[FTS_TABLE],
+        where=[f"{FTS_TABLE}.rowid = {table}.id", f"{FTS_TABLE} MATCH %s"],
+        params=[query],
+        select={"search_rank": f"{FTS_TABLE}.rank"},
+    ).order_by("search_rank")
+
+
+def filter_products(queryset, text, field="pk"):
+    """
+    Отбирает товары (или объекты, у которых поле field ссылается на товар),
+    найденные полнотекстовым поиском, сохраняя порядок набора.
+    """
+    query = build_match_query(text)
+    if query is None:
+        return queryset.none()
+    matches = RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [query])
+    return queryset.filter(**{f"{field}__in": matches})
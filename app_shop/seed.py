@@ -0,0 +1,122 @@
+import random
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import *
+from .signals import products_changed
+
+
+__all__ = ["CURRENCIES", "ean13", "seed_catalog"]
+
+
+CURRENCIES = ("RUB", "USD", "EUR", "CNY", "KZT", "BYN", "GBP", "JPY")
+
+ADJECTIVES = ("Свежий", "Домашний", "Большой", "Малый", "Отборный", "Фермерский", "Классический", "Новый")
+NOUNS = ("хлеб", "сыр", "чай", "кофе", "сок", "йогурт", "творог", "мед", "рис", "шоколад")
+WORDS = ("молочные", "продукты", "напитки", "бакалея", "сладости", "выпечка", "овощи", "фрукты", "заморозка")
+
+
+def ean13(number):
+    """
+    Дополняет 12 цифр контрольной цифрой штрихкода EAN-13.
+    """
+    digits = f"{number:012d}"
+    total = sum(int(digit) * (3 if position % 2 else 1) for position, digit in enumerate(digits))
+    return digits + str((10 - total % 10) % 10)
+
+
+def seed_catalog(products, prices_per_product=2, categories=20, seed=0, batch_size=5000, progress=None):
+    """
+    Заполняет каталог синтетическими категориями, товарами и ценами.
+
+    Данные определяются только seed и размерами каталога: значения каждого
+    товара и его цен выбираются подряд из одного генератора, поэтому
+    результат не зависит от batch_size. Штрихкоды - корректные EAN-13
+    с префиксом ``2`` (внутренняя нумерация) и двумя цифрами seed, так что
+    каталоги с разными seed не пересекаются. Запись выполняется пачками,
+    каждая пачка - в своей транзакции.
+
+    Параметры
+    ----------
+    products : int
+        Количество товаров (не более 10**9).
+    prices_per_product : int
+        Количество цен каждого товара в разных валютах (не более len(CURRENCIES)).
+    categories : int
+        Количество категорий; около 5% товаров создаются без категории.
+    seed : int
+        Начальное значение генератора.
+    batch_size : int
+        Количество товаров в одной транзакции.
+    progress : Callable[[int], None] | None
+        Вызывается после каждой пачки с количеством созданных товаров.
+
+    Возвращает
+    ----------
+    dict[str, int]
+        Количество созданных категорий, товаров и цен.
+
+    Исключения
+    ----------
+    ValueError
+        Вызывается при некорректных размерах каталога.
+    """
+    if products < 0 or products > 10 ** 9 or categories < 0 or batch_size <= 0:
+        raise ValueError("Некорректные размеры каталога.")
+    if not 0 <= prices_per_product <= len(CURRENCIES):
+        raise ValueError(f"Количество цен товара должно быть от 0 до {len(CURRENCIES)}.")
+
+    rng = random.Random(seed)
+    prefix = 200 + seed % 100
+    with transaction.atomic():
+        category_ids = [
+            category.pk
+            for category in Category.objects.bulk_create(
+                Category(name=f"Категория {i + 1}", description=" ".join(rng.sample(WORDS, 3)))
+                for i in range(categories)
+            )
+        ]
+
+    created = {"categories": len(category_ids), "products": 0, "prices": 0}
+    pending = []
+    for i in range(products):
+        category = rng.choice(category_ids) if category_ids and rng.random() >= 0.05 else None
+        product = Product(
+            name=f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i + 1}",
+            quantity=rng.randint(100, 100000),
+            barcode=ean13(prefix * 10 ** 9 + i),
+            category_id=category,
+        )
+        amounts = [
+            (currency, Decimal(rng.randint(100, 1000000)).scaleb(-2))
+            for currency in rng.sample(CURRENCIES, prices_per_product)
+        ]
+        pending.append((product, amounts))
+        if len(pending) >= batch_size:
+            _write_batch(pending, created)
+            pending = []
+            if progress is not None:
+                progress(created["products"])
+    if pending:
+        _write_batch(pending, created)
+        if progress is not None:
+            progress(created["products"])
+    return created
+
+
+def _write_batch(pending, created):
+    with transaction.atomic():
+        products = Product.objects.bulk_create(product for product, _ in pending)
+        prices = Price.objects.bulk_create(
+            Price(product_id=product.pk, currency=currency, amount=amount)
+            for product, (_, amounts) in zip(products, pending)
+            for currency, amount in amounts
+        )
+    created["products"] += len(products)
+    created["prices"] += len(prices)
+    products_changed.send(
+        sender=Product,
+        product_ids=[product.pk for product in products],
+        barcodes=[product.barcode for product in products],
+    )
@@ -1,20 +1,197 @@
-from rest_framework.serializers import ModelSerializer, Serializer, IntegerField
+import decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models.manager import BaseManager
+from django.utils import timezone
+from rest_framework.fields import BooleanField, DateTimeField, DecimalField, ReadOnlyField
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.serializers import (
+    CharField,
+    IntegerField,
+    ListField,
+    ListSerializer,
+    ModelSerializer,
+    Serializer,
+    ValidationError,
+)
+from rest_framework.settings import ISO_8601, api_settings
 
 from .models import *
+from .reservations import get_reservation_settings
+from .stock import set_stock_quantity, stock_quantities
 
 
 __all__ = [
+    "FastReadMixin",
     "ProductSerializer", 
     "ReduceQuantitySerializer",
+    "CheckoutLineSerializer",
+    "CheckoutSerializer",
+    "ProductBatchSerializer",
     "PriceSerializer",
-    "CategorySerializer"
+    "ProductPriceSerializer",
+    "CategorySerializer",
+    "ExchangeRateSerializer",
+    "ReserveSerializer",
+    "ReservationSerializer",
 ]
 
-class ProductSerializer(ModelSerializer):
+# Поля, чье to_representation не меняет значения соответствующего типа из БД.
+_IDENTITY = {
+    BooleanField.to_representation,
+    CharField.to_representation,
+    IntegerField.to_representation,
+    ReadOnlyField.to_representation,
+}
+
+
+class FastReadMixin:
+    """
+    Быстрое чтение для ModelSerializer: представление строится из строк
+    ``QuerySet.values()`` без создания объектов модели и обхода полей
+    сериализатора.
+
+    Для каждого поля один раз подбирается преобразователь значения
+    (Decimal, datetime или значение как есть), повторяющий to_representation
+    поля DRF, поэтому результат совпадает с ``serializer.data``.
+    Поддерживаются поля модели и первичные ключи связанных объектов;
+    для остальных полей быстрое чтение недоступно.
+    """
+
+    @classmethod
+    def get_fast_fields(cls):
+        """
+        Возвращает и кэширует для класса поля быстрого чтения:
+        список ``(имя поля, имя в values(), преобразователь)``.
+
+        Исключения
+        ----------
+        TypeError
+            Вызывается, если поле сериализатора не поддерживается.
+        """
+        if "_fast_fields" not in cls.__dict__:
+            fields = []
+            for name, field in cls().fields.items():
+                if field.write_only:
+                    continue
+                if field.source == "*" or "." in field.source:
+                    raise TypeError(f"Поле {cls.__name__}.{name} не поддерживает быстрое чтение.")
+                fields.append((name, field.source, _fast_converter(field)))
+            cls._fast_fields = fields
+        return cls._fast_fields
+
+    @classmethod
+    def fast_values(cls, queryset):
+        """
+        Возвращает набор строк ``values()`` с полями, нужными для представления.
+        """
+        return queryset.values(*(source for _, source, _ in cls.get_fast_fields()))
+
+    @classmethod
+    def fast_data(cls, rows):
+        """
+        Строит представления объектов по строкам ``values()``.
+        """
+        fields = cls.get_fast_fields()
+        tz = timezone.get_current_timezone() if settings.USE_TZ else None
+        data = []
+        for row in rows:
+            item = {}
+            for name, source, convert in fields:
+                value = row[source]
+                item[name] = None if value is None else (convert(value, tz) if convert else value)
+            data.append(item)
+        return data
+
+
+def _fast_converter(field):
+    """
+    Подбирает преобразователь значения поля ``convert(value, tz)``;
+    None означает, что значение передается как есть.
+    """
+    if isinstance(field, DateTimeField):
+        output_format = getattr(field, "format", api_settings.DATETIME_FORMAT)
+        if output_format is None or hasattr(field, "timezone"):
+            return lambda value, tz: field.to_representation(value)
+        if output_format.lower() != ISO_8601:
+            return lambda value, tz: field.enforce_timezone(value).strftime(output_format)
+
+        def convert(value, tz):
+            if isinstance(value, str):
+                return value
+            value = field.enforce_timezone(value) if tz is None or timezone.is_naive(value) else value.astimezone(tz)
+            value = value.isoformat()
+            if value.endswith("+00:00"):
+                value = value[:-6] + "Z"
+            return value
+        return convert
+
+    if isinstance(field, DecimalField):
+        coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+        if not coerce_to_string or field.localize or field.normalize_output or field.decimal_places is None:
+            return lambda value, tz: field.to_representation(value)
+        exponent = decimal.Decimal(".1") ** field.decimal_places
+        context = decimal.getcontext().copy()
+        if field.max_digits is not None:
+            context.prec = field.max_digits
+
+        def convert(value, tz):
+            if not isinstance(value, decimal.Decimal):
+                value = decimal.Decimal(str(value).strip())
+            return "{:f}".format(value.quantize(exponent, rounding=field.rounding, context=context))
+        return convert
+
+    if isinstance(field, PrimaryKeyRelatedField):
+        if field.pk_field is not None:
+            return lambda value, tz: field.pk_field.to_representation(value)
+        return None
+
+    if type(field).to_representation in _IDENTITY:
+        return None
+    if isinstance(field, Serializer) or getattr(field, "many", False):
+        raise TypeError(f"Поле {field.field_name} не поддерживает быстрое чтение.")
+    return lambda value, tz: field.to_representation(value)
+
+
+class ProductListSerializer(ListSerializer):
+    """
+    Сериализатор списка товаров: остатки товаров с раздельным остатком
+    подбираются одним запросом на список, а не на каждый товар.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, BaseManager) else data)
+        sharded = [item for item in items if item.stock_slots]
+        if sharded:
+            quantities = stock_quantities(item.pk for item in sharded)
+            for item in sharded:
+                item._stock_quantity = quantities.get(item.pk, 0)
+        return super().to_representation(items)
+
+
+class ProductSerializer(FastReadMixin, ModelSerializer):
     """
     Сериализатор для GET (ALL), CREATE, PUT/PATCH, DELETE операций с объектами Product.
+
+    Если в контексте передан набор expand, в представление встраиваются
+    связанные объекты: ``category`` - объект категории вместо ее id,
+    ``prices`` - список цен товара. Встроенные поля доступны только для чтения.
+
+    Для товара с раздельным остатком (stock_slots больше 0) поле quantity
+    содержит сумму слотов, а новое значение quantity распределяется между слотами.
     """
 
+    EXPANDABLE = ("category", "prices")
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        expand = self.context.get("expand", ())
+        if "category" in expand:
+            self.fields["category"] = CategorySerializer(read_only=True)
+        if "prices" in expand:
+            self.fields["prices"] = ProductPriceSerializer(source="price_set", many=True, read_only=True)
+
     class Meta:
         """
         В сериализатор включены все поля.
@@ -22,9 +199,41 @@ class ProductSerializer(ModelSerializer):
 
         model = Product
         fields = "__all__"
+        read_only_fields = ("reserved", "stock_slots")
+        list_serializer_class = ProductListSerializer
+
+    @classmethod
+    def fast_data(cls, rows):
+        data = super().fast_data(rows)
+        sharded = [item for item in data if item["stock_slots"]]
+        if sharded:
+            quantities = stock_quantities(item["id"] for item in sharded)
+            for item in sharded:
+                item["quantity"] = quantities.get(item["id"], 0)
+        return data
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        if instance.stock_slots:
+            quantity = getattr(instance, "_stock_quantity", None)
+            data["quantity"] = stock_quantities([instance.pk]).get(instance.pk, 0) if quantity is None else quantity
+        return data
+
+    def validate_quantity(self, value):
+        if self.instance is not None and value < self.instance.reserved:
+            raise ValidationError(f"Количество меньше зарезервированного ({self.instance.reserved}).")
+        return value
+
+    def update(self, instance, validated_data):
+        if not instance.stock_slots or "quantity" not in validated_data:
+            return super().update(instance, validated_data)
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            set_stock_quantity(instance, instance.quantity)
+        return instance
 
 
-class PriceSerializer(ModelSerializer):
+class PriceSerializer(FastReadMixin, ModelSerializer):
     """
     Сериализатор для GET (ALL), CREATE, PUT/PATCH, DELETE операций с объектами Price.
     """
@@ -39,13 +248,87 @@ class PriceSerializer(ModelSerializer):
 
 
 
+class ProductPriceSerializer(ModelSerializer):
+    """
+    Сериализатор цены, встроенной в представление товара.
+    """
+
+    class Meta:
+        model = Price
+        fields = ("id", "currency", "amount")
+
+
 class ReduceQuantitySerializer(Serializer):
 
     amount = IntegerField(required=True)
 
 
+class ReserveSerializer(Serializer):
+    """
+    Сериализатор запроса на резерв товара: количество и срок резерва в секундах.
+    """
+
+    amount = IntegerField(required=True, min_value=1)
+    ttl = IntegerField(required=False, min_value=1)
+
+    def validate_ttl(self, value):
+        max_ttl = get_reservation_settings()["MAX_TTL"]
+        if value > max_ttl:
+            raise ValidationError(f"Срок резерва не может превышать {max_ttl} секунд.")
+        return value
 
-class CategorySerializer(ModelSerializer):
+
+class ReservationSerializer(ModelSerializer):
+    """
+    Сериализатор резерва товара (только для чтения).
+    """
+
+    class Meta:
+        model = Reservation
+        fields = "__all__"
+        read_only_fields = ("product", "amount", "status", "expires_at", "created_at", "updated_at")
+
+
+class CheckoutLineSerializer(Serializer):
+    """
+    Сериализатор позиции корзины: товар задается либо product_id, либо barcode.
+    """
+
+    product_id = IntegerField(required=False)
+    barcode = CharField(required=False, max_length=50)
+    amount = IntegerField(required=True, min_value=1)
+
+    def validate(self, attrs):
+        if ("product_id" in attrs) == ("barcode" in attrs):
+            raise ValidationError("Укажите либо product_id, либо barcode.")
+        return attrs
+
+
+class CheckoutSerializer(Serializer):
+    """
+    Сериализатор запроса на списание нескольких позиций корзины.
+    """
+
+    lines = CheckoutLineSerializer(many=True, allow_empty=False, max_length=500)
+
+
+class ProductBatchSerializer(Serializer):
+    """
+    Сериализатор запроса на получение нескольких товаров: список
+    идентификаторов (ids) либо список штрихкодов (barcodes).
+    """
+
+    ids = ListField(child=IntegerField(), required=False, allow_empty=False, max_length=500)
+    barcodes = ListField(child=CharField(max_length=50), required=False, allow_empty=False, max_length=500)
+
+    def validate(self, attrs):
+        if ("ids" in attrs) == ("barcodes" in attrs):
+            raise ValidationError("Укажите либо ids, либо barcodes.")
+        return attrs
+
+
+
+class CategorySerializer(FastReadMixin, ModelSerializer):
     """
     Сериализатор для GET (ALL), CREATE, PUT/PATCH, DELETE операций с объектами Category.
     """
@@ -56,4 +339,19 @@ class CategorySerializer(ModelSerializer):
         """
 
         model = Category
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
+
+
+class ExchangeRateSerializer(FastReadMixin, ModelSerializer):
+    """
+    Сериализатор для GET (ALL), CREATE, PUT/PATCH, DELETE операций с объектами ExchangeRate.
+    """
+
+    class Meta:
+        """
+        В сериализатор включены все поля.
+        """
+
+        model = ExchangeRate
+        fields = "__all__"
+
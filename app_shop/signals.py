@@ -0,0 +1,12 @@
+from django.dispatch import Signal
+
+
+__all__ = ["products_changed"]
+
+
+# Отправляется после изменения товаров в обход Model.save() (запросы UPDATE,
+# bulk_create), когда стандартные post_save/post_delete не срабатывают.
+# Аргументы: product_ids - идентификаторы измененных товаров,
+# barcodes - их штрихкоды, если известны, kind - вид изменения: "product"
+# (товар или его остаток, по умолчанию) или "price" (цены товаров).
+products_changed = Signal()
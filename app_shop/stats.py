@@ -0,0 +1,186 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+
+from .models import *
+
+
+__all__ = ["NO_CATEGORY", "get_category_stats", "find_drift", "rebuild_stats"]
+
+
+# Ключ сводки для товаров без категории.
+NO_CATEGORY = 0
+
+STOCK_QUERY = """
+SELECT COALESCE(category_id, 0), COUNT(*), SUM(quantity)
+FROM app_shop_product GROUP BY 1
+"""
+
+VALUE_QUERY = """
+SELECT COALESCE(product.category_id, 0), price.currency,
+       SUM(product.quantity * CAST(ROUND(price.amount * 100) AS INTEGER))
+FROM app_shop_price AS price JOIN app_shop_product AS product ON product.id = price.product_id
+GROUP BY 1, 2
+"""
+
+# Поправка сводки на товары с раздельным остатком: сводка учитывает их
+# снимок (поле quantity), а текущий остаток - сумма слотов. Слоты есть
+# только у таких товаров, поэтому запрос читает таблицу слотов, а не товаров.
+SHARDED_QUERY = """
+WITH slot AS (
+    SELECT product_id, SUM(quantity) AS quantity FROM app_shop_stockslot GROUP BY product_id
+)
+SELECT product.id, COALESCE(product.category_id, 0), slot.quantity - product.quantity,
+       price.currency, CAST(ROUND(price.amount * 100) AS INTEGER)
+FROM slot
+JOIN app_shop_product AS product ON product.id = slot.product_id AND product.stock_slots > 0
+LEFT JOIN app_shop_price AS price ON price.product_id = product.id
+"""
+
+
+def get_category_stats(category_ids=None):
+    """
+    Читает сводку остатков и их стоимости по категориям.
+
+    Сводка поддерживается триггерами БД, поэтому чтение не агрегирует
+    товары и цены и выполняется двумя запросами. Товары с раздельным
+    остатком учтены в сводке по снимку остатка (его обновляет
+    перебалансировка); третий запрос поправляет сводку на сумму их слотов.
+
+    Параметры
+    ----------
+    category_ids : Iterable[int] | None
+        Категории (NO_CATEGORY - товары без категории); None - все непустые категории.
+
+    Возвращает
+    ----------
+    dict[int, dict]
+        Сводка по идентификатору категории вида
+        ``{"products": int, "quantity": int, "value": {валюта: Decimal}}``.
+    """
+    stock = CategoryStock.objects.all()
+    values = CategoryStockValue.objects.exclude(value=0).order_by("currency")
+    if category_ids is None:
+        stock = stock.exclude(product_count=0)
+        stats = {}
+    else:
+        category_ids = list(category_ids)
+        stock = stock.filter(category_id__in=category_ids)
+        values = values.filter(category_id__in=category_ids)
+        stats = {pk: {"products": 0, "quantity": 0, "value": {}} for pk in category_ids}
+
+    for category_id, products, quantity in stock.order_by("category_id").values_list(
+        "category_id", "product_count", "quantity"
+    ):
+        stats[category_id] = {"products": products, "quantity": quantity, "value": {}}
+    for category_id, currency, value in values.values_list("category_id", "currency", "value"):
+        if category_id in stats:
+            stats[category_id]["value"][currency] = value
+    _add_sharded(stats)
+    for item in stats.values():
+        item["value"] = {currency: Decimal(value).scaleb(-2) for currency, value in item["value"].items() if value}
+    return stats
+
+
+def _add_sharded(stats):
+    """
+    Добавляет к сводке разницу между суммой слотов и снимком остатка товаров с раздельным остатком.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(SHARDED_QUERY)
+        rows = cursor.fetchall()
+    counted = set()
+    for product_id, category_id, delta, currency, cents in rows:
+        if category_id not in stats or not delta:
+            continue
+        if product_id not in counted:
+            counted.add(product_id)
+            stats[category_id]["quantity"] += delta
+        if currency is not None:
+            value = stats[category_id]["value"]
+            value[currency] = value.get(currency, 0) + delta * cents
+
+
+def _compute():
+    """
+    Агрегирует сводку по товарам и ценам; нулевые строки не возвращаются.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(STOCK_QUERY)
+        stock = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+        cursor.execute(VALUE_QUERY)
+        values = {(row[0], row[1]): row[2] for row in cursor.fetchall() if row[2]}
+    return stock, values
+
+
+def _stored():
+    stock = {
+        category_id: (products, quantity)
+        for category_id, products, quantity in CategoryStock.objects.values_list("category_id", "product_count", "quantity")
+        if products or quantity
+    }
+    values = {
+        (category_id, currency): value
+        for category_id, currency, value in CategoryStockValue.objects.exclude(value=0).values_list(
+            "category_id", "currency", "value"
+        )
+    }
+    return stock, values
+
+
+def find_drift():
+    """
+    Сравнивает сводку с агрегатом по товарам и ценам.
+
+    Возвращает
+    ----------
+    list[str]
+        Описания расхождений; пустой список, если сводка верна.
+    """
+    with transaction.atomic():
+        expected_stock, expected_values = _compute()
+        stock, values = _stored()
+
+    drift = []
+    for category_id in sorted(expected_stock.keys() | stock.keys()):
+        expected = expected_stock.get(category_id, (0, 0))
+        actual = stock.get(category_id, (0, 0))
+        if expected != actual:
+            drift.append(
+                f"Категория {category_id}: товаров и количество {actual[0]}/{actual[1]}, "
+                f"ожидалось {expected[0]}/{expected[1]}."
+            )
+    for category_id, currency in sorted(expected_values.keys() | values.keys()):
+        expected = expected_values.get((category_id, currency), 0)
+        actual = values.get((category_id, currency), 0)
+        if expected != actual:
+            drift.append(
+                f"Категория {category_id}, {currency}: стоимость {Decimal(actual).scaleb(-2)}, "
+                f"ожидалось {Decimal(expected).scaleb(-2)}."
+            )
+    return drift
+
+
+def rebuild_stats():
+    """
+    Пересчитывает сводку с нуля в одной транзакции.
+
+    Возвращает
+    ----------
+    list[str]
+        Расхождения, найденные перед пересчетом.
+    """
+    with transaction.atomic():
+        drift = find_drift()
+        CategoryStock.objects.all().delete()
+        CategoryStockValue.objects.all().delete()
+        stock, values = _compute()
+        CategoryStock.objects.bulk_create(
+            CategoryStock(category_id=category_id, product_count=products, quantity=quantity)
+            for category_id, (products, quantity) in stock.items()
+        )
+        CategoryStockValue.objects.bulk_create(
+            CategoryStockValue(category_id=category_id, currency=currency, value=value)
+            for (category_id, currency), value in values.items()
+        )
+    return drift
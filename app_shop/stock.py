@@ -0,0 +1,158 @@
+from django.db import transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .bulk import in_chunks
+from .models import *
+from .signals import products_changed
+
+
+__all__ = [
+    "STOCK_RESOURCE",
+    "MAX_STOCK_SLOTS",
+    "stock_quantities",
+    "set_stock_slots",
+    "set_stock_quantity",
+    "rebalance",
+]
+
+
+# Коллекция ResourceVersion, версия которой меняется при создании и удалении слотов.
+STOCK_RESOURCE = "stock_slot"
+
+MAX_STOCK_SLOTS = 256
+
+
+def _totals():
+    return StockSlot.objects.order_by().values_list("product_id").annotate(total=Sum("quantity"))
+
+
+def stock_quantities(product_ids=None):
+    """
+    Возвращает остатки товаров с раздельным остатком (сумму слотов)
+    одним запросом на пачку товаров.
+
+    Параметры
+    ----------
+    product_ids : Iterable[int] | None
+        Идентификаторы товаров; None - все товары с раздельным остатком
+        (один запрос без условия IN).
+
+    Возвращает
+    ----------
+    dict[int, int]
+        Остаток по идентификатору товара; товаров без слотов в словаре нет.
+    """
+    if product_ids is None:
+        return dict(_totals())
+    return dict(in_chunks(_totals(), "product_id", product_ids))
+
+
+def set_stock_slots(product, slots):
+    """
+    Включает, изменяет или выключает раздельный остаток товара.
+
+    Текущий остаток (поле quantity или сумма слотов) распределяется поровну
+    между slots слотами; при slots, равном 0, остаток возвращается в поле
+    quantity, а слоты удаляются. Товар с активными резервами перевести на
+    раздельный остаток нельзя: резервы удерживаются в строке товара.
+
+    Параметры
+    ----------
+    product : Product
+        Товар; поля quantity и stock_slots объекта обновляются.
+    slots : int
+        Количество слотов, от 0 до MAX_STOCK_SLOTS.
+
+    Исключения
+    ----------
+    ValueError
+        Вызывается, если количество слотов вне допустимого диапазона или у
+        товара есть активные резервы.
+    """
+    if not 0 <= slots <= MAX_STOCK_SLOTS:
+        raise ValueError(f"Количество слотов должно быть от 0 до {MAX_STOCK_SLOTS}.")
+    updated_at = timezone.now()
+    with transaction.atomic():
+        quantity, reserved, current = (
+            Product.objects.select_for_update()
+            .filter(pk=product.pk)
+            .values_list("quantity", "reserved", "stock_slots")
+            .get()
+        )
+        if slots and reserved:
+            raise ValueError("У товара есть активные резервы.")
+        if current:
+            quantity = sum(
+                StockSlot.objects.select_for_update().filter(product_id=product.pk).values_list("quantity", flat=True)
+            )
+        if slots != current:
+            StockSlot.objects.filter(product_id=product.pk).delete()
+            StockSlot.objects.bulk_create(
+                StockSlot(product_id=product.pk, slot=slot, quantity=0) for slot in range(slots)
+            )
+        if slots:
+            StockSlot.spread(product.pk, quantity, slots)
+        Product.objects.filter(pk=product.pk).update(quantity=quantity, stock_slots=slots, updated_at=updated_at)
+    products_changed.send(sender=Product, product_ids=[product.pk], barcodes=[product.barcode])
+    product.quantity = quantity
+    product.stock_slots = slots
+    product.updated_at = updated_at
+
+
+def set_stock_quantity(product, quantity):
+    """
+    Задает остаток товара с раздельным остатком: quantity распределяется
+    поровну между слотами, поле quantity товара не изменяется.
+    """
+    with transaction.atomic():
+        StockSlot.spread(product.pk, quantity, product.stock_slots)
+    products_changed.send(sender=Product, product_ids=[product.pk], barcodes=[product.barcode])
+
+
+def rebalance(product_ids=None):
+    """
+    Перераспределяет остаток товаров поровну между их слотами.
+
+    Списания опустошают слоты неравномерно, и списание, которому не хватает
+    товара в одном слоте, собирается из нескольких слотов в транзакции.
+    Перебалансировка выравнивает слоты и записывает сумму слотов в поле
+    quantity товара (снимок для фильтров, сводки по категориям и журнала
+    изменений: списания из слотов их не обновляют).
+    Каждый товар обрабатывается в своей короткой транзакции; товары, слоты
+    и снимок которых уже выровнены, не изменяются.
+
+    Параметры
+    ----------
+    product_ids : Iterable[int] | None
+        Ограничение по товарам; None - все товары с раздельным остатком.
+
+    Возвращает
+    ----------
+    int
+        Количество измененных товаров.
+    """
+    products = Product.objects.filter(stock_slots__gt=0).order_by("pk")
+    if product_ids is not None:
+        products = products.filter(pk__in=list(product_ids))
+
+    changed = []
+    for product_id, slots, snapshot in list(products.values_list("pk", "stock_slots", "quantity")):
+        with transaction.atomic():
+            quantities = dict(
+                StockSlot.objects.select_for_update().filter(product_id=product_id).values_list("slot", "quantity")
+            )
+            total = sum(quantities.values())
+            share, rest = divmod(total, slots)
+            balanced = all(quantities.get(slot) == share + (slot < rest) for slot in range(slots))
+            if not balanced:
+                StockSlot.spread(product_id, total, slots)
+            if total != snapshot:
+                Product.objects.filter(pk=product_id, stock_slots=slots).update(
+                    quantity=total, updated_at=timezone.now()
+                )
+        if not balanced or total != snapshot:
+            changed.append(product_id)
+    if changed:
+        products_changed.send(sender=Product, product_ids=changed, barcodes=None)
+    return len(changed)
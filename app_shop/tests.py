@@ -1,7 +1,56 @@
+import asyncio
+import csv
+import io
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing, contextmanager
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib.admin import site as admin_site
+from django.contrib.auth.models import User
+from django.core.asgi import ASGIHandler
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection, connections
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from rest_framework.test import APITestCase
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.serializers import ModelSerializer
+from . import admin
+from .bulk import MAX_REQUEST_ROWS, in_chunks, upsert_catalog
+from .benchmark import DEFAULT_MIX, InProcessTarget, build_plan, compare, parse_mix, run_plan, summarize
+from .cache import BarcodeCache, LRUCache, get_barcode_cache
+from .changes import change_horizon, prune_changes, read_changes
+from .currency import convert, get_rates, set_rates
+from .events import Broadcaster, ChangeLogBackend, LocalBackend
+from .export import iter_catalog
+from .importer import CSV_COLUMNS, CatalogImporter
+from .metrics import REGISTRY, Histogram
 from .models import *
+from .pagination import ProductPagination
+from .replicas import STICKY_COOKIE, refresh_replica
+from .renderers import FastJSONRenderer
+from .reservations import confirm, release, release_expired, reserve
+from .search import search_products
+from .seed import seed_catalog
+from .serializers import CategorySerializer, FastReadMixin, PriceSerializer, ProductSerializer
+from .stats import find_drift, get_category_stats
+from .stock import rebalance, set_stock_slots, stock_quantities
 
 
 class ProductViewSetTests(APITestCase):
@@ -60,7 +109,7 @@ class ProductViewSetTests(APITestCase):
         url = reverse("product-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
     def test_get_product_detail(self):
         """Проверяет успешное получение товара."""
@@ -152,7 +201,7 @@ class PriceViewSetTests(APITestCase):
         url = reverse("price-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
     def test_create_price(self):
         """Проверяет создание новоой цены и увеличение количества цен в базе."""
@@ -215,7 +264,7 @@ class CategoryViewSetTests(APITestCase):
         url = reverse("category-list")
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
     def test_create_category(self):
         """Проверяет создание новой категории и увеличение количества категорий в базе."""
@@ -243,3 +292,2721 @@ class CategoryViewSetTests(APITestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Category.objects.count(), 1)
+
+
+class KeysetPaginationTests(APITestCase):
+    """
+    Тесты постраничной выдачи по ключу.
+
+    Эти тесты проверяют:
+    - размер страницы по умолчанию и заданный клиентом
+    - обход всех страниц без пропусков и повторов при одинаковых updated_at
+    - обратный переход по курсору previous
+    - ошибку при некорректном курсоре
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.category = Category.objects.create(name="Test Category")
+        Product.objects.bulk_create(
+            Product(name=f"Product {i}", quantity=i, barcode=f"bc-{i}", category=self.category)
+            for i in range(25)
+        )
+
+    def collect(self, url):
+        """Проходит по всем страницам списка и возвращает идентификаторы записей."""
+
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_page_size_query_param(self):
+        """Проверяет, что клиент может задать размер страницы."""
+
+        response = self.client.get(reverse("product-list"), {"page_size": 10})
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertIsNotNone(response.data["next"])
+        self.assertIsNone(response.data["previous"])
+
+    def test_walk_all_pages_with_equal_updated_at(self):
+        """Проверяет обход всех товаров, когда у них совпадает дата обновления."""
+
+        Product.objects.update(updated_at=timezone.now())
+        ids = self.collect(reverse("product-list") + "?page_size=7")
+        self.assertEqual(ids, list(Product.objects.order_by("id").values_list("id", flat=True)))
+
+    def test_walk_all_pages_by_id(self):
+        """Проверяет обход всех категорий и цен, упорядоченных по id."""
+
+        Price.objects.bulk_create(
+            Price(currency="USD", amount=1, product=product) for product in Product.objects.all()[:12]
+        )
+        ids = self.collect(reverse("price-list") + "?page_size=5")
+        self.assertEqual(ids, list(Price.objects.order_by("id").values_list("id", flat=True)))
+
+    def test_previous_link(self):
+        """Проверяет возврат на предыдущую страницу по курсору previous."""
+
+        first = self.client.get(reverse("product-list"), {"page_size": 10})
+        second = self.client.get(first.data["next"])
+        back = self.client.get(second.data["previous"])
+        self.assertEqual(
+            [item["id"] for item in back.data["results"]],
+            [item["id"] for item in first.data["results"]],
+        )
+
+    def test_invalid_cursor(self):
+        """Проверяет ответ 404 на некорректный курсор."""
+
+        response = self.client.get(reverse("product-list"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ReduceQuantityConcurrencyTests(TransactionTestCase):
+    """
+    Нагрузочные тесты атомарного списания остатков.
+
+    Эти тесты проверяют, что при параллельных списаниях из потоков и процессов:
+    - количество успешных списаний не превышает остаток
+    - итоговый остаток равен начальному за вычетом успешных списаний
+    """
+
+    stock = 50
+    workers = 8
+    attempts = 20
+
+    def setUp(self):
+        """Настройка тестовой среды: создание товара с ограниченным остатком."""
+
+        self.product = Product.objects.create(name="Hot", quantity=self.stock, barcode="hot-1")
+
+    def test_no_oversell_across_threads(self):
+        """Проверяет отсутствие перепродажи при списании из многих потоков."""
+
+        def worker():
+            sold = 0
+            try:
+                product = Product.objects.get(pk=self.product.pk)
+                for _ in range(self.attempts):
+                    while True:
+                        try:
+                            product.reduce_quantity(1)
+                            sold += 1
+                        except ValueError:
+                            pass
+                        except OperationalError:
+                            # SQLite в режиме общего кэша не ждет блокировку, а сразу
+                            # возвращает ошибку; повторяем попытку.
+                            continue
+                        break
+            finally:
+                connection.close()
+            return sold
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            sold = sum(pool.map(lambda _: worker(), range(self.workers)))
+
+        self.product.refresh_from_db()
+        self.assertEqual(sold, self.stock)
+        self.assertEqual(self.product.quantity, 0)
+
+    def test_no_oversell_across_processes(self):
+        """Проверяет отсутствие перепродажи при списании из нескольких процессов."""
+
+        with tempfile.TemporaryDirectory() as directory, _file_database(os.path.join(directory, "test.sqlite3")):
+            context = multiprocessing.get_context("fork")
+            with context.Pool(self.workers) as pool:
+                sold = sum(pool.map(_reduce_in_process, [(self.product.pk, self.attempts)] * self.workers))
+
+            self.product.refresh_from_db()
+        self.assertEqual(sold, self.stock)
+        self.assertEqual(self.product.quantity, 0)
+
+
+@contextmanager
+def _file_database(path):
+    """
+    Переключает соединение по умолчанию на файловую копию тестовой БД.
+
+    Процессы не разделяют базу SQLite в памяти, поэтому тестовая БД
+    копируется в файл path (backup API SQLite); после выхода соединение
+    возвращается к базе в памяти, которая удерживается ее соединением.
+    """
+    if not connection.is_in_memory_db():
+        connection.close()
+        yield
+        return
+    connection.ensure_connection()
+    with closing(sqlite3.connect(path)) as target:
+        connection.connection.backup(target)
+    memory, connection.connection = connection.connection, None
+    name, connection.settings_dict["NAME"] = connection.settings_dict["NAME"], path
+    try:
+        yield
+    finally:
+        connection.close()
+        connection.settings_dict["NAME"] = name
+        connection.connection = memory
+
+
+def _reduce_in_process(args):
+    """Списывает товар по одной единице в отдельном процессе и возвращает число успешных списаний."""
+
+    pk, attempts = args
+    connection.close()
+    sold = 0
+    product = Product.objects.get(pk=pk)
+    for _ in range(attempts):
+        try:
+            product.reduce_quantity(1)
+            sold += 1
+        except ValueError:
+            pass
+    connection.close()
+    return sold
+
+
+class CheckoutTests(APITestCase):
+    """
+    Тесты списания нескольких позиций корзины.
+
+    Эти тесты проверяют:
+    - списание позиций по id и штрихкоду, в том числе повторяющихся
+    - откат всех позиций при нехватке одного товара, в том числе товара,
+      измененного другим запросом в то же время
+    - сообщение о ненайденных товарах
+    - независимость числа SQL-запросов от количества позиций
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.url = reverse("product-checkout")
+        self.products = Product.objects.bulk_create(
+            Product(name=f"Product {i}", quantity=10, barcode=f"bc-{i}") for i in range(20)
+        )
+
+    def test_checkout_success(self):
+        """Проверяет успешное списание всех позиций корзины."""
+
+        first, second = self.products[:2]
+        data = {"lines": [
+            {"product_id": first.id, "amount": 3},
+            {"barcode": second.barcode, "amount": 4},
+            {"barcode": first.barcode, "amount": 2},
+        ]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {item["id"]: item["quantity"] for item in response.data["results"]},
+            {first.id: 5, second.id: 6},
+        )
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.quantity, second.quantity), (5, 6))
+
+    def test_checkout_is_all_or_nothing(self):
+        """Проверяет, что при нехватке одного товара не списывается ни одна позиция."""
+
+        first, second = self.products[:2]
+        data = {"lines": [
+            {"product_id": first.id, "amount": 3},
+            {"product_id": second.id, "amount": 11},
+        ]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error["line"] for error in response.data["errors"]], [1])
+        first.refresh_from_db()
+        self.assertEqual(first.quantity, 10)
+
+    def test_checkout_race_rolls_back(self):
+        """Проверяет откат, если остаток изменился между проверкой и списанием."""
+
+        first, second = self.products[:2]
+        with self.assertRaises(InsufficientStockError) as context:
+            Product.reduce_quantities({first.id: 3, second.id: 11})
+        self.assertEqual(context.exception.product_ids, [second.id])
+        first.refresh_from_db()
+        self.assertEqual(first.quantity, 10)
+
+    def test_checkout_failed_with_same_timestamp(self):
+        """Проверяет определение несписанных товаров, измененных в то же время другим запросом."""
+
+        first, second, third = self.products[:3]
+        now = timezone.now()
+        Product.objects.filter(pk=second.pk).update(updated_at=now)
+        with mock.patch("django.utils.timezone.now", return_value=now):
+            with self.assertRaises(InsufficientStockError) as context:
+                Product.reduce_quantities({first.id: 3, second.id: 11, third.id: 12})
+        self.assertEqual(context.exception.product_ids, [second.id, third.id])
+        self.assertEqual(
+            list(Product.objects.filter(pk__in=[first.pk, second.pk]).order_by("pk").values_list("quantity", flat=True)),
+            [10, 10],
+        )
+
+    def test_checkout_unknown_product(self):
+        """Проверяет сообщение об отсутствующем товаре."""
+
+        data = {"lines": [{"barcode": "missing", "amount": 1}]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["errors"][0]["line"], 0)
+
+    def test_checkout_invalid_line(self):
+        """Проверяет ошибку валидации позиции без товара или с неположительным количеством."""
+
+        data = {"lines": [{"amount": 1}, {"product_id": self.products[0].id, "amount": 0}]}
+        response = self.client.post(self.url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_checkout_query_count_does_not_depend_on_lines(self):
+        """Проверяет, что число SQL-запросов не растет с количеством позиций."""
+
+        def count_queries(products):
+            data = {"lines": [{"product_id": product.id, "amount": 1} for product in products]}
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(self.url, data, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return len(queries)
+
+        self.assertEqual(count_queries(self.products[:2]), count_queries(self.products))
+
+
+class BulkUpsertTests(APITestCase):
+    """
+    Тесты массовой загрузки товаров и цен по штрихкоду.
+
+    Эти тесты проверяют:
+    - создание новых и обновление существующих товаров и цен
+    - отклонение некорректных строк, строк с неизвестной категорией и
+      повторов штрихкода в пачке
+    - ограничение числа строк запроса
+    - пачки запросов IN в пределах лимита параметров с учетом условий запроса
+    - загрузку из файла командой upsert_catalog
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.url = reverse("product-bulk-upsert")
+        self.category = Category.objects.create(name="Test Category")
+        self.product = Product.objects.create(name="Old", quantity=1, barcode="bc-1")
+        Price.objects.create(currency="USD", amount=1, product=self.product)
+
+    def test_bulk_upsert(self):
+        """Проверяет создание, обновление и отклонение строк за один запрос."""
+
+        data = {"products": [
+            {"barcode": "bc-1", "name": "New", "quantity": 5, "category": self.category.id,
+             "prices": [{"currency": "USD", "amount": "2.50"}, {"currency": "EUR", "amount": "2.00"}]},
+            {"barcode": "bc-2", "name": "Second", "quantity": 3, "category": None, "prices": []},
+            {"barcode": "bc-3", "name": "Bad", "quantity": -1},
+            {"barcode": "bc-4", "name": "Orphan", "quantity": 1, "category": 999999},
+        ]}
+        response = self.client.post(self.url + "?batch_size=2&commit_size=3", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            (response.data["inserted"], response.data["updated"], response.data["rejected"]),
+            (1, 1, 2),
+        )
+        self.assertEqual([error["row"] for error in response.data["errors"]], [3, 4])
+
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.name, self.product.quantity), ("New", 5))
+        self.assertEqual(self.product.category, self.category)
+        self.assertEqual(
+            dict(self.product.price_set.values_list("currency", "amount")),
+            {"USD": Decimal("2.50"), "EUR": Decimal("2.00")},
+        )
+        self.assertTrue(Product.objects.filter(barcode="bc-2").exists())
+
+    def test_bulk_upsert_requires_list(self):
+        """Проверяет ошибку при отсутствии списка товаров и при слишком длинном списке."""
+
+        response = self.client.post(self.url, {"products": "nope"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        rows = [{"barcode": f"many-{i}", "name": "Many", "quantity": 1} for i in range(MAX_REQUEST_ROWS + 1)]
+        response = self.client.post(self.url, {"products": rows}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Product.objects.filter(barcode="many-0").exists())
+
+    def test_duplicate_barcode(self):
+        """Проверяет отклонение повтора штрихкода в пачке."""
+
+        result = upsert_catalog([
+            {"barcode": "dup", "name": "First", "quantity": 1},
+            {"barcode": "dup", "name": "Second", "quantity": 2},
+            {"barcode": "other", "name": "Other", "quantity": 3},
+        ])
+        self.assertEqual((result.inserted, result.updated, result.rejected), (2, 0, 1))
+        self.assertEqual(result.errors, [{"row": 2, "detail": "Штрихкод повторяет строку 1."}])
+        self.assertEqual(Product.objects.get(barcode="dup").name, "First")
+
+    def test_in_chunks_params(self):
+        """Проверяет, что пачка условия IN вместе с параметрами условий не превышает лимит."""
+
+        params = []
+
+        def count_params(execute, sql, query_params, many, context):
+            params.append(len(query_params))
+            return execute(sql, query_params, many, context)
+
+        barcodes = [f"bc-{i}" for i in range(100)]
+        queryset = Product.objects.filter(quantity__gte=0, name__startswith="O").values_list("barcode", flat=True)
+        with mock.patch.object(connection.features, "max_query_params", 30), connection.execute_wrapper(count_params):
+            self.assertEqual(list(in_chunks(queryset, "barcode", barcodes)), ["bc-1"])
+        self.assertGreater(len(params), 1)
+        self.assertLessEqual(max(params), 30)
+
+    def test_upsert_catalog_command(self):
+        """Проверяет загрузку товаров из файла JSON Lines командой upsert_catalog."""
+
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as source:
+            source.write(json.dumps({"barcode": "bc-1", "name": "Cmd", "quantity": 7}) + "\n")
+            source.write("not json\n")
+            source.write(json.dumps({"barcode": "bc-9", "name": "Cmd9", "quantity": 1,
+                                     "prices": [{"currency": "RUB", "amount": 10}]}) + "\n")
+        self.addCleanup(os.remove, source.name)
+
+        out = io.StringIO()
+        call_command("upsert_catalog", source.name, "--batch-size", "1", stdout=out, stderr=io.StringIO())
+        self.assertIn("Создано: 1, обновлено: 1, отклонено: 1", out.getvalue())
+        self.assertEqual(Product.objects.get(barcode="bc-9").price_set.get().amount, Decimal("10"))
+
+
+class CatalogExportTests(APITestCase):
+    """
+    Тесты потоковой выгрузки каталога.
+
+    Эти тесты проверяют:
+    - выгрузку в JSON Lines и CSV
+    - постоянное число SQL-запросов на пачку товаров
+    - выгрузку в файл и в stdout командой export_catalog
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.category = Category.objects.create(name="Test Category")
+        products = Product.objects.bulk_create(
+            Product(name=f"Product {i}", quantity=i, barcode=f"bc-{i}", category=self.category if i % 2 else None)
+            for i in range(10)
+        )
+        Price.objects.bulk_create(
+            Price(currency=currency, amount="1.50", product=product)
+            for product in products for currency in ("EUR", "USD")
+        )
+
+    def test_export_jsonl(self):
+        """Проверяет выгрузку каталога в JSON Lines."""
+
+        response = self.client.get(reverse("product-export"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        records = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(records), 10)
+        self.assertEqual(records[1]["category"], {"id": self.category.id, "name": "Test Category"})
+        self.assertIsNone(records[0]["category"])
+        self.assertEqual(records[0]["prices"], [
+            {"currency": "EUR", "amount": "1.50"},
+            {"currency": "USD", "amount": "1.50"},
+        ])
+
+    def test_export_csv(self):
+        """Проверяет выгрузку каталога в CSV."""
+
+        response = self.client.get(reverse("product-export"), {"output": "csv"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = list(csv.reader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(rows[0][0], "id")
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(rows[1][-1], "EUR:1.50;USD:1.50")
+
+    def test_export_unknown_format(self):
+        """Проверяет ошибку при неизвестном формате выгрузки."""
+
+        response = self.client.get(reverse("product-export"), {"output": "xml"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_query_count_per_chunk(self):
+        """Проверяет, что товары читаются одним курсором, а цены - одним запросом на пачку."""
+
+        # Остатки товаров с раздельным остатком, товары, цены на каждую из 4 пачек.
+        with self.assertNumQueries(1 + 1 + 4):
+            records = list(iter_catalog(chunk_size=3))
+        self.assertEqual(len(records), 10)
+
+    def test_export_catalog_command(self):
+        """Проверяет выгрузку каталога в файл командой export_catalog."""
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "catalog.csv")
+            call_command("export_catalog", "--output", "csv", "--file", path, "--chunk-size", "4")
+            with open(path, encoding="utf-8") as target:
+                self.assertEqual(len(target.read().splitlines()), 11)
+
+        out = io.StringIO()
+        call_command("export_catalog", stdout=out)
+        records = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([record["barcode"] for record in records], [f"bc-{i}" for i in range(10)])
+
+
+class CatalogImportTests(TransactionTestCase):
+    """
+    Тесты потоковой загрузки каталога командой import_catalog.
+
+    Эти тесты проверяют:
+    - загрузку категорий, товаров и цен из JSON Lines и CSV
+    - отклонение некорректных записей
+    - продолжение загрузки с контрольной точки после сбоя
+    - запись категорий в транзакции пачки
+    - отклонение повтора товара в пачке
+    - разбор записей в пуле процессов
+    """
+
+    records = [
+        {"type": "category", "name": "Drinks", "description": "Cold"},
+        {"type": "product", "barcode": "bc-1", "name": "Water", "quantity": 5, "category": "Drinks"},
+        {"type": "product", "barcode": "bc-2", "name": "Juice", "quantity": 3, "category": "Drinks"},
+        {"type": "price", "barcode": "bc-1", "currency": "USD", "amount": "1.00"},
+        {"type": "product", "barcode": "bc-3", "name": "Bread", "quantity": 1, "category": "Missing"},
+        {"type": "price", "barcode": "bc-2", "currency": "USD", "amount": "2.50"},
+        {"type": "product", "barcode": "bc-4", "name": "Bad", "quantity": -5},
+    ]
+
+    def setUp(self):
+        """Настройка тестовой среды: создание временного каталога для файлов."""
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_jsonl(self):
+        path = os.path.join(self.directory, "catalog.jsonl")
+        with open(path, "w", encoding="utf-8") as target:
+            target.writelines(json.dumps(record) + "\n" for record in self.records)
+        return path
+
+    def assertImported(self):
+        self.assertEqual(Category.objects.filter(name="Drinks").count(), 1)
+        self.assertEqual(
+            dict(Product.objects.values_list("barcode", "category__name")),
+            {"bc-1": "Drinks", "bc-2": "Drinks"},
+        )
+        self.assertEqual(
+            dict(Price.objects.values_list("product__barcode", "amount")),
+            {"bc-1": Decimal("1.00"), "bc-2": Decimal("2.50")},
+        )
+
+    def test_import_jsonl(self):
+        """Проверяет загрузку каталога из JSON Lines."""
+
+        out, err = io.StringIO(), io.StringIO()
+        call_command("import_catalog", self.write_jsonl(), "--batch-size", "2", stdout=out, stderr=err)
+        self.assertImported()
+        self.assertIn("отклонено: 2", out.getvalue())
+        self.assertIn("Строка 5: Категория не найдена.", err.getvalue())
+
+    def test_import_csv(self):
+        """Проверяет загрузку каталога из CSV."""
+
+        path = os.path.join(self.directory, "catalog.csv")
+        with open(path, "w", encoding="utf-8", newline="") as target:
+            writer = csv.DictWriter(target, fieldnames=CSV_COLUMNS)
+            writer.writeheader()
+            writer.writerows(self.records)
+        call_command("import_catalog", path, stdout=io.StringIO(), stderr=io.StringIO())
+        self.assertImported()
+
+    def test_resume_from_checkpoint(self):
+        """Проверяет продолжение загрузки с контрольной точки после сбоя записи."""
+
+        path = self.write_jsonl()
+        calls = []
+        original = CatalogImporter.flush_prices
+
+        def failing_flush_prices(importer):
+            calls.append(1)
+            if len(calls) == 2:
+                raise RuntimeError("crash")
+            original(importer)
+
+        with mock.patch.object(CatalogImporter, "flush_prices", failing_flush_prices):
+            with self.assertRaises(RuntimeError):
+                CatalogImporter(path, batch_size=2, checkpoint=path + ".checkpoint").run()
+        with open(path + ".checkpoint", encoding="utf-8") as source:
+            self.assertEqual(json.load(source)["line"], 4)
+
+        result = CatalogImporter(path, batch_size=2, checkpoint=path + ".checkpoint").run()
+        self.assertEqual(result.records, 3)
+        self.assertImported()
+        self.assertFalse(os.path.exists(path + ".checkpoint"))
+
+    def test_categories_in_batch_transaction(self):
+        """Проверяет, что категории записываются в транзакции пачки и откатываются вместе с ней."""
+
+        path = self.write_jsonl()
+        with mock.patch.object(CatalogImporter, "flush_prices", side_effect=RuntimeError("crash")):
+            with self.assertRaises(RuntimeError):
+                CatalogImporter(path, batch_size=4, checkpoint=path + ".checkpoint").run()
+        self.assertFalse(Category.objects.exists())
+        self.assertFalse(Product.objects.exists())
+
+        result = CatalogImporter(path, batch_size=4, checkpoint=path + ".checkpoint").run()
+        self.assertEqual(result.categories, 1)
+        self.assertImported()
+
+    def test_duplicate_barcode(self):
+        """Проверяет отклонение повтора товара в пачке."""
+
+        path = os.path.join(self.directory, "duplicates.jsonl")
+        with open(path, "w", encoding="utf-8") as target:
+            for name in ("Water", "Sparkling"):
+                target.write(json.dumps({"type": "product", "barcode": "bc-1", "name": name, "quantity": 1}) + "\n")
+        result = CatalogImporter(path).run()
+        self.assertEqual((result.inserted, result.rejected), (1, 1))
+        self.assertEqual(result.errors, [{"row": 2, "detail": "Штрихкод повторяет строку 1."}])
+
+    def test_import_with_process_pool(self):
+        """Проверяет разбор записей в пуле процессов с сохранением порядка."""
+
+        result = CatalogImporter(self.write_jsonl(), batch_size=3, workers=2).run()
+        self.assertEqual((result.inserted, result.prices, result.rejected), (2, 2, 2))
+        self.assertImported()
+
+
+class ProductExpandTests(APITestCase):
+    """
+    Тесты встраивания цен и категории в представление товара.
+
+    Эти тесты проверяют:
+    - встраивание по параметру expand в списке и отдельном товаре
+    - постоянное число SQL-запросов на страницу
+    - ошибку при неизвестном поле expand
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.category = Category.objects.create(name="Test Category", description="Desc")
+        self.products = Product.objects.bulk_create(
+            Product(name=f"Product {i}", quantity=i, barcode=f"bc-{i}", category=self.category)
+            for i in range(30)
+        )
+        Price.objects.bulk_create(
+            Price(currency=currency, amount=10, product=product)
+            for product in self.products for currency in ("USD", "EUR")
+        )
+
+    def test_expand_detail(self):
+        """Проверяет встраивание категории и цен в отдельный товар."""
+
+        url = reverse("product-detail", args=[self.products[0].id])
+        response = self.client.get(url, {"expand": "prices,category"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["category"]["name"], "Test Category")
+        self.assertEqual([price["currency"] for price in response.data["prices"]], ["USD", "EUR"])
+
+    def test_without_expand(self):
+        """Проверяет, что без expand представление товара не меняется."""
+
+        url = reverse("product-detail", args=[self.products[0].id])
+        response = self.client.get(url)
+        self.assertEqual(response.data["category"], self.category.id)
+        self.assertNotIn("prices", response.data)
+
+    def test_expand_query_budget(self):
+        """Проверяет, что число запросов не зависит от количества товаров на странице."""
+
+        url = reverse("product-list")
+        for page_size in (5, 30):
+            # Версии коллекций и остатки слотов для ETag, страница товаров с категориями, цены страницы.
+            with self.assertNumQueries(4):
+                response = self.client.get(url, {"expand": "prices,category", "page_size": page_size})
+            self.assertEqual(len(response.data["results"]), page_size)
+            self.assertEqual(len(response.data["results"][0]["prices"]), 2)
+
+    def test_unknown_expand(self):
+        """Проверяет ошибку при запросе неизвестного связанного объекта."""
+
+        response = self.client.get(reverse("product-list"), {"expand": "owner"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConditionalGetTests(APITestCase):
+    """
+    Тесты условных GET-запросов (ETag / Last-Modified).
+
+    Эти тесты проверяют:
+    - ответ 304 на совпадающий ETag без работы сериализатора
+    - смену ETag списка после изменения коллекции, в том числе запросом UPDATE
+    - смену ETag товара после списания и ETag цены и категории
+    - отсутствие устаревшего ответа 304 по If-Modified-Since
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.category = Category.objects.create(name="Test Category")
+        self.product = Product.objects.create(name="Test", quantity=10, barcode="bc-1", category=self.category)
+        self.price = Price.objects.create(currency="USD", amount=1, product=self.product)
+
+    def test_list_not_modified_without_serialization(self):
+        """Проверяет ответ 304 на список без вызова сериализатора."""
+
+        url = reverse("product-list")
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response["ETag"]
+        self.assertIn("Last-Modified", response)
+
+        with mock.patch.object(ProductSerializer, "to_representation") as to_representation:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        to_representation.assert_not_called()
+
+    def test_list_etag_changes_on_write(self):
+        """Проверяет смену ETag списка после изменения в обход ORM-сохранения."""
+
+        url = reverse("product-list")
+        etag = self.client.get(url)["ETag"]
+        Product.objects.filter(pk=self.product.pk).update(name="Renamed")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_list_etag_depends_on_query(self):
+        """Проверяет, что разные страницы и встраивания имеют разные ETag."""
+
+        url = reverse("product-list")
+        self.assertNotEqual(self.client.get(url)["ETag"], self.client.get(url, {"expand": "prices"})["ETag"])
+
+    def test_expanded_list_etag_changes_on_price_write(self):
+        """Проверяет смену ETag списка со встроенными ценами после изменения цены."""
+
+        url = reverse("product-list")
+        etag = self.client.get(url, {"expand": "prices"})["ETag"]
+        self.price.amount = 2
+        self.price.save()
+        response = self.client.get(url, {"expand": "prices"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_detail_etag_changes_after_reduce_quantity(self):
+        """Проверяет смену ETag товара после списания."""
+
+        url = reverse("product-detail", args=[self.product.id])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        self.product.reduce_quantity(1)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_detail_if_modified_since(self):
+        """Проверяет, что If-Modified-Since не дает устаревшего ответа 304 после изменения в ту же секунду."""
+
+        url = reverse("price-detail", args=[self.price.id])
+        response = self.client.get(url)
+        last_modified, etag = response["Last-Modified"], response["ETag"]
+        self.price.amount = 2
+        self.price.save()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["amount"], "2.00")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_missing_detail(self):
+        """Проверяет, что для отсутствующего объекта возвращается 404."""
+
+        response = self.client.get(reverse("product-detail", args=[999999]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BarcodeLookupTests(APITestCase):
+    """
+    Тесты поиска товара по штрихкоду через кэш.
+
+    Эти тесты проверяют:
+    - ответ из кэша без обращения к БД
+    - сброс кэша при изменении товара, цены, списании и удалении
+    - сброс кэша процесса при инвалидации в другом процессе
+    - вытеснение записей LRU-кэша
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных и очистка кэша."""
+
+        get_barcode_cache().clear()
+        caches["default"].clear()
+        self.product = Product.objects.create(name="Scanned", quantity=10, barcode="460-001")
+        self.price = Price.objects.create(currency="RUB", amount=99, product=self.product)
+        self.url = reverse("product-by-barcode", args=[self.product.barcode])
+
+    def test_lookup_hits_cache(self):
+        """Проверяет, что повторный запрос обслуживается из кэша без SQL-запросов."""
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["prices"][0]["amount"], "99.00")
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data["name"], "Scanned")
+        stats = self.client.get(reverse("product-barcode-cache")).data
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    def test_shared_cache_fills_local(self):
+        """Проверяет чтение из общего кэша после очистки кэша процесса."""
+
+        self.client.get(self.url)
+        get_barcode_cache().local.clear()
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+        self.assertEqual(get_barcode_cache().stats()["shared_hits"], 1)
+
+    def test_invalidated_on_writes(self):
+        """Проверяет сброс кэша при изменении товара, цены и после списания."""
+
+        self.client.get(self.url)
+        self.product.reduce_quantity(3)
+        self.assertEqual(self.client.get(self.url).data["quantity"], 7)
+
+        self.price.amount = 50
+        self.price.save()
+        self.assertEqual(self.client.get(self.url).data["prices"][0]["amount"], "50.00")
+
+        Product.reduce_quantities({self.product.pk: 2})
+        self.assertEqual(self.client.get(self.url).data["quantity"], 5)
+
+        self.product.name = "Renamed"
+        self.product.save()
+        self.assertEqual(self.client.get(self.url).data["name"], "Renamed")
+
+    def test_invalidated_on_barcode_change_and_delete(self):
+        """Проверяет сброс старого штрихкода при его смене и при удалении товара."""
+
+        self.client.get(self.url)
+        self.product.barcode = "460-002"
+        self.product.save()
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+
+        url = reverse("product-by-barcode", args=["460-002"])
+        self.client.get(url)
+        self.product.delete()
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalidated_in_other_process(self):
+        """Проверяет, что инвалидация в другом процессе сбрасывает кэш процесса."""
+
+        worker = BarcodeCache(alias="default")
+        other = BarcodeCache(alias="default")
+        loader = mock.Mock(side_effect=lambda barcode: {"id": self.product.pk, "quantity": 10})
+        worker.get(self.product.barcode, loader)
+        worker.get(self.product.barcode, loader)
+        self.assertEqual(loader.call_count, 1)
+
+        other.invalidate(product_ids=[self.product.pk])
+        loader.side_effect = lambda barcode: {"id": self.product.pk, "quantity": 7}
+        self.assertEqual(worker.get(self.product.barcode, loader)["quantity"], 7)
+        self.assertEqual(worker.get(self.product.barcode, loader)["quantity"], 7)
+        self.assertEqual(loader.call_count, 2)
+
+    def test_lru_eviction(self):
+        """Проверяет вытеснение давно не использованных записей."""
+
+        cache = LRUCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b", None))
+        self.assertEqual(len(cache), 2)
+
+
+class QueryPlanTests(APITestCase):
+    """
+    Тесты планов выполнения горячих запросов (EXPLAIN QUERY PLAN).
+
+    Эти тесты проверяют, что запросы используют индексы, а не полный
+    просмотр таблицы или временную сортировку:
+    - цены товара и цена товара в валюте
+    - первая и дальние страницы товаров по (updated_at, id)
+    - товары категории, упорядоченные по названию
+    - поиск товаров и категорий по началу названия без учета регистра
+    - поиск товара по штрихкоду
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.category = Category.objects.create(name="Test Category")
+        self.product = Product.objects.create(name="Test", quantity=1, barcode="bc-1", category=self.category)
+
+    def assertUsesIndex(self, queryset, search=True):
+        """
+        Проверяет план запроса: нет полного просмотра таблиц и временной сортировки.
+        При search=True запрос должен начинаться с поиска по индексу (SEARCH).
+        """
+        plan = queryset.explain()
+        # Строки плана SQLite имеют вид "id parent notused detail".
+        lines = [re.sub(r"^[\d\s|`-]*", "", line) for line in plan.splitlines()]
+        for line in lines:
+            if line.startswith("SCAN") and "USING" not in line:
+                self.fail(f"Полный просмотр таблицы:\n{plan}")
+            if "TEMP B-TREE" in line:
+                self.fail(f"Временная сортировка:\n{plan}")
+        if search:
+            self.assertTrue(any(line.startswith("SEARCH") for line in lines), plan)
+
+    def test_price_queries(self):
+        """Проверяет выборку цен товара и цены товара в валюте."""
+
+        self.assertUsesIndex(Price.objects.filter(product=self.product, currency="USD"))
+        self.assertUsesIndex(Price.objects.filter(product__in=[self.product.pk]).order_by("product", "currency"))
+
+    def test_product_pages(self):
+        """Проверяет первую и дальнюю страницы товаров по (updated_at, id)."""
+
+        paginator = ProductPagination()
+        first_page = Product.objects.order_by("updated_at", "id")[:101]
+        self.assertUsesIndex(first_page, search=False)
+
+        position = [str(self.product.updated_at), str(self.product.pk)]
+        deep_page = Product.objects.order_by("updated_at", "id").filter(paginator._keyset_filter(position, False))[:101]
+        self.assertUsesIndex(deep_page)
+        back_page = Product.objects.order_by("-updated_at", "-id").filter(paginator._keyset_filter(position, True))[:101]
+        self.assertUsesIndex(back_page)
+
+    def test_category_products_by_name(self):
+        """Проверяет выборку товаров категории, упорядоченных по названию."""
+
+        self.assertUsesIndex(Product.objects.filter(category=self.category).order_by("name"))
+
+    def test_case_insensitive_name_search(self):
+        """Проверяет поиск по началу названия и по названию без учета регистра."""
+
+        self.assertUsesIndex(Product.objects.filter(name__istartswith="tes"))
+        self.assertUsesIndex(Product.objects.filter(name__iexact="test"))
+        self.assertUsesIndex(Category.objects.filter(name__istartswith="tes"))
+
+    def test_barcode_lookup(self):
+        """Проверяет поиск товара по штрихкоду."""
+
+        self.assertUsesIndex(Product.objects.filter(barcode="bc-1"))
+
+    def test_list_filters(self):
+        """Проверяет фильтры списков цен и товаров."""
+
+        Price.objects.create(currency="USD", amount=1, product=self.product)
+        response = self.client.get(reverse("price-list"), {"product": self.product.pk, "currency": "USD"})
+        self.assertEqual(len(response.data["results"]), 1)
+        response = self.client.get(reverse("product-list"), {"category": self.category.pk})
+        self.assertEqual(len(response.data["results"]), 1)
+        response = self.client.get(reverse("price-list"), {"product": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductSearchTests(APITestCase):
+    """
+    Тесты полнотекстового поиска товаров (SQLite FTS5).
+
+    Эти тесты проверяют следующие сценарии:
+    - ранжирование: совпадение в названии товара выше совпадения в категории
+    - синхронизация индекса при изменении и удалении товаров и категорий
+    - безопасная обработка операторов и кавычек в строке поиска
+    - постраничная выдача результатов поиска
+    - поиск в панели администрирования по тому же индексу
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.dairy = Category.objects.create(name="Молочные продукты", description="Свежее с фермы")
+        self.cheese = Product.objects.create(name="Сыр", quantity=1, barcode="1", category=self.dairy)
+        self.milk = Product.objects.create(name="Молоко", quantity=1, barcode="2")
+        self.bread = Product.objects.create(name="Хлеб ржаной", quantity=1, barcode="3")
+
+    def search(self, text, **params):
+        response = self.client.get(reverse("product-list"), {"search": text, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def found(self, text):
+        return [product["id"] for product in self.search(text).data["results"]]
+
+    def test_ranked_results(self):
+        """Проверяет, что совпадение в названии товара ранжируется выше."""
+
+        self.assertEqual(self.found("моло"), [self.milk.pk, self.cheese.pk])
+        self.assertEqual(self.found("ФЕРМ"), [self.cheese.pk])
+        self.assertEqual(self.found("хлеб ржан"), [self.bread.pk])
+        self.assertEqual(self.found("хлеб сыр"), [])
+
+    def test_index_follows_changes(self):
+        """Проверяет синхронизацию индекса с товарами и категориями."""
+
+        self.bread.name = "Батон"
+        self.bread.save()
+        self.assertEqual(self.found("хлеб"), [])
+        self.assertEqual(self.found("батон"), [self.bread.pk])
+
+        self.dairy.name = "Сыры"
+        self.dairy.save()
+        self.assertEqual(self.found("моло"), [self.milk.pk])
+        self.assertEqual(self.found("сыры"), [self.cheese.pk])
+
+        Product.objects.filter(pk=self.milk.pk).update(category=self.dairy)
+        self.assertEqual(self.found("сыры"), [self.cheese.pk, self.milk.pk])
+
+        self.dairy.delete()
+        self.assertEqual(self.found("сыры"), [])
+        self.milk.delete()
+        self.assertEqual(self.found("молоко"), [])
+
+    def test_query_syntax_is_escaped(self):
+        """Проверяет, что операторы FTS5 в строке поиска считаются словами."""
+
+        self.assertEqual(self.found('"молоко'), [self.milk.pk])
+        self.assertEqual(self.found("молоко OR хлеб"), [])
+        self.assertEqual(self.found("*)("), [])
+
+    def test_pagination(self):
+        """Проверяет постраничную выдачу результатов поиска."""
+
+        response = self.search("моло", page_size=1)
+        self.assertEqual([product["id"] for product in response.data["results"]], [self.milk.pk])
+        self.assertIsNone(response.data["previous"])
+
+        response = self.client.get(response.data["next"])
+        self.assertEqual([product["id"] for product in response.data["results"]], [self.cheese.pk])
+        self.assertIsNone(response.data["next"])
+        self.assertIsNotNone(response.data["previous"])
+
+    def test_query_plan(self):
+        """Проверяет, что поиск не сортирует найденное во временной таблице."""
+
+        plan = search_products(Product.objects.all(), "моло").explain()
+        self.assertIn("VIRTUAL TABLE", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_admin_search(self):
+        """Проверяет поиск в панели администрирования по полнотекстовому индексу."""
+
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("admin:app_shop_product_changelist"), {"q": "моло"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sorted(product.pk for product in response.context["cl"].result_list),
+            [self.cheese.pk, self.milk.pk],
+        )
+        sql = " ".join(query["sql"] for query in queries)
+        self.assertIn("MATCH", sql)
+        self.assertNotIn("LIKE", sql)
+
+
+class ChangeFeedTests(APITestCase):
+    """
+    Тесты журнала изменений каталога (GET /api/changes/).
+
+    Эти тесты проверяют следующие сценарии:
+    - создание, изменение и удаление объектов в порядке фиксации
+    - одна запись на объект с его текущим состоянием
+    - записи об удалении без данных
+    - изменения в обход ORM (QuerySet.update)
+    - постраничное чтение и число запросов, не зависящее от размера каталога
+    - некорректный номер since
+    - удаление старых записей и статус 410 для удаленной части журнала
+    """
+
+    def changes(self, since, **params):
+        response = self.client.get(reverse("change-list"), {"since": since, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def setUp(self):
+        """Настройка тестовой среды: запоминание текущего номера журнала."""
+
+        self.start = self.changes(0, page_size=1000)["cursor"]
+
+    def test_changes_in_commit_order(self):
+        """Проверяет создание, изменение и удаление объектов."""
+
+        category = Category.objects.create(name="Test Category")
+        product = Product.objects.create(name="Test", quantity=5, barcode="1", category=category)
+        price = Price.objects.create(currency="USD", amount=10, product=product)
+
+        data = self.changes(self.start)
+        self.assertFalse(data["has_more"])
+        self.assertEqual(
+            [(entry["resource"], entry["id"], entry["operation"]) for entry in data["results"]],
+            [("category", category.pk, "created"), ("product", product.pk, "created"), ("price", price.pk, "created")],
+        )
+        self.assertEqual(data["results"][1]["data"]["barcode"], "1")
+        self.assertEqual(data["cursor"], data["results"][-1]["seq"])
+
+        cursor = data["cursor"]
+        product.reduce_quantity(2)
+        price.delete()
+        data = self.changes(cursor)
+        self.assertEqual(
+            [(entry["resource"], entry["operation"]) for entry in data["results"]],
+            [("product", "updated"), ("price", "deleted")],
+        )
+        self.assertEqual(data["results"][0]["data"]["quantity"], 3)
+        self.assertIsNone(data["results"][1]["data"])
+
+        self.assertEqual(self.changes(data["cursor"])["results"], [])
+
+    def test_one_entry_per_object(self):
+        """Проверяет, что повторные изменения объекта дают одну запись."""
+
+        product = Product.objects.create(name="Test", quantity=5, barcode="1")
+        cursor = self.changes(self.start)["cursor"]
+        product.reduce_quantity(1)
+        Product.objects.filter(pk=product.pk).update(name="Renamed")
+
+        results = self.changes(cursor)["results"]
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0]["operation"], "updated")
+        self.assertEqual(results[0]["data"]["name"], "Renamed")
+
+        results = self.changes(self.start)["results"]
+        self.assertEqual([entry["operation"] for entry in results], ["created"])
+
+    def test_deleted_after_page(self):
+        """Проверяет, что объект, удаленный позже выборки, возвращается как удаленный."""
+
+        product = Product.objects.create(name="Test", quantity=5, barcode="1")
+        Product.objects.create(name="Other", quantity=5, barcode="2")
+        product.delete()
+
+        data = self.changes(self.start, page_size=1)
+        self.assertTrue(data["has_more"])
+        self.assertEqual(data["results"][0]["operation"], "deleted")
+        self.assertIsNone(data["results"][0]["data"])
+
+    def test_paging_and_query_count(self):
+        """Проверяет постраничное чтение и число запросов на страницу."""
+
+        products = Product.objects.bulk_create(
+            Product(name=f"Test {i}", quantity=1, barcode=str(i)) for i in range(30)
+        )
+        data = self.changes(self.start, page_size=20)
+        self.assertTrue(data["has_more"])
+        self.assertEqual(len(data["results"]), 20)
+
+        response = self.client.get(data["next"])
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertFalse(response.data["has_more"])
+        self.assertIsNone(response.data["next"])
+
+        with self.assertNumQueries(2):
+            cursor, _, entries = read_changes(self.start, limit=30)
+        self.assertEqual([entry["id"] for entry in entries], [product.pk for product in products])
+
+    def test_invalid_since(self):
+        """Проверяет ответ на некорректный номер since."""
+
+        for since in ("abc", "-1"):
+            response = self.client.get(reverse("change-list"), {"since": since})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prune_and_gone(self):
+        """Проверяет удаление старых записей и ответ 410 для отставшего клиента."""
+
+        products = Product.objects.bulk_create(
+            Product(name=f"Test {i}", quantity=1, barcode=str(i)) for i in range(5)
+        )
+        cursor = self.changes(self.start)["cursor"]
+        Change.objects.update(changed_at=timezone.now() - timedelta(days=40))
+        Product.objects.filter(pk=products[0].pk).update(name="Renamed")
+
+        self.assertEqual(prune_changes(days=30, batch_size=2), cursor)
+        self.assertEqual(change_horizon(), cursor)
+        response = self.client.get(reverse("change-list"), {"since": self.start})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertEqual(response.data["cursor"], cursor + 1)
+        results = self.changes(cursor)["results"]
+        self.assertEqual([entry["data"]["name"] for entry in results], ["Renamed"])
+
+        # Последняя запись сохраняется, даже если она старше срока хранения.
+        Change.objects.update(changed_at=timezone.now() - timedelta(days=40))
+        out = io.StringIO()
+        call_command("prune_changes", "--days", "30", stdout=out)
+        self.assertIn("Удалено записей журнала: 0", out.getvalue())
+        self.assertEqual(self.changes(cursor)["cursor"], cursor + 1)
+        with self.assertRaises(CommandError):
+            call_command("prune_changes", "--batch-size", "0")
+
+
+class CategoryStatsTests(APITestCase):
+    """
+    Тесты сводки остатков и их стоимости по категориям.
+
+    Эти тесты проверяют следующие сценарии:
+    - сводка категории и сводка всех категорий
+    - инкрементальное обновление сводки при списании, изменении цен,
+      переносе товаров, массовой загрузке и удалении
+    - чтение сводки без агрегирования каталога
+    - проверка и пересчет сводки командой category_stats
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.food = Category.objects.create(name="Food")
+        self.drinks = Category.objects.create(name="Drinks")
+        self.bread = Product.objects.create(name="Bread", quantity=10, barcode="1", category=self.food)
+        self.milk = Product.objects.create(name="Milk", quantity=3, barcode="2", category=self.food)
+        self.water = Product.objects.create(name="Water", quantity=7, barcode="3")
+        Price.objects.create(currency="USD", amount=Decimal("1.10"), product=self.bread)
+        Price.objects.create(currency="EUR", amount=Decimal("0.99"), product=self.bread)
+        self.milk_price = Price.objects.create(currency="USD", amount=Decimal("2.05"), product=self.milk)
+
+    def stats(self, category):
+        response = self.client.get(reverse("category-stats", args=[category.pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def assertNoDrift(self):
+        self.assertEqual(find_drift(), [])
+
+    def test_category_stats(self):
+        """Проверяет сводку категории и сводку всех категорий."""
+
+        self.assertEqual(
+            self.stats(self.food),
+            {"category": self.food.pk, "products": 2, "quantity": 13, "value": {"EUR": "9.90", "USD": "17.15"}},
+        )
+        self.assertEqual(self.stats(self.drinks), {"category": self.drinks.pk, "products": 0, "quantity": 0, "value": {}})
+
+        response = self.client.get(reverse("category-stats-summary"))
+        self.assertEqual(
+            response.data["results"],
+            [
+                {"category": None, "products": 1, "quantity": 7, "value": {}},
+                {"category": self.food.pk, "products": 2, "quantity": 13, "value": {"EUR": "9.90", "USD": "17.15"}},
+            ],
+        )
+        self.assertNoDrift()
+
+    def test_incremental_updates(self):
+        """Проверяет обновление сводки при изменениях товаров и цен."""
+
+        self.bread.reduce_quantity(4)
+        Product.reduce_quantities({self.milk.pk: 1})
+        self.assertEqual(self.stats(self.food)["value"], {"EUR": "5.94", "USD": "10.70"})
+
+        self.milk_price.amount = Decimal("3.00")
+        self.milk_price.save()
+        self.assertEqual(self.stats(self.food)["value"]["USD"], "12.60")
+
+        self.milk.refresh_from_db()
+        self.milk.category = self.drinks
+        self.milk.save()
+        self.assertEqual(self.stats(self.drinks), {
+            "category": self.drinks.pk, "products": 1, "quantity": 2, "value": {"USD": "6.00"},
+        })
+        self.assertEqual(self.stats(self.food)["quantity"], 6)
+
+        upsert_catalog([{"barcode": "3", "name": "Water", "quantity": 5, "category": self.drinks.pk,
+                         "prices": [{"currency": "USD", "amount": "0.50"}]}])
+        self.assertEqual(self.stats(self.drinks), {
+            "category": self.drinks.pk, "products": 2, "quantity": 7, "value": {"USD": "8.50"},
+        })
+        self.assertNoDrift()
+
+        self.bread.delete()
+        self.assertEqual(self.stats(self.food), {"category": self.food.pk, "products": 0, "quantity": 0, "value": {}})
+        self.drinks.delete()
+        response = self.client.get(reverse("category-stats-summary"))
+        self.assertEqual(response.data["results"], [
+            {"category": None, "products": 2, "quantity": 7, "value": {"USD": "8.50"}},
+        ])
+        self.assertNoDrift()
+
+    def test_reads_summary_only(self):
+        """Проверяет, что чтение сводки обращается к товарам и ценам только через слоты."""
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("category-stats-summary"))
+        self.assertEqual(len(queries), 3)
+        self.assertFalse(any("app_shop_product" in query["sql"] for query in queries[:2]))
+        self.assertIn("FROM slot", queries[2]["sql"])
+
+    def test_check_and_rebuild_command(self):
+        """Проверяет поиск расхождений и пересчет сводки командой."""
+
+        call_command("category_stats", "--check", stdout=io.StringIO())
+        CategoryStock.objects.filter(category_id=self.food.pk).update(quantity=0)
+        CategoryStockValue.objects.filter(category_id=self.food.pk, currency="USD").delete()
+
+        with self.assertRaises(CommandError):
+            call_command("category_stats", "--check", stdout=io.StringIO(), stderr=io.StringIO())
+        stderr = io.StringIO()
+        call_command("category_stats", stdout=io.StringIO(), stderr=stderr)
+        self.assertEqual(len(stderr.getvalue().splitlines()), 2)
+        self.assertNoDrift()
+        self.assertEqual(self.stats(self.food)["value"], {"EUR": "9.90", "USD": "17.15"})
+
+
+class DatabaseProfileTests(TransactionTestCase):
+    """
+    Тесты профиля БД production и команды benchmark_db.
+
+    Эти тесты проверяют следующие сценарии:
+    - настройки SQLite, выполняемые при открытии соединения
+    - запуск транзакций с блокировкой записи (BEGIN IMMEDIATE)
+    - нагрузку команды benchmark_db на текущую БД
+    """
+
+    def test_connection_pragmas(self):
+        """Проверяет настройки SQLite, заданные при открытии соединения."""
+
+        # Соединение с тестовой БД в профиле production независимо от профиля запуска тестов.
+        default = connections["default"]
+        production = type(default)({**default.settings_dict, **settings.DATABASE_PROFILES["production"]}, default.alias)
+        self.addCleanup(production.close)
+        with production.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA cache_size")
+            self.assertEqual(cursor.fetchone()[0], -65536)
+        self.assertEqual(production.transaction_mode, "IMMEDIATE")
+
+    def test_benchmark_worker(self):
+        """Проверяет нагрузку команды benchmark_db на текущую БД."""
+
+        out = io.StringIO()
+        call_command(
+            "benchmark_db", "--worker", "--threads", "2", "--duration", "0.3", "--products", "10",
+            stdout=out,
+        )
+        result = json.loads(out.getvalue())
+        # Тестовая БД в памяти с общим кэшем блокирует таблицы без ожидания
+        # (busy_timeout не действует), поэтому ошибки блокировки здесь допустимы.
+        self.assertGreater(result["reads"] + result["writes"], 0)
+        self.assertEqual(set(result), {"reads", "writes", "errors", "throughput", "p50", "p99"})
+        self.assertEqual(
+            Product.objects.filter(barcode__startswith="benchmark-").count(), 10
+        )
+
+
+class AsyncCatalogViewTests(APITestCase):
+    """
+    Тесты асинхронного чтения каталога (/api/async/).
+
+    Эти тесты проверяют следующие сценарии:
+    - ответы списков и объектов совпадают с синхронными представлениями
+    - постраничная выдача и фильтры списков
+    - ответы об ошибках (объект не найден, некорректный фильтр и курсор)
+    - обработку запроса асинхронным клиентом (ASGI)
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.category = Category.objects.create(name="Test Category")
+        self.products = [
+            Product.objects.create(name=f"Test {i}", quantity=i, barcode=str(i), category=self.category if i % 2 else None)
+            for i in range(5)
+        ]
+        Price.objects.create(currency="USD", amount=10, product=self.products[0])
+        Price.objects.create(currency="EUR", amount=9, product=self.products[0])
+
+    def assertSameResponse(self, name, *args, params=None):
+        sync = self.client.get(reverse(name, args=args), params)
+        response = self.client.get(reverse(f"async-{name}", args=args), params)
+        self.assertEqual(response.status_code, sync.status_code)
+        self.assertEqual(response.content, sync.content)
+        return response
+
+    def test_same_as_sync(self):
+        """Проверяет совпадение ответов с синхронными представлениями."""
+
+        self.assertSameResponse("product-list")
+        self.assertSameResponse("product-list", params={"category": self.category.pk})
+        self.assertSameResponse("product-detail", self.products[0].pk)
+        self.assertSameResponse("price-list", params={"product": self.products[0].pk, "currency": "EUR"})
+        self.assertSameResponse("price-detail", Price.objects.first().pk)
+        self.assertSameResponse("category-list")
+        self.assertSameResponse("category-detail", self.category.pk)
+
+    def test_pagination(self):
+        """Проверяет переход по страницам асинхронного списка."""
+
+        response = self.client.get(reverse("async-product-list"), {"page_size": 2})
+        ids = [product["id"] for product in response.json()["results"]]
+        while response.json()["next"]:
+            response = self.client.get(response.json()["next"])
+            ids += [product["id"] for product in response.json()["results"]]
+        self.assertEqual(ids, [product.pk for product in self.products])
+
+    def test_errors(self):
+        """Проверяет ответы об ошибках."""
+
+        self.assertEqual(self.assertSameResponse("product-detail", 0).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.assertSameResponse("product-detail", "abc").status_code, status.HTTP_404_NOT_FOUND)
+        response = self.assertSameResponse("price-list", params={"product": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.assertSameResponse("product-list", params={"cursor": "bad"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_client(self):
+        """Проверяет обработку запросов асинхронным клиентом."""
+
+        response = await self.async_client.get(reverse("async-product-detail", args=[self.products[1].pk]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()["barcode"], "1")
+        response = await self.async_client.get(reverse("async-product-list"), {"category": self.category.pk})
+        self.assertEqual(len(response.json()["results"]), 2)
+
+
+class LoadTestCommandTests(TransactionTestCase):
+    """
+    Тест команды loadtest_async (сравнение синхронного и асинхронного чтения).
+
+    Запросы выполняются из нескольких потоков, поэтому данные должны быть
+    зафиксированы, а не находиться в транзакции теста.
+    """
+
+    def test_loadtest_command(self):
+        """Проверяет вывод команды loadtest_async."""
+
+        for i in range(3):
+            Product.objects.create(name=f"Test {i}", quantity=i, barcode=str(i))
+        out = io.StringIO()
+        call_command("loadtest_async", "--requests", "20", "--concurrency", "4", stdout=out)
+        lines = out.getvalue().splitlines()
+        self.assertEqual([line.split()[0] for line in lines[1:]], ["wsgi", "asgi"])
+        self.assertEqual([line.split()[-1] for line in lines[1:]], ["0", "0"])
+
+
+class FastSerializationTests(APITestCase):
+    """
+    Тесты быстрого чтения сериализаторов (FastReadMixin) и FastJSONRenderer.
+
+    Эти тесты проверяют следующие сценарии:
+    - совпадение данных и байтов ответа быстрого и обычного пути
+    - часовые пояса, Decimal, NULL и специальные символы в строках
+    - совпадение FastJSONRenderer с JSONRenderer и переход на JSONRenderer
+    - отсутствие создания объектов модели в списках
+    - команду сравнения скорости benchmark_serializers
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.category = Category.objects.create(name='Кат "1" ', description="line\nbreak\t\x01")
+        products = [
+            Product.objects.create(name="Молоко 😀", quantity=0, barcode="1", category=self.category),
+            Product.objects.create(name="\\/<>&'", quantity=2 ** 31, barcode="2"),
+        ]
+        for product, amount in zip(products, ("0.1", "12345678.99")):
+            Price.objects.create(currency="RUB", amount=Decimal(amount), product=product)
+
+    def assertSamePaths(self, serializer_class, queryset):
+        data = serializer_class(queryset, many=True).data
+        fast = serializer_class.fast_data(serializer_class.fast_values(queryset))
+        self.assertEqual(fast, data)
+        self.assertEqual(FastJSONRenderer().render(fast), JSONRenderer().render(data))
+
+    def test_same_output(self):
+        """Проверяет совпадение быстрого и обычного пути для всех сериализаторов."""
+
+        for serializer_class, model in ((ProductSerializer, Product), (PriceSerializer, Price), (CategorySerializer, Category)):
+            self.assertSamePaths(serializer_class, model.objects.order_by("pk"))
+            with timezone.override("UTC"):
+                self.assertSamePaths(serializer_class, model.objects.order_by("pk"))
+            with timezone.override("America/New_York"):
+                self.assertSamePaths(serializer_class, model.objects.order_by("pk"))
+
+    def test_list_responses(self):
+        """Проверяет, что списки не создают объектов и совпадают с обычным сериализатором."""
+
+        with mock.patch.object(ProductSerializer, "to_representation") as to_representation:
+            response = self.client.get(reverse("product-list"))
+        to_representation.assert_not_called()
+        expected = ProductSerializer(Product.objects.order_by("updated_at", "id"), many=True).data
+        self.assertEqual(response.content, JSONRenderer().render({"next": None, "previous": None, "results": expected}))
+
+        response = self.client.get(reverse("product-list"), {"expand": "category"})
+        self.assertEqual(response.json()["results"][0]["category"]["name"], self.category.name)
+
+    def test_renderer(self):
+        """Проверяет совпадение FastJSONRenderer с JSONRenderer."""
+
+        payloads = [
+            {"a": [1, None, True, "é ", Decimal("1.50")], "b": {"c": timezone.now()}},
+            {"lazy": _lazy("Название"), "date": timezone.now().date()},
+            {1: "нестроковый ключ"},
+            [2 ** 70],
+            None,
+        ]
+        for payload in payloads:
+            self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertEqual(
+            FastJSONRenderer().render({"a": 1}, "application/json; indent=2"),
+            JSONRenderer().render({"a": 1}, "application/json; indent=2"),
+        )
+        with mock.patch("app_shop.renderers.orjson", None):
+            self.assertEqual(FastJSONRenderer().render(payloads[0]), JSONRenderer().render(payloads[0]))
+
+    def test_unsupported_field(self):
+        """Проверяет отказ быстрого чтения для вложенных сериализаторов."""
+
+        class NestedSerializer(FastReadMixin, ModelSerializer):
+            category = CategorySerializer()
+
+            class Meta:
+                model = Product
+                fields = "__all__"
+
+        with self.assertRaises(TypeError):
+            NestedSerializer.get_fast_fields()
+
+    def test_benchmark_command(self):
+        """Проверяет вывод команды benchmark_serializers."""
+
+        out = io.StringIO()
+        call_command("benchmark_serializers", "--repeat", "2", stdout=out)
+        self.assertIn("Ускорение", out.getvalue())
+
+
+class SeedCatalogTests(APITestCase):
+    """
+    Тесты генератора синтетического каталога (seed_catalog).
+
+    Эти тесты проверяют следующие сценарии:
+    - количество созданных категорий, товаров и цен
+    - одинаковый каталог при одинаковом seed и разном размере пачки
+    - корректные контрольные цифры штрихкодов EAN-13
+    - согласованность сводки остатков по категориям
+    - команду seed_catalog и ошибку при некорректных параметрах
+    """
+
+    def snapshot(self):
+        return (
+            list(Category.objects.order_by("pk").values_list("name", "description")),
+            list(Product.objects.order_by("pk").values_list("name", "quantity", "barcode", "category__name")),
+            list(Price.objects.order_by("pk").values_list("product__barcode", "currency", "amount")),
+        )
+
+    def test_counts(self):
+        """Проверяет количество созданных объектов."""
+
+        created = seed_catalog(50, prices_per_product=3, categories=4, batch_size=20)
+        self.assertEqual(created, {"categories": 4, "products": 50, "prices": 150})
+        self.assertEqual(Product.objects.count(), 50)
+        self.assertEqual(Price.objects.count(), 150)
+        self.assertEqual(Price.objects.values("product", "currency").distinct().count(), 150)
+
+    def test_deterministic(self):
+        """Проверяет, что каталог зависит только от seed, а не от размера пачки."""
+
+        seed_catalog(30, categories=3, seed=7, batch_size=30)
+        first = self.snapshot()
+        Product.objects.all().delete()
+        Category.objects.all().delete()
+        seed_catalog(30, categories=3, seed=7, batch_size=4)
+        self.assertEqual(self.snapshot(), first)
+
+        Product.objects.all().delete()
+        Category.objects.all().delete()
+        seed_catalog(30, categories=3, seed=8)
+        self.assertNotEqual(self.snapshot()[1], first[1])
+
+    def test_barcodes(self):
+        """Проверяет контрольные цифры штрихкодов."""
+
+        seed_catalog(100, categories=0)
+        for barcode in Product.objects.values_list("barcode", flat=True):
+            digits = [int(digit) for digit in barcode]
+            self.assertEqual(len(digits), 13)
+            self.assertEqual(sum(digit * (3 if i % 2 else 1) for i, digit in enumerate(digits)) % 10, 0)
+
+    def test_stats_consistent(self):
+        """Проверяет, что сводка остатков совпадает с созданным каталогом."""
+
+        seed_catalog(40, prices_per_product=2, categories=3)
+        self.assertEqual(find_drift(), [])
+
+    def test_command(self):
+        """Проверяет команду seed_catalog и ее параметры."""
+
+        out = io.StringIO()
+        call_command("seed_catalog", "--products", "10", "--categories", "2", stdout=out, stderr=io.StringIO())
+        self.assertIn("товаров: 10", out.getvalue())
+        call_command("seed_catalog", "--products", "5", "--seed", "1", "--clear", stdout=out, stderr=io.StringIO())
+        self.assertEqual(Product.objects.count(), 5)
+        self.assertEqual(Category.objects.count(), 20)
+
+        with self.assertRaises(CommandError):
+            call_command("seed_catalog", "--products", "5", "--prices-per-product", "100", stdout=out)
+
+
+class BenchmarkApiTests(TransactionTestCase):
+    """
+    Тесты нагрузочного теста API (benchmark_api).
+
+    Запросы выполняются из нескольких потоков, поэтому данные должны быть
+    зафиксированы, а не находиться в транзакции теста.
+
+    Эти тесты проверяют следующие сценарии:
+    - разбор состава нагрузки и ошибки в нем
+    - воспроизводимость плана запросов
+    - отчет по операциям с числом SQL-запросов
+    - сохранение базового отчета и сравнение с ним
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        seed_catalog(20, prices_per_product=2, categories=2)
+
+    def test_parse_mix(self):
+        """Проверяет разбор состава нагрузки."""
+
+        self.assertEqual(parse_mix("list=3, write=1"), {"list": 3.0, "write": 1.0})
+        for value in ("list=1,delete=1", "list=x", "list=-1", "list=0"):
+            with self.assertRaises(ValueError):
+                parse_mix(value)
+
+    def test_plan(self):
+        """Проверяет воспроизводимость и состав плана запросов."""
+
+        plan = build_plan(DEFAULT_MIX, 200, seed=3)
+        self.assertEqual(plan, build_plan(DEFAULT_MIX, 200, seed=3))
+        self.assertEqual({name for name, *_ in plan}, set(DEFAULT_MIX))
+        self.assertEqual({name for name, *_ in build_plan({"list": 1, "write": 0}, 10)}, {"list"})
+        self.assertEqual(
+            {(name, method) for name, method, *_ in plan},
+            {("list", "GET"), ("retrieve", "GET"), ("barcode", "GET"), ("reduce", "POST"), ("write", "PATCH")},
+        )
+
+    def test_report(self):
+        """Проверяет отчет нагрузки в процессе."""
+
+        plan = build_plan({"list": 1, "retrieve": 1, "barcode": 1}, 30)
+        with self.settings(ALLOWED_HOSTS=["testserver"]):
+            samples, elapsed = run_plan(InProcessTarget(), plan, threads=1)
+        report = summarize(samples, elapsed)
+        self.assertEqual(report["total"]["requests"], 30)
+        self.assertEqual(report["total"]["errors"], 0)
+        self.assertEqual(report["endpoints"]["retrieve"]["queries"], 2)
+        for stats in report["endpoints"].values():
+            self.assertLessEqual(stats["p50"], stats["p95"])
+            self.assertLessEqual(stats["p95"], stats["p99"])
+
+    def test_command_baseline(self):
+        """Проверяет сохранение базового отчета и сравнение с ним."""
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "baseline.json")
+            out = io.StringIO()
+            call_command("benchmark_api", "--requests", "40", "--threads", "2", "--save", path, stdout=out)
+            with open(path, encoding="utf-8") as source:
+                baseline = json.load(source)
+            self.assertEqual(baseline["requests"], 40)
+            self.assertEqual(sum(stats["requests"] for stats in baseline["endpoints"].values()), 40)
+            # Блокировки БД в памяти при одновременных записях повторяются, а не считаются ошибками.
+            self.assertEqual(sum(stats["errors"] for stats in baseline["endpoints"].values()), 0)
+
+            call_command("benchmark_api", "--requests", "40", "--threads", "2", "--compare", path, stdout=out)
+            self.assertIn("Изменение", out.getvalue())
+
+        rows = compare(baseline, baseline)
+        self.assertTrue(rows)
+        self.assertTrue(all(change in (0, None) for *_, change in rows))
+
+        with self.assertRaises(CommandError):
+            call_command("benchmark_api", "--compare", "/nonexistent/baseline.json", stdout=out)
+        with self.assertRaises(CommandError):
+            call_command("benchmark_api", "--mix", "delete=1", stdout=out)
+
+
+class MetricsTests(APITestCase):
+    """
+    Тесты метрик запросов (MetricsMiddleware) и /metrics.
+
+    Эти тесты проверяют следующие сценарии:
+    - учет ответов, задержек, SQL-запросов и размера ответа по маршруту и действию
+    - действия ModelViewSet и reduce_quantity, асинхронные представления
+    - несопоставленные URL
+    - накопительные корзины гистограммы
+    - журнал медленных запросов с текстами SQL
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        REGISTRY.reset()
+        self.product = Product.objects.create(name="Молоко", quantity=10, barcode="1")
+
+    def metrics(self):
+        response = self.client.get(reverse("metrics"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(reverse("metrics"), "/metrics")
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        values = {}
+        for line in response.content.decode().splitlines():
+            if not line.startswith("#"):
+                name, value = line.rsplit(" ", 1)
+                values[name] = float(value)
+        return values
+
+    def test_actions(self):
+        """Проверяет учет действий представлений."""
+
+        self.client.get(reverse("product-list"))
+        self.client.get(reverse("product-detail", args=[self.product.pk]))
+        self.client.get(reverse("product-detail", args=[self.product.pk]))
+        self.client.post(reverse("product-reduce-quantity", args=[self.product.pk]), {"amount": 100}, format="json")
+        self.client.patch(reverse("product-detail", args=[self.product.pk]), {"quantity": 5}, format="json")
+        self.client.get(reverse("async-product-detail", args=[self.product.pk]))
+        self.client.get("/missing/")
+        values = self.metrics()
+
+        labels = '{view="product-detail",action="retrieve"'
+        self.assertEqual(values[f'shop_http_requests_total{labels},status="200"}}'], 2)
+        self.assertEqual(values[f"shop_http_request_duration_seconds_count{labels}}}"], 2)
+        self.assertEqual(values[f"shop_http_request_db_queries_sum{labels}}}"], 4)
+        self.assertGreater(values[f"shop_http_request_db_duration_seconds_sum{labels}}}"], 0)
+        self.assertGreater(values[f"shop_http_response_size_bytes_sum{labels}}}"], 0)
+        self.assertEqual(
+            values['shop_http_requests_total{view="product-reduce-quantity",action="reduce_quantity",status="400"}'], 1
+        )
+        self.assertEqual(values['shop_http_requests_total{view="product-list",action="list",status="200"}'], 1)
+        self.assertEqual(
+            values['shop_http_requests_total{view="product-detail",action="partial_update",status="200"}'], 1
+        )
+        self.assertEqual(values['shop_http_request_db_queries_sum{view="async-product-detail",action="get"}'], 1)
+        self.assertEqual(values['shop_http_requests_total{view="unmatched",action="get",status="404"}'], 1)
+
+    def test_histogram(self):
+        """Проверяет накопительные корзины и экранирование меток."""
+
+        histogram = Histogram("test_seconds", "Тест.", (0.1, 1), ("view",))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(('a"b',), value)
+        self.assertEqual(
+            histogram.collect(),
+            [
+                'test_seconds_bucket{view="a\\"b",le="0.1"} 2',
+                'test_seconds_bucket{view="a\\"b",le="1"} 3',
+                'test_seconds_bucket{view="a\\"b",le="+Inf"} 4',
+                'test_seconds_sum{view="a\\"b"} 2.65',
+                'test_seconds_count{view="a\\"b"} 4',
+            ],
+        )
+
+    def test_slow_request_log(self):
+        """Проверяет журнал медленных запросов."""
+
+        with self.settings(SHOP_METRICS={"SLOW_REQUEST_MS": 0, "SLOW_REQUEST_QUERIES": 1}):
+            client = self.client_class()
+            with self.assertLogs("app_shop.slow_requests", "WARNING") as logs:
+                client.get(reverse("product-detail", args=[self.product.pk]))
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("product-detail", logs.output[0])
+        self.assertIn("SQL-запросов 2", logs.output[0])
+        # В журнал попадает текст только первого SQL-запроса (SLOW_REQUEST_QUERIES).
+        self.assertEqual(logs.output[0].count(" мс: SELECT"), 1)
+
+        with self.assertNoLogs("app_shop.slow_requests"):
+            self.client.get(reverse("product-detail", args=[self.product.pk]))
+
+
+class CurrencyPriceTests(APITestCase):
+    """
+    Тесты курсов валют и цены товара в валюте (параметр currency).
+
+    Эти тесты проверяют следующие сценарии:
+    - перевод сумм с банковским округлением (ROUND_HALF_EVEN)
+    - выбор цены: своя цена в валюте, иначе наименьшая после перевода
+    - постоянное количество запросов на страницу списка
+    - свои цены товаров в валюте без курса и ошибку для некорректного кода
+    - сброс кэша курсов и ETag при изменении курсов
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        set_rates({"RUB": Decimal("1"), "USD": Decimal("90"), "EUR": Decimal("100")})
+        self.products = [
+            Product.objects.create(name=f"Товар {i}", quantity=1, barcode=str(i)) for i in range(4)
+        ]
+        Price.objects.create(product=self.products[0], currency="EUR", amount=Decimal("5.00"))
+        Price.objects.create(product=self.products[0], currency="RUB", amount=Decimal("100.00"))
+        Price.objects.create(product=self.products[1], currency="RUB", amount=Decimal("1000.00"))
+        Price.objects.create(product=self.products[1], currency="USD", amount=Decimal("10.00"))
+        Price.objects.create(product=self.products[2], currency="GBP", amount=Decimal("1.00"))
+
+    def prices(self, **params):
+        response = self.client.get(reverse("product-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {item["id"]: item["price"] for item in response.data["results"]}
+
+    def test_convert(self):
+        """Проверяет перевод сумм и банковское округление."""
+
+        rates = {"RUB": Decimal("1"), "USD": Decimal("2")}
+        self.assertEqual(convert(Decimal("0.05"), "RUB", "USD", rates), Decimal("0.02"))
+        self.assertEqual(convert(Decimal("0.15"), "RUB", "USD", rates), Decimal("0.08"))
+        self.assertEqual(convert(Decimal("12.34"), "USD", "RUB", rates), Decimal("24.68"))
+        self.assertEqual(convert(Decimal("1.00"), "GBP", "GBP", rates), Decimal("1.00"))
+        self.assertIsNone(convert(Decimal("1.00"), "GBP", "RUB", rates))
+
+    def test_best_price(self):
+        """Проверяет выбор цены товара в валюте."""
+
+        prices = self.prices(currency="EUR")
+        first, second, third, fourth = (product.pk for product in self.products)
+        self.assertEqual(prices[first], {"currency": "EUR", "amount": "5.00", "source_currency": "EUR"})
+        self.assertEqual(prices[second], {"currency": "EUR", "amount": "9.00", "source_currency": "USD"})
+        self.assertIsNone(prices[third])
+        self.assertIsNone(prices[fourth])
+
+        response = self.client.get(reverse("product-detail", args=[second]), {"currency": "RUB", "expand": "prices"})
+        self.assertEqual(response.data["price"], {"currency": "RUB", "amount": "1000.00", "source_currency": "RUB"})
+        self.assertEqual(len(response.data["prices"]), 2)
+        self.assertNotIn("price", self.client.get(reverse("product-detail", args=[second])).data)
+
+    def test_queries(self):
+        """Проверяет, что цены страницы подбираются одним запросом."""
+
+        get_rates()
+        with CaptureQueriesContext(connection) as small:
+            self.prices(currency="EUR", page_size=2)
+        with CaptureQueriesContext(connection) as large:
+            self.prices(currency="EUR")
+        self.assertEqual(len(small), len(large))
+        self.assertEqual(sum("app_shop_price" in query["sql"] for query in large), 1)
+
+    def test_currency_without_rate(self):
+        """Проверяет свои цены товаров в валюте без курса."""
+
+        prices = self.prices(currency="GBP")
+        self.assertEqual(
+            prices[self.products[2].pk], {"currency": "GBP", "amount": "1.00", "source_currency": "GBP"}
+        )
+        self.assertEqual({pk for pk, price in prices.items() if price is None}, {
+            self.products[0].pk, self.products[1].pk, self.products[3].pk
+        })
+
+        # Без курсов товары с ценой в рублях получают ее, остальные - null.
+        ExchangeRate.objects.all().delete()
+        prices = self.prices(currency="RUB")
+        self.assertEqual(prices[self.products[1].pk]["amount"], "1000.00")
+        self.assertIsNone(prices[self.products[2].pk])
+
+        response = self.client.get(reverse("product-list"), {"currency": "X" * 11})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("currency", response.data)
+
+    def test_rates_cache(self):
+        """Проверяет кэш курсов и его сброс при изменении курсов."""
+
+        get_rates()
+        with self.assertNumQueries(1):
+            self.assertEqual(get_rates()["EUR"], Decimal("100"))
+
+        response = self.client.get(reverse("product-list"), {"currency": "EUR"})
+        etag = response["ETag"]
+        response = self.client.patch(
+            reverse("exchangerate-detail", args=["USD"]), {"rate": "80.5"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(get_rates()["USD"], Decimal("80.5"))
+        response = self.client.get(reverse("product-list"), {"currency": "EUR"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {item["id"]: item["price"] for item in response.data["results"]}[self.products[1].pk]["amount"], "8.05"
+        )
+
+        ExchangeRate.objects.filter(currency="EUR").update(rate=Decimal("50"))
+        self.assertEqual(get_rates()["EUR"], Decimal("50"))
+
+
+class ReservationTests(APITestCase):
+    """
+    Тесты резервов товаров.
+
+    Эти тесты проверяют следующие сценарии:
+    - резерв уменьшает доступное количество для списаний и других резервов
+    - подтверждение списывает товар, отмена возвращает количество в продажу
+    - повторное подтверждение или отмена и подтверждение истекшего резерва
+    - освобождение истекших резервов пачками и команду release_reservations
+    - резерв, отмененный во время освобождения истекших резервов
+    - освобождение истекших резервов товара при нехватке количества
+    - запрет уменьшить количество товара ниже зарезервированного, в том
+      числе массовой загрузкой
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.product = Product.objects.create(name="Молоко", quantity=10, barcode="1")
+
+    def reserve(self, amount, **data):
+        url = reverse("product-reserve", args=[self.product.pk])
+        return self.client.post(url, {"amount": amount, **data}, format="json")
+
+    def close(self, reservation_id, name):
+        return self.client.post(reverse(f"product-{name}-reservation", args=[self.product.pk, reservation_id]))
+
+    def expire(self):
+        Reservation.objects.update(expires_at=timezone.now() - timezone.timedelta(seconds=1))
+
+    def test_reserve(self):
+        """Проверяет удержание количества резервом."""
+
+        response = self.reserve(7, ttl=60)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["status"], Reservation.ACTIVE)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.quantity, self.product.reserved), (10, 7))
+
+        self.assertEqual(self.reserve(4).status_code, status.HTTP_400_BAD_REQUEST)
+        url = reverse("product-reduce-quantity", args=[self.product.pk])
+        self.assertEqual(self.client.post(url, {"amount": 4}, format="json").status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.post(url, {"amount": 3}, format="json").status_code, status.HTTP_200_OK)
+        with self.assertRaises(ValueError):
+            Product.reduce_quantities({self.product.pk: 1})
+
+        self.assertEqual(self.reserve(0).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.reserve(1, ttl=10 ** 9).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_confirm_release(self):
+        """Проверяет подтверждение и отмену резервов."""
+
+        first = self.reserve(3).data["id"]
+        second = self.reserve(2).data["id"]
+
+        response = self.close(first, "confirm")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["status"], Reservation.CONFIRMED)
+        self.assertEqual(self.close(first, "confirm").status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(self.close(first, "release").status_code, status.HTTP_409_CONFLICT)
+
+        self.assertEqual(self.close(second, "release").data["status"], Reservation.RELEASED)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.quantity, self.product.reserved), (7, 0))
+
+        other = Product.objects.create(name="Кефир", quantity=1, barcode="2")
+        response = self.client.post(reverse("product-confirm-reservation", args=[other.pk, second]))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_expired(self):
+        """Проверяет истекшие резервы: подтверждение и повторный резерв."""
+
+        reservation_id = self.reserve(10).data["id"]
+        self.expire()
+        self.assertEqual(self.close(reservation_id, "confirm").status_code, status.HTTP_409_CONFLICT)
+
+        response = self.reserve(6)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Reservation.objects.get(pk=reservation_id).status, Reservation.EXPIRED)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 6)
+
+    def test_release_expired(self):
+        """Проверяет освобождение истекших резервов пачками."""
+
+        other = Product.objects.create(name="Кефир", quantity=10, barcode="2")
+        for product in (self.product, other, self.product, other, self.product):
+            reserve(product, 2)
+        self.expire()
+        reserve(other, 1)
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(release_expired(batch_size=2), 5)
+        # Три пачки по три запроса (без точек сохранения транзакции теста).
+        self.assertEqual(sum("SAVEPOINT" not in query["sql"] for query in queries), 9)
+        self.assertEqual(Reservation.objects.filter(status=Reservation.EXPIRED).count(), 5)
+        self.assertEqual(dict(Product.objects.values_list("barcode", "reserved")), {"1": 0, "2": 1})
+
+        self.expire()
+        out = io.StringIO()
+        call_command("release_reservations", stdout=out)
+        self.assertIn("Освобождено резервов: 1", out.getvalue())
+
+    def test_release_expired_race(self):
+        """Проверяет резерв, отмененный между выбором истекших резервов и их переводом."""
+
+        first = reserve(self.product, 2)
+        second = reserve(self.product, 3)
+        self.expire()
+        selected = []
+
+        def release_selected(execute, sql, params, many, context):
+            # Отмена после выбора истекших резервов, перед их переводом.
+            if not selected and sql.startswith("SELECT") and "app_shop_reservation" in sql:
+                selected.append(sql)
+            elif len(selected) == 1 and not sql.startswith("SELECT"):
+                selected.append(sql)
+                release(second)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(release_selected):
+            self.assertEqual(release_expired(), 1)
+        self.assertEqual(Reservation.objects.get(pk=first.pk).status, Reservation.EXPIRED)
+        self.assertEqual(Reservation.objects.get(pk=second.pk).status, Reservation.RELEASED)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.reserved, 0)
+
+    def test_quantity_below_reserved(self):
+        """Проверяет запрет уменьшить количество ниже зарезервированного."""
+
+        reservation_id = self.reserve(5).data["id"]
+        url = reverse("product-detail", args=[self.product.pk])
+        response = self.client.patch(url, {"quantity": 4, "reserved": 0}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(url, {"quantity": 5, "reserved": 0}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["reserved"], 5)
+
+        # Массовая загрузка отклоняет такие строки, а не нарушает ограничение БД при подтверждении.
+        result = upsert_catalog([
+            {"barcode": "1", "name": "Молоко", "quantity": 4},
+            {"barcode": "2", "name": "Кефир", "quantity": 4},
+        ])
+        self.assertEqual((result.inserted, result.updated, result.rejected), (1, 0, 1))
+        self.assertEqual(result.errors, [{"row": 1, "detail": "Количество меньше зарезервированного (5)."}])
+        self.assertEqual(self.close(reservation_id, "confirm").status_code, status.HTTP_200_OK)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.quantity, self.product.reserved), (0, 0))
+
+
+class ReservationConcurrencyTests(TransactionTestCase):
+    """
+    Нагрузочный тест резервов: одновременные резервы и подтверждения из
+    многих потоков не превышают остаток.
+    """
+
+    stock = 30
+    workers = 8
+
+    def test_no_overbooking(self):
+        """Проверяет, что резервов создается не больше остатка и все подтверждаются."""
+
+        product = Product.objects.create(name="Hot", quantity=self.stock, barcode="hot-1")
+
+        def retry(call, *args):
+            while True:
+                try:
+                    return call(*args)
+                except OperationalError:
+                    # Общий кэш SQLite в памяти не ждет блокировку; повторяем попытку.
+                    continue
+
+        def worker(_):
+            confirmed = 0
+            try:
+                while True:
+                    try:
+                        reservation = retry(reserve, product, 1)
+                    except ValueError:
+                        return confirmed
+                    retry(confirm, reservation)
+                    confirmed += 1
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            confirmed = sum(pool.map(worker, range(self.workers)))
+
+        product.refresh_from_db()
+        self.assertEqual(confirmed, self.stock)
+        self.assertEqual((product.quantity, product.reserved), (0, 0))
+
+
+
+class StockSlotTests(APITestCase):
+    """
+    Тесты раздельного остатка товаров.
+
+    Эти тесты проверяют следующие сценарии:
+    - распределение остатка между слотами и возврат остатка в товар
+    - списание из одного слота и из нескольких слотов, нехватку товара
+    - списание корзины с обычными товарами и товарами с раздельным остатком
+    - остаток (сумму слотов) в представлениях товара, списка и асинхронного списка
+    - изменение количества товара (PATCH, загрузка каталога) и перебалансировку слотов
+    - ETag после списания из слотов, журнал изменений после перебалансировки
+    - отсутствие записи в общие строки версий и сводки при списании из слотов
+    - запрет резерва и команды shard_stock и rebalance_stock
+    - сводку по категориям, выгрузку и панель администрирования после списания из слотов
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.product = Product.objects.create(name="Хит", quantity=10, barcode="hot")
+        self.plain = Product.objects.create(name="Молоко", quantity=5, barcode="milk")
+        set_stock_slots(self.product, 4)
+
+    def slots(self):
+        return list(StockSlot.objects.filter(product=self.product).order_by("slot").values_list("quantity", flat=True))
+
+    def reduce(self, amount):
+        url = reverse("product-reduce-quantity", args=[self.product.pk])
+        return self.client.post(url, {"amount": amount}, format="json")
+
+    def test_set_stock_slots(self):
+        """Проверяет распределение остатка между слотами и его возврат в товар."""
+
+        self.assertEqual(self.slots(), [3, 3, 2, 2])
+        self.assertEqual((self.product.quantity, self.product.stock_slots), (10, 4))
+
+        set_stock_slots(self.product, 3)
+        self.assertEqual(self.slots(), [4, 3, 3])
+
+        self.reduce(4)
+        set_stock_slots(self.product, 0)
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.quantity, self.product.stock_slots), (6, 0))
+        self.assertEqual(self.slots(), [])
+
+        with self.assertRaises(ValueError):
+            set_stock_slots(self.product, -1)
+        reserve(self.plain, 1)
+        with self.assertRaises(ValueError):
+            set_stock_slots(self.plain, 2)
+
+    def test_reduce_quantity(self):
+        """Проверяет списание из слотов без изменения строки товара."""
+
+        updated_at = Product.objects.get(pk=self.product.pk).updated_at
+        response = self.reduce(2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["quantity"], 8)
+        self.assertIn(sorted(self.slots()), ([1, 2, 2, 3], [0, 2, 3, 3]))
+        self.assertEqual(Product.objects.get(pk=self.product.pk).updated_at, updated_at)
+
+        # Ни в одном слоте нет 4, товар списывается из нескольких слотов.
+        self.assertEqual(self.reduce(4).status_code, status.HTTP_200_OK)
+        self.assertEqual(sum(self.slots()), 4)
+        self.assertEqual(self.reduce(5).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(sum(self.slots()), 4)
+        self.assertEqual(self.reduce(4).status_code, status.HTTP_200_OK)
+        self.assertEqual(self.slots(), [0, 0, 0, 0])
+
+    def test_checkout(self):
+        """Проверяет списание корзины с раздельным остатком по принципу «все или ничего»."""
+
+        url = reverse("product-checkout")
+        lines = [{"product_id": self.plain.pk, "amount": 2}, {"barcode": "hot", "amount": 7}]
+        response = self.client.post(url, {"lines": lines}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item["quantity"] for item in response.data["results"]], [3, 3])
+
+        lines = [{"product_id": self.plain.pk, "amount": 1}, {"barcode": "hot", "amount": 4}]
+        response = self.client.post(url, {"lines": lines}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error["line"] for error in response.data["errors"]], [1])
+        self.plain.refresh_from_db()
+        self.assertEqual((self.plain.quantity, sum(self.slots())), (3, 3))
+
+    def test_representation(self):
+        """Проверяет остаток в представлениях товара и списков одним запросом на страницу."""
+
+        self.reduce(3)
+        detail = self.client.get(reverse("product-detail", args=[self.product.pk]))
+        self.assertEqual((detail.data["quantity"], detail.data["stock_slots"]), (7, 4))
+        self.assertNotIn("Last-Modified", detail)
+
+        # Версии коллекций, остатки слотов для ETag, страница товаров, остатки слотов страницы.
+        for params in ({}, {"expand": "category"}):
+            with self.assertNumQueries(4):
+                response = self.client.get(reverse("product-list"), params)
+            quantities = {item["barcode"]: item["quantity"] for item in response.data["results"]}
+            self.assertEqual(quantities, {"hot": 7, "milk": 5})
+
+        response = self.client.get(reverse("async-product-list"))
+        self.assertEqual({item["barcode"]: item["quantity"] for item in response.json()["results"]}["hot"], 7)
+        response = self.client.get(reverse("async-product-detail", args=[self.product.pk]))
+        self.assertEqual(response.json()["quantity"], 7)
+
+    def test_update_quantity(self):
+        """Проверяет распределение нового количества между слотами."""
+
+        url = reverse("product-detail", args=[self.product.pk])
+        response = self.client.patch(url, {"quantity": 21, "stock_slots": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["quantity"], response.data["stock_slots"]), (21, 4))
+        self.assertEqual(self.slots(), [6, 5, 5, 5])
+
+        self.reduce(1)
+        response = self.client.patch(url, {"name": "Хит продаж"}, format="json")
+        self.assertEqual(response.data["quantity"], 20)
+        self.assertEqual(sum(self.slots()), 20)
+
+        upsert_catalog([{"barcode": "hot", "name": "Хит", "quantity": 8}])
+        self.assertEqual(self.slots(), [2, 2, 2, 2])
+
+    def test_stats_export_admin(self):
+        """Проверяет остаток по слотам в сводке по категориям, выгрузке и панели администрирования."""
+
+        category = Category.objects.create(name="Хиты")
+        product = Product.objects.create(name="Хит 2", quantity=50, barcode="hot-2", category=category)
+        Price.objects.create(product=product, currency="USD", amount=Decimal("2.00"))
+        set_stock_slots(product, 4)
+        product.reduce_quantity(3)
+        # Списание из нескольких слотов.
+        product.reduce_quantity(20)
+
+        def assertStock(quantity):
+            stats = get_category_stats([category.pk])[category.pk]
+            self.assertEqual(stats["quantity"], quantity)
+            self.assertEqual(stats["value"], {"USD": Decimal(quantity * 2)} if quantity else {})
+            self.assertEqual(find_drift(), [])
+            record = next(record for record in iter_catalog() if record["id"] == product.pk)
+            self.assertEqual(record["quantity"], quantity)
+            product_admin = admin_site.get_model_admin(Product)
+            self.assertEqual(product_admin.stock(product_admin.get_queryset(None).get(pk=product.pk)), quantity)
+
+        assertStock(27)
+        # Перенос в другую категорию, перебалансировка и возврат остатка в товар.
+        Product.objects.filter(pk=product.pk).update(category=None)
+        self.assertEqual(get_category_stats([category.pk])[category.pk]["quantity"], 0)
+        self.assertEqual(find_drift(), [])
+        Product.objects.filter(pk=product.pk).update(category=category)
+        self.assertEqual(rebalance([product.pk]), 1)
+        assertStock(27)
+        set_stock_slots(product, 0)
+        product.reduce_quantity(2)
+        assertStock(25)
+        product.delete()
+        self.assertEqual(get_category_stats([category.pk])[category.pk]["quantity"], 0)
+        self.assertEqual(find_drift(), [])
+
+    def test_rebalance(self):
+        """Проверяет выравнивание слотов и снимок остатка в товаре."""
+
+        StockSlot.objects.filter(product=self.product, slot=0).update(quantity=0)
+        self.assertEqual(rebalance(), 1)
+        self.assertEqual(self.slots(), [2, 2, 2, 1])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.quantity, 7)
+        self.assertEqual(CategoryStock.objects.get(category_id=0).quantity, 12)
+        self.assertEqual(rebalance(), 0)
+        self.assertEqual(stock_quantities([self.product.pk, self.plain.pk]), {self.product.pk: 7})
+
+    def test_conditional_get(self):
+        """Проверяет смену ETag после списания из слотов."""
+
+        for url in (reverse("product-list"), reverse("product-detail", args=[self.product.pk])):
+            etag = self.client.get(url)["ETag"]
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+            self.reduce(1)
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+    def test_change_feed(self):
+        """Проверяет запись списаний из слотов в журнал изменений при перебалансировке."""
+
+        cursor = read_changes()[0]
+        self.reduce(2)
+        self.assertEqual(read_changes(cursor)[2], [])
+        rebalance()
+        _, _, entries = read_changes(cursor)
+        self.assertEqual([(entry["id"], entry["data"]["quantity"]) for entry in entries], [(self.product.pk, 8)])
+
+    def test_no_shared_writes(self):
+        """Проверяет, что списание из слотов не изменяет версии коллекций, сводку и журнал изменений."""
+
+        def shared():
+            return (
+                list(ResourceVersion.objects.order_by("name").values_list("name", "version", "updated_at")),
+                list(CategoryStock.objects.order_by("category_id").values_list("category_id", "quantity")),
+                list(CategoryStockValue.objects.order_by("pk").values_list("pk", "value")),
+                Change.objects.count(),
+            )
+
+        before = shared()
+        self.product.reduce_quantity(1)
+        # Списание из нескольких слотов.
+        self.product.reduce_quantity(5)
+        self.assertEqual(sum(self.slots()), 4)
+        self.assertEqual(shared(), before)
+
+    def test_reserve(self):
+        """Проверяет запрет резерва товара с раздельным остатком."""
+
+        response = self.client.post(reverse("product-reserve", args=[self.product.pk]), {"amount": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Product.objects.get(pk=self.product.pk).reserved, 0)
+
+    def test_commands(self):
+        """Проверяет команды shard_stock и rebalance_stock."""
+
+        out = io.StringIO()
+        call_command("shard_stock", "milk", str(self.product.pk), "--slots", "2", stdout=out)
+        self.assertEqual(StockSlot.objects.filter(product=self.plain).count(), 2)
+        self.assertEqual(self.slots(), [5, 5])
+        with self.assertRaises(CommandError):
+            call_command("shard_stock", "unknown", "--slots", "2", stdout=out)
+
+        StockSlot.objects.filter(product=self.product, slot=0).update(quantity=1)
+        call_command("rebalance_stock", stdout=out)
+        self.assertIn("Перебалансировано товаров: 1", out.getvalue())
+        self.assertEqual(self.slots(), [3, 3])
+
+
+class StockSlotConcurrencyTests(TransactionTestCase):
+    """
+    Нагрузочный тест раздельного остатка: одновременные списания из многих
+    потоков не превышают остаток и списывают его полностью.
+    """
+
+    stock = 40
+    workers = 8
+
+    def test_no_overselling(self):
+        """Проверяет, что успешных списаний ровно столько, сколько товара в слотах."""
+
+        product = Product.objects.create(name="Hot", quantity=self.stock, barcode="hot-1")
+        set_stock_slots(product, 4)
+
+        def worker(_):
+            sold = 0
+            try:
+                # Списания по 3 опустошают слоты неравномерно и собираются из
+                # нескольких слотов; остаток списывается по 1.
+                for amount in (3, 1):
+                    while True:
+                        try:
+                            product.reduce_quantity(amount)
+                            sold += amount
+                        except OperationalError:
+                            # Общий кэш SQLite в памяти не ждет блокировку; повторяем попытку.
+                            continue
+                        except ValueError:
+                            break
+                return sold
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            sold = sum(pool.map(worker, range(self.workers)))
+
+        self.assertEqual(sold, self.stock)
+        self.assertEqual(stock_quantities([product.pk]), {product.pk: 0})
+
+
+class LargeTableAdminTests(APITestCase):
+    """
+    Тесты режима больших таблиц панели администрирования.
+
+    Эти тесты проверяют следующие сценарии:
+    - постраничный список по ключу: переход по курсору без OFFSET
+    - постоянное число запросов на страницу списка товаров и цен
+    - оценку количества без фильтров и ограниченный подсчет с поиском
+    - полнотекстовый поиск товаров и цен товаров
+    - автодополнение товара вместо списка выбора всех товаров
+    """
+
+    def setUp(self):
+        """Настройка тестовой среды: создание начальных данных для тестов."""
+
+        self.client.force_login(User.objects.create_superuser("admin", "admin@example.com", "password"))
+        self.category = Category.objects.create(name="Молочные")
+        self.products = Product.objects.bulk_create(
+            Product(name=f"Молоко {i}" if i % 2 else f"Кефир {i}", quantity=1, barcode=str(i), category=self.category)
+            for i in range(25)
+        )
+        Price.objects.bulk_create(Price(product=product, currency="RUB", amount=10) for product in self.products)
+        self.url = reverse("admin:app_shop_product_changelist")
+
+    def get(self, url, params=None, queries=4):
+        # Сессия, пользователь, страница и оценка количества.
+        with mock.patch.object(admin.ProductAdmin, "list_per_page", 10), self.assertNumQueries(queries):
+            response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_keyset_pages(self):
+        """Проверяет переход по страницам по ключу и постоянное число запросов."""
+
+        ids = []
+        response = self.get(self.url)
+        self.assertEqual(response.context["cl"].result_count, self.products[-1].pk)
+        while True:
+            cl = response.context["cl"]
+            ids += [product.pk for product in cl.result_list]
+            if cl.next_cursor is None:
+                break
+            response = self.get(self.url, {"cursor": cl.next_cursor})
+        self.assertEqual(ids, sorted((product.pk for product in self.products), reverse=True))
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(self.url, {"cursor": ids[10]})
+        self.assertFalse(any("OFFSET" in query["sql"] for query in context.captured_queries))
+
+        response = self.client.get(self.url, {"cursor": "x"})
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+
+    def test_search(self):
+        """Проверяет полнотекстовый поиск с ограниченным подсчетом."""
+
+        response = self.get(self.url, {"q": "молок"})
+        cl = response.context["cl"]
+        self.assertEqual((cl.result_count, cl.result_count_exact), (12, True))
+        self.assertTrue(all(product.name.startswith("Молоко") for product in cl.result_list))
+
+        with mock.patch("app_shop.changelist.COUNT_LIMIT", 5):
+            cl = self.get(self.url, {"q": "молок"}).context["cl"]
+        self.assertEqual((cl.result_count, cl.result_count_exact), (5, False))
+
+        response = self.client.get(reverse("admin:app_shop_price_changelist"), {"q": "кефир"})
+        self.assertEqual(len(response.context["cl"].result_list), 13)
+
+    def test_price_changelist(self):
+        """Проверяет, что товары цен загружаются запросом страницы."""
+
+        url = reverse("admin:app_shop_price_changelist")
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(len(response.context["cl"].result_list), 25)
+
+    def test_autocomplete(self):
+        """Проверяет выбор товара цены автодополнением по полнотекстовому индексу."""
+
+        response = self.client.get(reverse("admin:app_shop_price_add"))
+        self.assertNotContains(response, "Молоко 1")
+        response = self.client.get(
+            reverse("admin:autocomplete"),
+            {"app_label": "app_shop", "model_name": "price", "field_name": "product", "term": "кефир 4"},
+        )
+        self.assertEqual([item["text"] for item in response.json()["results"]], ["Кефир 4"])
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    Тесты чтения с реплик.
+
+    Сценарии:
+    - list и retrieve товаров, цен и категорий читают с реплики;
+    - изменяющие запросы и reduce_quantity выполняются на основной БД;
+    - после изменения клиент читает с основной БД в течение STICKY_SECONDS;
+    - refresh_replica копирует основную БД SQLite в файл реплики;
+    - под ASGI промежуточный слой работает асинхронно, без адаптации.
+
+    Реплика в тестах - второе соединение с той же тестовой БД.
+    """
+
+    def setUp(self):
+        connections["replica"] = connections.create_connection("default")
+        self.addCleanup(delattr, connections._connections, "replica")
+        self.addCleanup(connections["replica"].close)
+        replication = self.settings(SHOP_REPLICATION={"REPLICAS": ["replica"], "STICKY_SECONDS": 5})
+        replication.enable()
+        self.addCleanup(replication.disable)
+        category = Category.objects.create(name="Books")
+        self.product = Product.objects.create(name="Book", quantity=10, barcode="book-1", category=category)
+        self.price = Price.objects.create(currency="USD", amount=10, product=self.product)
+
+    def assertRouted(self, method, url, alias, **kwargs):
+        other = "default" if alias == "replica" else "replica"
+        with CaptureQueriesContext(connections[alias]) as used, CaptureQueriesContext(connections[other]) as unused:
+            response = getattr(self.client, method)(url, format="json", **kwargs)
+        self.assertLess(response.status_code, 400)
+        self.assertTrue(used.captured_queries)
+        self.assertEqual(unused.captured_queries, [])
+        return response
+
+    def test_reads_use_replica(self):
+        """Проверяет, что list и retrieve каталога читают с реплики."""
+
+        for url in (
+            reverse("product-list"),
+            reverse("product-detail", args=[self.product.pk]),
+            reverse("price-list"),
+            reverse("price-detail", args=[self.price.pk]),
+            reverse("category-list"),
+            reverse("category-detail", args=[self.product.category_id]),
+        ):
+            with self.subTest(url=url):
+                self.assertRouted("get", url, "replica")
+
+    def test_writes_use_primary(self):
+        """Проверяет, что reduce_quantity и прочие действия выполняются на основной БД."""
+
+        url = reverse("product-reduce-quantity", args=[self.product.pk])
+        response = self.assertRouted("post", url, "default", data={"amount": 3})
+        self.assertEqual(response.data["quantity"], 7)
+        self.assertRouted("get", reverse("category-stats", args=[self.product.category_id]), "default")
+
+    def test_client_reads_own_writes(self):
+        """Проверяет, что после изменения клиент читает с основной БД, пока не истек срок."""
+
+        url = reverse("product-detail", args=[self.product.pk])
+        self.client.post(reverse("product-reduce-quantity", args=[self.product.pk]), {"amount": 3}, format="json")
+        self.assertIn(STICKY_COOKIE, self.client.cookies)
+        self.assertEqual(self.client.cookies[STICKY_COOKIE]["max-age"], 5)
+        response = self.assertRouted("get", url, "default")
+        self.assertEqual(response.data["quantity"], 7)
+
+        # Неуспешное изменение не закрепляет клиента за основной БД.
+        self.client.cookies.clear()
+        self.client.post(reverse("product-reduce-quantity", args=[self.product.pk]), {"amount": 100}, format="json")
+        self.assertNotIn(STICKY_COOKIE, self.client.cookies)
+
+        self.client.cookies[STICKY_COOKIE] = f"{time.time() - 1:.3f}"
+        self.assertRouted("get", url, "replica")
+
+    def test_asgi_without_adaptation(self):
+        """Проверяет, что под ASGI промежуточные слои и process_view не адаптируются к потокам."""
+
+        with self.assertNoLogs("django.request", "DEBUG"):
+            handler = ASGIHandler()
+        middleware = handler._view_middleware
+        self.assertTrue(all(iscoroutinefunction(method) for method in middleware))
+
+    async def test_async_sticky(self):
+        """Проверяет закрепление клиента за основной БД в асинхронном режиме."""
+
+        url = reverse("product-reduce-quantity", args=[self.product.pk])
+        response = await self.async_client.post(url, {"amount": 1}, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        response = await self.async_client.get(reverse("async-product-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn(STICKY_COOKIE, response.cookies)
+
+    def test_refresh_replica(self):
+        """Проверяет, что refresh_replica копирует данные основной БД в реплику."""
+
+        with tempfile.TemporaryDirectory() as directory:
+            primary, replica = os.path.join(directory, "primary.sqlite3"), os.path.join(directory, "replica.sqlite3")
+            with closing(sqlite3.connect(primary)) as db:
+                db.execute("CREATE TABLE item (name TEXT)")
+                db.execute("INSERT INTO item VALUES ('first')")
+                db.commit()
+            databases = {"primary": {"NAME": primary}, "copy": {"NAME": replica}}
+            with mock.patch.dict(settings.DATABASES, databases):
+                refresh_replica("copy", source="primary")
+                with closing(sqlite3.connect(primary)) as db:
+                    db.execute("INSERT INTO item VALUES ('second')")
+                    db.commit()
+                with closing(sqlite3.connect(replica)) as db:
+                    self.assertEqual(db.execute("SELECT COUNT(*) FROM item").fetchone(), (1,))
+                refresh_replica("copy", source="primary")
+            with closing(sqlite3.connect(replica)) as db:
+                self.assertEqual(db.execute("SELECT COUNT(*) FROM item").fetchone(), (2,))
+
+
+class ProductBatchTests(APITestCase):
+    """
+    Тесты получения нескольких товаров (batch).
+
+    Сценарии:
+    - товары по идентификаторам возвращаются в порядке запроса, ненайденные
+      отмечаются null и перечисляются в missing;
+    - GET и POST с идентификаторами и штрихкодами дают одинаковый ответ;
+    - товары и цены (expand=prices) выбираются двумя запросами;
+    - остаток товаров с раздельным остатком - сумма слотов;
+    - неверный запрос отклоняется с 400.
+    """
+
+    def setUp(self):
+        self.url = reverse("product-batch")
+        self.products = [
+            Product.objects.create(name=f"Item {number}", quantity=number, barcode=f"item-{number}")
+            for number in range(5)
+        ]
+        for product in self.products:
+            Price.objects.create(currency="USD", amount=product.quantity + 1, product=product)
+
+    def test_request_order_and_misses(self):
+        """Проверяет порядок ответа и явные промахи."""
+
+        ids = [self.products[3].pk, 999999, self.products[0].pk, self.products[3].pk]
+        with self.assertNumQueries(1):
+            response = self.client.post(self.url, {"ids": ids}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data["results"]
+        self.assertEqual([item and item["id"] for item in results], [ids[0], None, ids[2], ids[3]])
+        self.assertEqual(response.data["missing"], [999999])
+        self.assertEqual(results[0], ProductSerializer(self.products[3]).data)
+
+    def test_get_and_barcodes(self):
+        """Проверяет, что GET и POST, идентификаторы и штрихкоды дают одинаковые товары."""
+
+        products = [self.products[2], self.products[1]]
+        by_ids = self.client.get(self.url, {"ids": ",".join(str(product.pk) for product in products)})
+        by_barcodes = self.client.post(
+            self.url, {"barcodes": [product.barcode for product in products] + ["unknown"]}, format="json"
+        )
+        self.assertEqual(by_ids.data["results"], by_barcodes.data["results"][:2])
+        self.assertEqual(by_ids.data["missing"], [])
+        self.assertEqual(by_barcodes.data["missing"], ["unknown"])
+
+    def test_expand_prices(self):
+        """Проверяет, что цены загружаются одним запросом."""
+
+        ids = [product.pk for product in self.products]
+        with self.assertNumQueries(2):
+            response = self.client.post(f"{self.url}?expand=prices", {"ids": ids}, format="json")
+        for product, item in zip(self.products, response.data["results"]):
+            self.assertEqual([price["amount"] for price in item["prices"]], [f"{product.quantity + 1}.00"])
+
+    def test_sharded_stock(self):
+        """Проверяет остаток товара с раздельным остатком."""
+
+        set_stock_slots(self.products[4], 2)
+        self.products[4].reduce_quantity(1)
+        response = self.client.get(self.url, {"ids": str(self.products[4].pk)})
+        self.assertEqual(response.data["results"][0]["quantity"], 3)
+
+    def test_invalid_requests(self):
+        """Проверяет отклонение пустых, смешанных, слишком длинных и нечисловых списков."""
+
+        for data in (
+            {},
+            {"ids": []},
+            {"ids": [1], "barcodes": ["a"]},
+            {"ids": list(range(501))},
+        ):
+            with self.subTest(data=data):
+                response = self.client.post(self.url, data, format="json")
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {"ids": "1,x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProductStreamTests(APITestCase):
+    """
+    Тесты потока изменений товаров (/api/async/stream/).
+
+    Сценарии:
+    - подписчик товара получает его состояние после списания, несколько
+      изменений в пределах окна объединяются в одно событие;
+    - подписчик категории получает изменения цен товаров категории с ценами,
+      изменения других товаров не получает;
+    - пакетная загрузка (upsert_catalog) передает изменения цен вместе с ценами;
+    - без изменений поток отправляет служебные комментарии;
+    - закрытие потока снимает подписку;
+    - неверная подписка отклоняется с 400;
+    - ChangeLogBackend находит измененные товары по журналу изменений.
+    """
+
+    def setUp(self):
+        self.category = Category.objects.create(name="Live")
+        self.product = Product.objects.create(name="Live 1", quantity=10, barcode="live-1", category=self.category)
+        self.other = Product.objects.create(name="Other", quantity=10, barcode="other-1")
+        self.broadcaster = Broadcaster(backend=LocalBackend, coalesce_ms=20)
+        patcher = mock.patch("app_shop.events._broadcaster", self.broadcaster)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def open_stream(self, **params):
+        response = await self.async_client.get(reverse("async-stream"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 3000\n\n")
+        return stream
+
+    async def read_events(self, stream):
+        chunk = await asyncio.wait_for(anext(stream), 5)
+        return [
+            json.loads(line[len("data: "):])
+            for line in chunk.decode().splitlines()
+            if line.startswith("data: ")
+        ]
+
+    async def change(self, function, *args):
+        # Изменение и его callbacks on_commit - в потоке соединения теста.
+        def run():
+            with self.captureOnCommitCallbacks(execute=True):
+                function(*args)
+
+        await sync_to_async(run)()
+
+    async def close_stream(self, stream):
+        # Отключение клиента: ASGI-обработчик отменяет чтение потока.
+        task = asyncio.ensure_future(anext(stream))
+        await asyncio.sleep(0)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+    async def test_product_subscription(self):
+        """Проверяет событие списания и объединение изменений."""
+
+        stream = await self.open_stream(products=str(self.product.pk))
+        await self.change(self.product.reduce_quantity, 2)
+        await self.change(self.product.reduce_quantity, 3)
+        await self.change(self.other.reduce_quantity, 1)
+        events = await self.read_events(stream)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["id"], self.product.pk)
+        self.assertEqual(events[0]["changes"], ["product"])
+        self.assertEqual(events[0]["product"]["quantity"], 5)
+        self.assertFalse(events[0]["deleted"])
+        await self.close_stream(stream)
+
+    async def test_category_subscription(self):
+        """Проверяет доставку изменений цен подписчику категории."""
+
+        stream = await self.open_stream(categories=str(self.category.pk))
+        await self.change(lambda: Price.objects.create(currency="USD", amount=10, product=self.other))
+        await self.change(lambda: Price.objects.create(currency="USD", amount=12, product=self.product))
+        events = await self.read_events(stream)
+        self.assertEqual([event["id"] for event in events], [self.product.pk])
+        self.assertEqual(events[0]["changes"], ["price"])
+        self.assertEqual(events[0]["prices"], [{"id": mock.ANY, "currency": "USD", "amount": "12.00"}])
+        await self.close_stream(stream)
+
+    async def test_bulk_upsert_prices(self):
+        """Проверяет событие пакетной загрузки, изменившей цены товара."""
+
+        stream = await self.open_stream(products=str(self.product.pk))
+        row = {"barcode": "live-1", "name": "Live 1", "quantity": 7, "category": self.category.pk,
+               "prices": [{"currency": "USD", "amount": "15.00"}]}
+        await self.change(upsert_catalog, [row])
+        events = await self.read_events(stream)
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0]["changes"], ["price", "product"])
+        self.assertEqual(events[0]["product"]["quantity"], 7)
+        self.assertEqual(events[0]["prices"], [{"id": mock.ANY, "currency": "USD", "amount": "15.00"}])
+        await self.close_stream(stream)
+
+    async def test_heartbeat_and_close(self):
+        """Проверяет служебные комментарии и снятие подписки при закрытии потока."""
+
+        with self.settings(SHOP_EVENTS={"HEARTBEAT": 0.01}):
+            stream = await self.open_stream(products=f"{self.product.pk},{self.other.pk}")
+        self.assertEqual(await asyncio.wait_for(anext(stream), 5), b": ping\n\n")
+        self.assertEqual(self.broadcaster.subscriptions, 1)
+        await self.close_stream(stream)
+        self.assertEqual(self.broadcaster.subscriptions, 0)
+        self.assertFalse(self.broadcaster.by_product)
+
+    def test_invalid_subscription(self):
+        """Проверяет отклонение пустой, нечисловой и слишком большой подписки."""
+
+        for params in ({}, {"products": "1,x"}, {"categories": ",".join(map(str, range(501)))}):
+            with self.subTest(params=params):
+                response = self.client.get(reverse("async-stream"), params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_change_log_backend(self):
+        """Проверяет чтение измененных товаров из журнала изменений."""
+
+        backend = ChangeLogBackend(self.broadcaster)
+        cursor = backend.last_seq()
+        self.product.reduce_quantity(1)
+        Price.objects.create(currency="EUR", amount=5, product=self.other)
+        cursor, changes = backend.read(cursor)
+        self.assertEqual(changes, {"product": {self.product.pk}, "price": {self.other.pk}})
+        self.assertEqual(backend.read(cursor), (cursor, {}))
@@ -2,13 +2,30 @@ from rest_framework.routers import DefaultRouter
 from django.urls import include, path
 
 from .viewsets import *
+from .async_views import *
+from .metrics import metrics_view
 
 router = DefaultRouter()
 router.register(r'prices', PriceViewSet)
 router.register(r'products', ProductViewSet)
 router.register(r'categories', CategoryViewSet)
+router.register(r'changes', ChangeViewSet, basename='change')
+router.register(r'exchange-rates', ExchangeRateViewSet)
 
 
+# Асинхронное чтение каталога (для ASGI) рядом с синхронными маршрутами.
+async_urlpatterns = [
+    path("products/", AsyncProductView.as_view(), name="async-product-list"),
+    path("products/<str:pk>/", AsyncProductView.as_view(), name="async-product-detail"),
+    path("prices/", AsyncPriceView.as_view(), name="async-price-list"),
+    path("prices/<str:pk>/", AsyncPriceView.as_view(), name="async-price-detail"),
+    path("categories/", AsyncCategoryView.as_view(), name="async-category-list"),
+    path("categories/<str:pk>/", AsyncCategoryView.as_view(), name="async-category-detail"),
+    path("stream/", ProductStreamView.as_view(), name="async-stream"),
+]
+
 urlpatterns = [
+    path("metrics", metrics_view, name="metrics"),
+    path("api/async/", include(async_urlpatterns)),
     path("api/", include(router.urls)),
 ]
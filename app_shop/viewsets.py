@@ -1,19 +1,109 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import OuterRef, Prefetch, Subquery, Sum
+from django.http import StreamingHttpResponse
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 
 from rest_framework.viewsets import ModelViewSet, GenericViewSet
 from rest_framework.mixins import CreateModelMixin, ListModelMixin
-from rest_framework.exceptions import NotFound
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.utils.urls import replace_query_param
 
 from .serializers import *
 from .models import *
+from .pagination import *
+from .bulk import MAX_REQUEST_ROWS, in_chunks, upsert_catalog
+from .export import EXPORT_FORMATS, render_catalog
+from .conditional import ConditionalGetMixin
+from .cache import get_barcode_cache
+from .search import search_products
+from .changes import change_horizon, last_change, read_changes
+from .stats import NO_CATEGORY, get_category_stats
+from .currency import RATES_RESOURCE, get_rates, resolve_prices
+from .reservations import confirm, release, reserve
+from .stock import STOCK_RESOURCE, stock_quantities
 
-__all__ = ["ProductViewSet", "PriceViewSet", "CategoryViewSet"]
+__all__ = ["ProductViewSet", "PriceViewSet", "CategoryViewSet", "ChangeViewSet", "ExchangeRateViewSet"]
 
 
-class ProductViewSet(ModelViewSet):
+class FastListMixin:
+    """
+    Примесь к ModelViewSet: список строится быстрым чтением сериализатора
+    (FastReadMixin) из строк ``values()`` без создания объектов модели.
+    Ответ совпадает с ответом ListModelMixin.list.
+    """
+
+    def use_fast_list(self):
+        """
+        Возвращает True, если текущий запрос списка можно обслужить быстрым чтением.
+        """
+        return issubclass(self.get_serializer_class(), FastReadMixin)
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_fast_list():
+            return super().list(request, *args, **kwargs)
+        serializer_class = self.get_serializer_class()
+        rows = serializer_class.fast_values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer_class.fast_data(page))
+        return Response(serializer_class.fast_data(rows))
+
+
+class CurrencyPriceMixin:
+    """
+    Примесь к ProductViewSet: цена товара в валюте, заданной параметром currency.
+
+    Для списка и отдельного товара в представление добавляется поле
+    ``price`` (см. resolve_prices) - цены страницы подбираются одним
+    запросом после выборки страницы.
+    """
+
+    def get_currency(self):
+        """
+        Возвращает пару (валюта, курсы) из параметра currency или None.
+
+        Валюта без курса допустима: товары получают свои цены в этой
+        валюте, а цена товаров, которым нужен перевод, равна null.
+
+        Исключения
+        ----------
+        ValidationError
+            Вызывается, если код валюты длиннее поля Price.currency.
+        """
+        if self.action not in ("list", "retrieve", "batch"):
+            return None
+        if not hasattr(self, "_currency"):
+            currency = self.request.query_params.get("currency") or None
+            if currency is not None:
+                if len(currency) > Price._meta.get_field("currency").max_length:
+                    raise ValidationError({"currency": "Некорректный код валюты."})
+                currency = (currency, get_rates())
+            self._currency = currency
+        return self._currency
+
+    def add_prices(self, items):
+        currency = self.get_currency()
+        if currency is not None:
+            prices = resolve_prices([item["id"] for item in items], *currency)
+            for item in items:
+                price = prices[item["id"]]
+                item["price"] = price and {**price, "amount": "{:f}".format(price["amount"])}
+        return items
+
+    def get_paginated_response(self, data):
+        return super().get_paginated_response(self.add_prices(data))
+
+    def retrieve(self, request, *args, **kwargs):
+        response = super().retrieve(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.add_prices([response.data])
+        return response
+
+
+class ProductViewSet(ConditionalGetMixin, CurrencyPriceMixin, FastListMixin, ModelViewSet):
     """
     Представление для обработки CREATE, PUT, PATCH, GET (ALL), DELETE операций управления продуктами.
 
@@ -23,14 +113,112 @@ class ProductViewSet(ModelViewSet):
         Стандартный набор объектов Product.
     serializer_class:
         Стандартный используемый сериализатор.
+    pagination_class:
+        Постраничная выдача по ключу ``(updated_at, id)``; результаты
+        поиска выдаются по смещению (SearchPagination).
+    version_resource:
+        Коллекция для условных GET-запросов.
+    read_replica_actions:
+        Действия, которые читают с реплики (ReplicaRoutingMiddleware).
     """
 
     queryset = Product.objects
     serializer_class = ProductSerializer
+    pagination_class = ProductPagination
+    version_resource = "product"
+    read_replica_actions = ("list", "retrieve", "batch")
+
+    def get_expand(self):
+        """
+        Возвращает набор связанных объектов, запрошенных параметром expand.
+
+        Встраивание доступно только для чтения списка, отдельного товара и
+        нескольких товаров (batch).
+
+        Исключения
+        ----------
+        ValidationError
+            Вызывается, если запрошен неизвестный связанный объект.
+        """
+        if self.action not in ("list", "retrieve", "batch"):
+            return set()
+        expand = {name for name in self.request.query_params.get("expand", "").split(",") if name}
+        unknown = expand - set(ProductSerializer.EXPANDABLE)
+        if unknown:
+            raise ValidationError({"expand": f"Неизвестные поля: {', '.join(sorted(unknown))}."})
+        return expand
+
+    def use_fast_list(self):
+        # Встроенные связанные объекты требуют вложенных сериализаторов.
+        return not self.get_expand() and super().use_fast_list()
+
+    def get_search(self):
+        """
+        Возвращает строку полнотекстового поиска (параметр search) или None.
+
+        Поиск доступен только для списка товаров.
+        """
+        if self.action != "list":
+            return None
+        return self.request.query_params.get("search") or None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator") and self.get_search() is not None:
+            self._paginator = SearchPagination()
+        return super().paginator
+
+    def get_related_resources(self):
+        expand = self.get_expand()
+        if self.get_search() is not None:
+            # Поиск учитывает название и описание категории.
+            expand = expand | {"category"}
+        resources = [resource for name, resource in (("category", "category"), ("prices", "price")) if name in expand]
+        if self.action == "list":
+            # Включение и выключение раздельного остатка.
+            resources.append(STOCK_RESOURCE)
+        if self.get_currency() is not None:
+            resources += [resource for resource in ("price", RATES_RESOURCE) if resource not in resources]
+        return resources
+
+    def get_list_state(self):
+        # Списания товаров с раздельным остатком изменяют слоты, а не строку
+        # товара и версии коллекций: в ETag входят суммы слотов.
+        return sorted(stock_quantities().items())
+
+    def get_state_annotations(self):
+        # Остаток товара с раздельным остатком - сумма слотов (None для обычного товара).
+        stock = StockSlot.objects.filter(product_id=OuterRef("pk")).order_by().values("product_id")
+        return {"stock": Subquery(stock.annotate(total=Sum("quantity")).values("total"))}
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            queryset = _filter_by_params(queryset, self.request.query_params, ("category",))
+        search = self.get_search()
+        if search is not None:
+            queryset = search_products(queryset, search)
+        expand = self.get_expand()
+        if "category" in expand:
+            queryset = queryset.select_related("category")
+        if "prices" in expand:
+            queryset = queryset.prefetch_related(Prefetch("price_set", queryset=Price.objects.order_by("id")))
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["expand"] = self.get_expand()
+        return context
 
     def get_serializer_class(self):
         if self.action == "reduce_quantity":
             return ReduceQuantitySerializer
+        if self.action == "checkout":
+            return CheckoutSerializer
+        if self.action == "reserve":
+            return ReserveSerializer
+        if self.action in ("confirm_reservation", "release_reservation"):
+            return ReservationSerializer
         return super().get_serializer_class()
 
     @action(detail=True, methods=["post"], url_name='reduce-quantity')
@@ -62,8 +250,377 @@ class ProductViewSet(ModelViewSet):
         except ValueError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=True, methods=["post"], url_name="reserve")
+    def reserve(self, request, pk=None):
+        """
+        Обрабатывает запрос на резерв товара до оплаты.
+
+        Параметры
+        ----------
+        request :
+            Объект запроса с полями amount и необязательным ttl (срок резерва в секундах).
+        pk :
+            Первичный ключ продукта.
+
+        Возвращает
+        ----------
+        Response
+            - При успешном выполнении: данные резерва и статус 201 Created.
+            - При нехватке товара: сообщение об ошибке и статус 400 Bad Request.
+        """
+        product = self.get_object()
+        serializer = ReserveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            reservation = reserve(product, serializer.validated_data["amount"], serializer.validated_data.get("ttl"))
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ReservationSerializer(reservation).data, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path=r"reservations/(?P<reservation_id>[0-9]+)/confirm",
+        url_name="confirm-reservation",
+    )
+    def confirm_reservation(self, request, pk=None, reservation_id=None):
+        """
+        Обрабатывает запрос на подтверждение резерва: товар списывается со склада.
+
+        Возвращает
+        ----------
+        Response
+            - При успешном выполнении: данные резерва и статус 200 OK.
+            - Если резерв не активен или истек: сообщение об ошибке и статус 409 Conflict.
+        """
+        return self.close_reservation(pk, reservation_id, confirm)
+
+    @action(
+        detail=True,
+        methods=["post"],
+        url_path=r"reservations/(?P<reservation_id>[0-9]+)/release",
+        url_name="release-reservation",
+    )
+    def release_reservation(self, request, pk=None, reservation_id=None):
+        """
+        Обрабатывает запрос на отмену резерва: количество возвращается в продажу.
+
+        Возвращает
+        ----------
+        Response
+            - При успешном выполнении: данные резерва и статус 200 OK.
+            - Если резерв не активен: сообщение об ошибке и статус 409 Conflict.
+        """
+        return self.close_reservation(pk, reservation_id, release)
+
+    def close_reservation(self, pk, reservation_id, handler):
+        product = self.get_object()
+        try:
+            reservation = Reservation.objects.get(pk=reservation_id, product=product)
+        except Reservation.DoesNotExist:
+            raise NotFound("Резерв не найден.")
+        try:
+            handler(reservation)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_409_CONFLICT)
+        return Response(ReservationSerializer(reservation).data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["post"], url_name="checkout")
+    def checkout(self, request):
+        """
+        Обрабатывает запрос на списание нескольких позиций корзины за один запрос.
+
+        Все позиции списываются в одной транзакции: либо все, либо ни одна.
+        Число SQL-запросов не зависит от количества позиций (с точностью до
+        разбиения на пачки по лимиту параметров SQLite).
+
+        Параметры
+        ----------
+        request : 
+            Объект запроса с полем lines - списком позиций
+            ``{"product_id": int, "amount": int}`` или ``{"barcode": str, "amount": int}``.
+
+        Возвращает
+        ----------
+        Response
+            - При успешном выполнении: данные обновленных товаров и статус 200 OK.
+            - При ошибке: сообщение об ошибке, список ошибочных позиций
+              (номер позиции и причина) и статус 400 Bad Request.
+        """
+        serializer = CheckoutSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lines = serializer.validated_data["lines"]
+
+        products = _fetch_products(
+            [line["product_id"] for line in lines if "product_id" in line],
+            [line["barcode"] for line in lines if "barcode" in line],
+        )
+        by_id = {product.pk: product for product in products}
+        by_barcode = {product.barcode: product for product in products}
+
+        amounts = {}
+        line_products = []
+        for line in lines:
+            if "product_id" in line:
+                product = by_id.get(line["product_id"])
+            else:
+                product = by_barcode.get(line["barcode"])
+            line_products.append(product)
+            if product is not None:
+                amounts[product.pk] = amounts.get(product.pk, 0) + line["amount"]
+
+        errors = []
+        for index, product in enumerate(line_products):
+            if product is None:
+                errors.append({"line": index, "detail": "Товар не найден."})
+            elif amounts[product.pk] > product.quantity:
+                errors.append({"line": index, "detail": "Недостаточно товара на складе."})
+        if not errors:
+            try:
+                Product.reduce_quantities(amounts)
+            except InsufficientStockError as e:
+                failed = set(e.product_ids)
+                errors = [
+                    {"line": index, "detail": str(e)}
+                    for index, product in enumerate(line_products)
+                    if product.pk in failed
+                ]
+        if errors:
+            return Response(
+                {"detail": "Списание не выполнено.", "errors": errors},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        updated = Product.objects.filter(pk__in=amounts).order_by("pk")
+        return Response(
+            {"results": ProductSerializer(updated, many=True).data},
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=False, methods=["get", "post"], url_name="batch")
+    def batch(self, request):
+        """
+        Обрабатывает запрос на получение нескольких товаров по списку
+        идентификаторов или штрихкодов.
+
+        Товары выбираются одним запросом ``IN`` на пачку значений по лимиту
+        параметров SQLite (одна пачка при допустимом размере списка); цены
+        при ``expand=prices`` загружаются одним дополнительным запросом на
+        пачку. Параметры expand и currency действуют как для списка товаров.
+
+        Параметры
+        ----------
+        request : 
+            Объект запроса. В GET-запросе списки передаются параметрами
+            ``ids=1,2,3`` или ``barcodes=a,b,c``, в POST-запросе - полями
+            ids или barcodes тела запроса (не более 500 значений).
+
+        Возвращает
+        ----------
+        Response
+            - При успешном выполнении: results - товары в порядке запроса
+              (null на месте ненайденного товара), missing - ненайденные
+              идентификаторы или штрихкоды, и статус 200 OK.
+            - При ошибке в запросе: сообщение об ошибке и статус 400 Bad Request.
+        """
+        data = request.data
+        if request.method == "GET":
+            params = request.query_params
+            data = {key: params[key].split(",") for key in ("ids", "barcodes") if key in params}
+        serializer = ProductBatchSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        key, values = next(iter(serializer.validated_data.items()))
+        field = "id" if key == "ids" else "barcode"
+
+        queryset = self.get_queryset()
+        if self.use_fast_list():
+            serializer_class = self.get_serializer_class()
+            rows = in_chunks(serializer_class.fast_values(queryset), field, dict.fromkeys(values))
+            items = serializer_class.fast_data(list(rows))
+        else:
+            items = self.get_serializer(list(in_chunks(queryset, field, dict.fromkeys(values))), many=True).data
+        found = {item[field]: item for item in self.add_prices(items)}
+        return Response({
+            "results": [found.get(value) for value in values],
+            "missing": list(dict.fromkeys(value for value in values if value not in found)),
+        })
+
+    @action(detail=False, methods=["post"], url_path="bulk_upsert", url_name="bulk-upsert")
+    def bulk_upsert(self, request):
+        """
+        Обрабатывает запрос на массовое создание и обновление товаров и цен по штрихкоду.
+
+        Параметры
+        ----------
+        request : 
+            Объект запроса с полем products - списком (не более
+            MAX_REQUEST_ROWS) строк вида
+            ``{"barcode": str, "name": str, "quantity": int, "category": int | None,
+            "prices": [{"currency": str, "amount": str}]}``.
+            Параметры запроса batch_size и commit_size задают размер пачки
+            INSERT и размер транзакции.
+
+        Возвращает
+        ----------
+        Response
+            - При успешном выполнении: количество созданных, обновленных
+              и отклоненных строк и статус 200 OK.
+            - При ошибке в формате запроса: сообщение об ошибке и статус 400 Bad Request.
+        """
+        rows = request.data.get("products") if isinstance(request.data, dict) else None
+        if not isinstance(rows, list):
+            return Response(
+                {"detail": "Ожидается список товаров в поле products."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(rows) > MAX_REQUEST_ROWS:
+            return Response(
+                {"detail": f"Не более {MAX_REQUEST_ROWS} товаров в одном запросе."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            batch_size = int(request.query_params.get("batch_size", 500))
+            commit_size = int(request.query_params.get("commit_size", 10000))
+            result = upsert_catalog(rows, batch_size=batch_size, commit_size=commit_size)
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result.as_dict(), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=["get"], url_name="export")
+    def export(self, request):
+        """
+        Обрабатывает запрос на выгрузку всего каталога потоком.
+
+        Товары с категориями и ценами читаются из БД пачками и сразу
+        отправляются клиенту, поэтому потребление памяти не зависит от
+        размера каталога.
+
+        Параметры
+        ----------
+        request : 
+            Объект запроса. Параметр output задает формат: ``jsonl`` (по умолчанию) или ``csv``.
+
+        Возвращает
+        ----------
+        StreamingHttpResponse
+            - При успешном выполнении: поток строк каталога и статус 200 OK.
+        Response
+            - При неизвестном формате: сообщение об ошибке и статус 400 Bad Request.
+        """
+        output = request.query_params.get("output", "jsonl")
+        if output not in EXPORT_FORMATS:
+            return Response(
+                {"detail": f"Неизвестный формат выгрузки: {output}."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        _, content_type = EXPORT_FORMATS[output]
+        response = StreamingHttpResponse(render_catalog(output), content_type=content_type)
+        response["Content-Disposition"] = f'attachment; filename="catalog.{output}"'
+        return response
+
+    @action(detail=False, methods=["get"], url_path=r"by-barcode/(?P<barcode>[^/]+)", url_name="by-barcode")
+    def by_barcode(self, request, barcode=None):
+        """
+        Обрабатывает запрос на получение товара по штрихкоду.
+
+        Ответ берется из кэша штрихкодов (LRU в памяти процесса и общий кэш
+        Django) и при попадании не обращается к БД. Кэш сбрасывается при
+        изменении и удалении товара или его цен и после списания.
+
+        Параметры
+        ----------
+        request : 
+            Объект запроса.
+        barcode : 
+            Штрихкод товара.
+
+        Возвращает
+        ----------
+        Response
+            - При успешном выполнении: данные товара с ценами и статус 200 OK.
+            - Если товар не найден: сообщение об ошибке и статус 404 Not Found.
+        """
+        data = get_barcode_cache().get(barcode, _load_by_barcode)
+        if data is None:
+            raise NotFound("Товар с таким штрихкодом не найден.")
+        return Response(data)
 
-class PriceViewSet(ModelViewSet):
+    @action(detail=False, methods=["get"], url_path="barcode-cache", url_name="barcode-cache")
+    def barcode_cache(self, request):
+        """
+        Возвращает счетчики кэша штрихкодов: размер, попадания и промахи.
+        """
+        return Response(get_barcode_cache().stats())
+
+
+def _fetch_products(ids, barcodes):
+    """
+    Загружает товары по спискам первичных ключей и штрихкодов.
+
+    Списки разбиваются на пачки, чтобы не превысить лимит параметров
+    запроса (query_batch_size).
+
+    Параметры
+    ----------
+    ids : list[int]
+        Первичные ключи товаров.
+    barcodes : list[str]
+        Штрихкоды товаров.
+
+    Возвращает
+    ----------
+    list[Product]
+        Найденные товары (без повторов).
+    """
+    products = {}
+    batch_size = query_batch_size()
+    for field, values in (("pk", list(dict.fromkeys(ids))), ("barcode", list(dict.fromkeys(barcodes)))):
+        for start in range(0, len(values), batch_size):
+            lookup = {f"{field}__in": values[start:start + batch_size]}
+            for product in Product.objects.filter(**lookup):
+                products[product.pk] = product
+    return list(products.values())
+
+
+def _filter_by_params(queryset, params, fields):
+    """
+    Фильтрует набор объектов по равенству полей, переданных в параметрах запроса.
+
+    Пустое значение параметра соответствует NULL.
+
+    Исключения
+    ----------
+    ValidationError
+        Вызывается, если значение параметра не подходит к типу поля.
+    """
+    for field in fields:
+        if field in params:
+            try:
+                queryset = queryset.filter(**{field: params[field] or None})
+            except (ValueError, DjangoValidationError):
+                raise ValidationError({field: "Некорректное значение."})
+    return queryset
+
+
+def _load_by_barcode(barcode):
+    """
+    Загружает представление товара с ценами по штрихкоду или возвращает None.
+    """
+    product = (
+        Product.objects
+        .prefetch_related(Prefetch("price_set", queryset=Price.objects.order_by("id")))
+        .filter(barcode=barcode)
+        .first()
+    )
+    if product is None:
+        return None
+    # В кэш кладутся обычные dict/list без ссылок на сериализатор и объект товара.
+    data = dict(ProductSerializer(product, context={"expand": {"prices"}}).data)
+    data["prices"] = [dict(price) for price in data["prices"]]
+    return data
+
+
+class PriceViewSet(ConditionalGetMixin, FastListMixin, ModelViewSet):
     """
     Представление для обработки CREATE, PUT, PATCH, GET (ALL), DELETE операций управления ценами.
 
@@ -73,13 +630,25 @@ class PriceViewSet(ModelViewSet):
         Стандартный набор объектов Price.
     serializer_class:
         Стандартный используемый сериализатор.
+    version_resource:
+        Коллекция для условных GET-запросов.
+    read_replica_actions:
+        Действия, которые читают с реплики (ReplicaRoutingMiddleware).
     """
 
     queryset = Price.objects
     serializer_class = PriceSerializer
+    version_resource = "price"
+    read_replica_actions = ("list", "retrieve")
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == "list":
+            queryset = _filter_by_params(queryset, self.request.query_params, ("product", "currency"))
+        return queryset
 
 
-class CategoryViewSet(ModelViewSet):
+class CategoryViewSet(ConditionalGetMixin, FastListMixin, ModelViewSet):
     """
     Представление для обработки CREATE, PUT, PATCH, GET (ALL), DELETE операций управления типами товаров.
 
@@ -89,7 +658,130 @@ class CategoryViewSet(ModelViewSet):
         Стандартный набор объектов Category.
     serializer_class:
         Стандартный используемый сериализатор.
+    version_resource:
+        Коллекция для условных GET-запросов.
+    read_replica_actions:
+        Действия, которые читают с реплики (ReplicaRoutingMiddleware).
     """
 
     queryset = Category.objects
     serializer_class = CategorySerializer
+    version_resource = "category"
+    read_replica_actions = ("list", "retrieve")
+
+    @action(detail=True, methods=["get"], url_name="stats")
+    def stats(self, request, pk=None):
+        """
+        Обрабатывает запрос на получение сводки остатков категории.
+
+        Сводка читается из таблицы, которую обновляют триггеры БД, и не
+        агрегирует товары и цены на каждый запрос.
+
+        Возвращает
+        ----------
+        Response
+            - При успешном выполнении: количество товаров, суммарный остаток,
+              стоимость остатков по валютам и статус 200 OK.
+            - Если категория не найдена: статус 404 Not Found.
+        """
+        category = self.get_object()
+        return Response(_stats_data(category.pk, get_category_stats([category.pk])[category.pk]))
+
+    @action(detail=False, methods=["get"], url_path="stats", url_name="stats-summary")
+    def stats_summary(self, request):
+        """
+        Обрабатывает запрос на получение сводки остатков всех непустых категорий.
+
+        Товары без категории возвращаются в записи с category, равным null.
+        """
+        stats = get_category_stats()
+        return Response({"results": [_stats_data(category_id, data) for category_id, data in stats.items()]})
+
+
+def _stats_data(category_id, stats):
+    """
+    Представление сводки категории: стоимость - строки с двумя знаками после точки.
+    """
+    return {
+        "category": None if category_id == NO_CATEGORY else category_id,
+        "products": stats["products"],
+        "quantity": stats["quantity"],
+        "value": {currency: str(value) for currency, value in stats["value"].items()},
+    }
+
+
+class ExchangeRateViewSet(ConditionalGetMixin, FastListMixin, ModelViewSet):
+    """
+    Представление для обработки CREATE, PUT, PATCH, GET (ALL), DELETE операций управления курсами валют.
+
+    Курс задается по коду валюты: ``/api/exchange-rates/EUR/``.
+
+    Поля
+    ----
+    queryset: QuerySet[ExchangeRate]
+        Стандартный набор объектов ExchangeRate.
+    serializer_class:
+        Стандартный используемый сериализатор.
+    lookup_field:
+        Поле, по которому выбирается курс.
+    version_resource:
+        Коллекция для условных GET-запросов.
+    """
+
+    queryset = ExchangeRate.objects
+    serializer_class = ExchangeRateSerializer
+    lookup_field = "currency"
+    version_resource = RATES_RESOURCE
+
+
+class ChangeViewSet(GenericViewSet):
+    """
+    Представление журнала изменений каталога для инкрементальной синхронизации.
+
+    Клиент передает номер последнего полученного изменения (since) и получает
+    созданные, измененные и удаленные товары, цены и категории в порядке
+    фиксации, а также номер (cursor) для следующего запроса.
+
+    Поля
+    ----
+    queryset: QuerySet[Change]
+        Записи журнала изменений.
+    """
+
+    queryset = Change.objects
+
+    def list(self, request):
+        """
+        Обрабатывает запрос на получение изменений после номера since.
+
+        Параметры
+        ----------
+        request : 
+            Объект запроса. Параметр since - номер последнего полученного
+            изменения (0 - с начала журнала), page_size - число записей журнала.
+
+        Возвращает
+        ----------
+        Response
+            - При успешном выполнении: cursor, has_more, ссылка next и список
+              изменений и статус 200 OK.
+            - При некорректном since: сообщение об ошибке и статус 400 Bad Request.
+            - Если записи после since уже удалены из журнала: сообщение об
+              ошибке, текущий cursor и статус 410 Gone.
+        """
+        try:
+            since = int(request.query_params.get("since", 0))
+        except ValueError:
+            since = -1
+        if since < 0:
+            raise ValidationError({"since": "Ожидается неотрицательное целое число."})
+        if since < change_horizon():
+            # Клиент заново загружает каталог и продолжает с текущего номера.
+            return Response(
+                {"detail": "Изменения после since удалены из журнала.", "cursor": last_change()},
+                status=status.HTTP_410_GONE,
+            )
+
+        cursor, has_more, results = read_changes(since, KeysetPagination().get_page_size(request))
+        next_link = replace_query_param(request.build_absolute_uri(), "since", cursor) if has_more else None
+        return Response({"cursor": cursor, "has_more": has_more, "next": next_link, "results": results})
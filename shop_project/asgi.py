@@ -3,6 +3,10 @@ ASGI config for shop_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Long-lived endpoints, such as the product change stream at
+``/api/async/stream/``, need an ASGI server (uvicorn, daphne, hypercorn):
+under WSGI every open stream would hold a worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
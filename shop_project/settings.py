@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,6 +43,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'app_shop.metrics.MetricsMiddleware',
+    'app_shop.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,10 +81,122 @@ WSGI_APPLICATION = 'shop_project.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'NAME': os.environ.get('SHOP_DB_NAME', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Профиль SQLite для одновременной работы нескольких потоков и процессов:
+# - WAL: читатели не блокируют писателя и наоборот; synchronous=NORMAL
+#   в режиме WAL не теряет целостность при сбое процесса;
+# - busy_timeout: ожидание блокировки вместо ошибки "database is locked";
+# - mmap_size и cache_size (256 МБ и 64 МБ): чтение без лишних системных вызовов;
+# - BEGIN IMMEDIATE: транзакция сразу берет блокировку записи, поэтому
+#   не получает SQLITE_BUSY при повышении блокировки с чтения до записи;
+# - постоянные соединения (CONN_MAX_AGE) с проверкой перед использованием.
+# Профиль включается переменной SHOP_DB_PROFILE=production. По умолчанию -
+# профиль basic (исходная конфигурация): команды управления не переводят
+# файл БД из репозитория в режим WAL.
+DATABASE_PROFILE = os.environ.get('SHOP_DB_PROFILE', 'basic')
+
+DATABASE_PROFILES = {
+    'basic': {},
+    'production': {
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'init_command': (
+                'PRAGMA journal_mode=WAL;'
+                'PRAGMA synchronous=NORMAL;'
+                'PRAGMA busy_timeout=5000;'
+                'PRAGMA mmap_size=268435456;'
+                'PRAGMA cache_size=-65536;'
+            ),
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+}
+
+DATABASES['default'].update(DATABASE_PROFILES[DATABASE_PROFILE])
+
+# Реплики для чтения (app_shop.replicas): SHOP_DB_REPLICAS - пути к копиям
+# основной БД через запятую. Локальные копии обновляются командой
+# refresh_replicas; в тестах реплики совпадают с основной БД (MIRROR).
+for number, name in enumerate(filter(None, os.environ.get('SHOP_DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{number}'] = {**DATABASES['default'], 'NAME': name, 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['app_shop.replicas.ReplicaRouter']
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'app_shop.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+    'DEFAULT_RENDERER_CLASSES': [
+        'app_shop.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Кэш товаров по штрихкоду: LRU в памяти процесса (MAXSIZE записей, TTL секунд)
+# и общий кэш Django ALIAS (None - без общего кэша) с временем жизни TIMEOUT секунд.
+SHOP_BARCODE_CACHE = {
+    'MAXSIZE': 10000,
+    'TTL': 60,
+    'ALIAS': 'default',
+    'TIMEOUT': 300,
+}
+
+# Метрики запросов (/metrics): запросы дольше SLOW_REQUEST_MS миллисекунд
+# (None - журнал отключен) записываются в журнал app_shop.slow_requests
+# с текстами первых SLOW_REQUEST_QUERIES SQL-запросов.
+SHOP_METRICS = {
+    'SLOW_REQUEST_MS': None,
+    'SLOW_REQUEST_QUERIES': 100,
+}
+
+# Резервы товаров: срок резерва по умолчанию и максимальный срок в секундах.
+SHOP_RESERVATIONS = {
+    'TTL': 900,
+    'MAX_TTL': 86400,
+}
+
+# Поток изменений товаров (/api/async/stream/): класс доставки изменений
+# (LocalBackend - внутри процесса, ChangeLogBackend - через журнал изменений
+# между процессами), окно объединения изменений в миллисекундах, интервал
+# служебных сообщений в секундах и наибольший размер подписки.
+SHOP_EVENTS = {
+    'BACKEND': 'app_shop.events.LocalBackend',
+    'OPTIONS': {},
+    'COALESCE_MS': 250,
+    'HEARTBEAT': 15,
+    'MAX_SUBSCRIPTIONS': 500,
+}
+
+# Журнал изменений (/api/changes/): срок хранения записей в днях для
+# команды prune_changes.
+SHOP_CHANGES = {
+    'RETENTION_DAYS': 30,
+}
+
+# Чтение с реплик: псевдонимы реплик в DATABASES и время в секундах после
+# изменения данных, в течение которого клиент читает с основной БД.
+SHOP_REPLICATION = {
+    'REPLICAS': [alias for alias in DATABASES if alias != 'default'],
+    'STICKY_SECONDS': 5,
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators